@@ -1,15 +1,140 @@
 from django.contrib import admin
-from .models import Cattle, HealthCheck, Treatment, Vaccination, Notification, Report
+from .archive import archive_cattle, restore_cattle
+from .models import (
+    CalendarEvent, CalendarEventException, Cattle, CattleStatus, ChangeLog, FeedingRation, FeedingSlot, HealthCheck,
+    Housing, Treatment, Vaccination, Notification, Report,
+)
+
+
+class ArchivedFilter(admin.SimpleListFilter):
+    title = 'คัดออก'
+    parameter_name = 'archived'
+
+    def lookups(self, request, model_admin):
+        return [('0', 'ยังอยู่ในฝูง'), ('1', 'คัดออกแล้ว')]
+
+    def queryset(self, request, queryset):
+        if self.value() == '0':
+            return queryset.filter(archived_at__isnull=True)
+        if self.value() == '1':
+            return queryset.filter(archived_at__isnull=False)
+        return queryset
 
 
 @admin.register(Cattle)
 class CattleAdmin(admin.ModelAdmin):
-    list_display = ('tag_no', 'name', 'breed', 'gender')
+    list_display = ('tag_no', 'name', 'breed', 'gender', 'latest_status', 'latest_check_date', 'archived_at')
+    list_filter = ('current_status__latest_status', ArchivedFilter)
+    list_select_related = ('current_status',)
     search_fields = ('tag_no', 'name')
+    readonly_fields = ('archived_at',)
+    actions = ('archive_selected', 'restore_selected')
+
+    def get_queryset(self, request):
+        # admin เห็นโคที่คัดออกแล้วด้วย → กู้คืนได้ก่อนถูก purge
+        return Cattle.all_objects.select_related('current_status')
+
+    @admin.action(description='คัดออกโคที่เลือก')
+    def archive_selected(self, request, queryset):
+        count = archive_cattle(queryset.filter(archived_at__isnull=True).values_list('pk', flat=True))
+        self.message_user(request, f'คัดออก {count} ตัว')
+
+    @admin.action(description='กู้คืนโคที่เลือก')
+    def restore_selected(self, request, queryset):
+        count = restore_cattle(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'กู้คืน {count} ตัว')
+
+    @admin.display(description='สถานะล่าสุด', ordering='current_status__latest_status')
+    def latest_status(self, obj):
+        status = getattr(obj, 'current_status', None)
+        return status.get_latest_status_display() if status and status.latest_status else '-'
+
+    @admin.display(description='ตรวจล่าสุด', ordering='current_status__latest_check_date')
+    def latest_check_date(self, obj):
+        status = getattr(obj, 'current_status', None)
+        return status.latest_check_date if status else None
+
+
+@admin.register(CattleStatus)
+class CattleStatusAdmin(admin.ModelAdmin):
+    list_display = ('cattle', 'latest_status', 'latest_check_date', 'latest_weight', 'updated_at')
+    list_filter = ('latest_status',)
+    list_select_related = ('cattle',)
+    readonly_fields = ('cattle', 'latest_status', 'latest_check_date', 'latest_weight', 'updated_at')
+
+
+@admin.register(HealthCheck)
+class HealthCheckAdmin(admin.ModelAdmin):
+    list_display = ('cattle', 'check_date', 'temperature', 'heart_rate', 'weight', 'status', 'is_anomaly')
+    list_filter = ('is_anomaly', 'status')
+    list_select_related = ('cattle',)
+    readonly_fields = ('temperature_zscore', 'heart_rate_zscore', 'is_anomaly')
+
+
+@admin.register(Housing)
+class HousingAdmin(admin.ModelAdmin):
+    list_display = ('name', 'head_count', 'sick_count', 'for_sale_count', 'avg_weight', 'updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('head_count', 'sick_count', 'for_sale_count', 'avg_weight', 'updated_at')
+
+
+class FeedingSlotInline(admin.TabularInline):
+    # สร้างจาก feeding_time อัตโนมัติ
+    model = FeedingSlot
+    extra = 0
+    can_delete = False
+    readonly_fields = ('time', 'fresh_weight', 'dry_weight')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FeedingRation)
+class FeedingRationAdmin(admin.ModelAdmin):
+    list_display = ('ration_id', 'cattle', 'feeding_time', 'fresh_weight', 'dry_weight')
+    list_filter = ('ration_id',)
+    list_select_related = ('cattle',)
+    search_fields = ('ration_id', 'cattle__tag_no')
+    inlines = [FeedingSlotInline]
 
 
-admin.site.register(HealthCheck)
 admin.site.register(Treatment)
 admin.site.register(Vaccination)
-admin.site.register(Notification)
-admin.site.register(Report)
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('cattle', 'type', 'notify_date', 'status', 'message')
+    list_filter = ('status', 'type')
+    list_select_related = ('cattle',)
+    search_fields = ('cattle__tag_no', 'message')
+
+
+@admin.register(Report)
+class ReportAdmin(admin.ModelAdmin):
+    list_display = ('cattle', 'kind', 'period_start', 'period_end', 'report_date')
+    list_filter = ('kind', 'period_start')
+    list_select_related = ('cattle',)
+    search_fields = ('cattle__tag_no',)
+
+
+class CalendarEventExceptionInline(admin.TabularInline):
+    model = CalendarEventException
+    extra = 0
+
+
+@admin.register(CalendarEvent)
+class CalendarEventAdmin(admin.ModelAdmin):
+    list_display = ('title', 'cattle', 'event_type', 'start', 'end', 'recurrence', 'recurrence_end')
+    list_filter = ('event_type', 'recurrence')
+    list_select_related = ('cattle',)
+    search_fields = ('title', 'cattle__tag_no')
+    readonly_fields = ('recurrence_end',)
+    inlines = [CalendarEventExceptionInline]
+
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'table', 'object_id', 'op', 'recorded_at', 'client_ref')
+    list_filter = ('table', 'op')
+    search_fields = ('client_ref',)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Cattle, HealthCheck
+from .services import bump_cache_version, cache_version
+from .snapshot import current_snapshot
+
+GROWTH_VERSION_KEY = 'cattle:growth_version'
+COHORT_FIELDS = ('housing', 'breed', 'category', 'gender')
+ROLLING_WINDOW_DAYS = 30
+# window ที่ยาวที่สุดที่รับจาก API (10 ปี) — ค่ามากกว่านี้ทำให้ key ของ rolling_gain ล้น int64
+MAX_ROLLING_WINDOW_DAYS = 3650
+# modified z-score (median/MAD) ที่ถือว่าเป็นค่าผิดปกติ
+OUTLIER_THRESHOLD = 3.5
+
+
+def invalidate_growth():
+    bump_cache_version(GROWTH_VERSION_KEY)
+
+
+def load_weight_series(cohort=None, cattle_ids=None):
+    # น้ำหนักทั้งหมดของฝูง (หรือ cohort) → numpy arrays เรียงตาม (โค, วันที่)
+    # ถ้ามี columnar snapshot ที่ตรงกับฐานข้อมูล อ่านจาก memory map แทน ORM
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        if cohort:
+            members = set(Cattle.objects.filter(**cohort).values_list('pk', flat=True))
+            cattle_ids = members if cattle_ids is None else members & set(cattle_ids)
+        elif cattle_ids is None and Cattle.all_objects.filter(archived_at__isnull=False).exists():
+            # snapshot ยังมีประวัติของโคที่คัดออกแล้ว (จนกว่าจะ purge)
+            cattle_ids = set(Cattle.objects.values_list('pk', flat=True))
+        return snapshot.weight_series(cattle_ids)
+
+    checks = HealthCheck.objects.filter(weight__isnull=False, cattle__archived_at__isnull=True)
+    for field, value in (cohort or {}).items():
+        checks = checks.filter(**{f'cattle__{field}': value})
+    if cattle_ids is not None:
+        checks = checks.filter(cattle_id__in=cattle_ids)
+    rows = checks.order_by('cattle_id', 'check_date', 'id').values_list('cattle_id', 'check_date', 'weight')
+
+    rows = list(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    days = np.array([r[1] for r in rows], dtype='datetime64[D]').astype(np.int64)
+    weights = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+    return ids, days, weights
+
+
+def rolling_gain(ids, days, weights, window=ROLLING_WINDOW_DAYS):
+    # ADG ของแต่ละการชั่ง เทียบกับการชั่งแรกที่อยู่ในช่วง window วันก่อนหน้า (ของโคตัวเดียวกัน)
+    if not 1 <= window <= MAX_ROLLING_WINDOW_DAYS:
+        raise ValueError(f'window ต้องอยู่ระหว่าง 1 ถึง {MAX_ROLLING_WINDOW_DAYS} วัน')
+    if not len(ids):
+        return np.zeros(0)
+    span = int(days.max() - days.min()) + window + 1
+    key = (ids - ids.min()) * span + (days - days.min())
+    start = np.searchsorted(key, key - window, side='left')
+    elapsed = days - days[start]
+    gain = np.full(len(ids), np.nan)
+    np.divide(weights - weights[start], elapsed, out=gain, where=elapsed > 0)
+    return gain
+
+
+def growth_metrics(ids, days, weights, target=None, window=ROLLING_WINDOW_DAYS):
+    # ค่าต่อโค คำนวณด้วย reduceat ทั้งฝูงพร้อมกัน (ไม่วนทีละตัว)
+    if not len(ids):
+        return {}
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1))
+    ends = np.concatenate((starts[1:], [len(ids)])) - 1
+    n = np.diff(np.concatenate((starts, [len(ids)]))).astype(np.float64)
+
+    # ADG = ความชันของ regression น้ำหนักกับวัน (กก./วัน)
+    x = (days - days[starts].repeat(n.astype(np.int64))).astype(np.float64)
+    sx = np.add.reduceat(x, starts)
+    sy = np.add.reduceat(weights, starts)
+    sxx = np.add.reduceat(x * x, starts)
+    sxy = np.add.reduceat(x * weights, starts)
+    denominator = n * sxx - sx * sx
+    adg = np.full(len(starts), np.nan)
+    np.divide(n * sxy - sx * sy, denominator, out=adg, where=denominator > 0)
+
+    rolling = rolling_gain(ids, days, weights, window)[ends]
+    latest = weights[ends]
+
+    days_to_target = np.full(len(starts), np.nan)
+    if target is not None:
+        remaining = target - latest
+        np.divide(remaining, adg, out=days_to_target, where=(adg > 0) & (remaining > 0))
+        days_to_target[remaining <= 0] = 0
+
+    # ค่าผิดปกติของ ADG เทียบกับ cohort (modified z-score)
+    outlier = np.zeros(len(starts), dtype=bool)
+    valid = ~np.isnan(adg)
+    if valid.sum() >= 3:
+        median = np.median(adg[valid])
+        mad = np.median(np.abs(adg[valid] - median))
+        if mad > 0:
+            outlier[valid] = np.abs(0.6745 * (adg[valid] - median) / mad) > OUTLIER_THRESHOLD
+
+    return {
+        'cattle_id': ids[starts],
+        'count': n.astype(np.int64),
+        'first_day': days[starts],
+        'last_day': days[ends],
+        'latest_weight': latest,
+        'adg': adg,
+        'rolling_adg': rolling,
+        'days_to_target': days_to_target,
+        'outlier': outlier,
+    }
+
+
+def _number(value, digits=3):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _date(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def cohort_growth(cohort=None, target=None, window=ROLLING_WINDOW_DAYS):
+    # ผลลัพธ์ของ cohort ถูก cache ไว้จนกว่าจะมี HealthCheck เปลี่ยน
+    cohort = {k: v for k, v in (cohort or {}).items() if k in COHORT_FIELDS and v}
+    params = json.dumps({'cohort': cohort, 'target': target, 'window': window}, sort_keys=True)
+    key = 'cattle:growth:{}:{}'.format(
+        cache_version(GROWTH_VERSION_KEY),
+        hashlib.md5(params.encode()).hexdigest(),
+    )
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    metrics = growth_metrics(*load_weight_series(cohort), target=target, window=window)
+    animals = []
+    if metrics:
+        tags = dict(Cattle.objects.filter(pk__in=metrics['cattle_id'].tolist()).values_list('pk', 'tag_no'))
+        for i, cattle_id in enumerate(metrics['cattle_id'].tolist()):
+            animals.append({
+                'cattle_id': cattle_id,
+                'tag_no': tags.get(cattle_id),
+                'weighings': int(metrics['count'][i]),
+                'first_date': _date(metrics['first_day'][i]),
+                'last_date': _date(metrics['last_day'][i]),
+                'latest_weight': _number(metrics['latest_weight'][i], 2),
+                'adg': _number(metrics['adg'][i]),
+                'rolling_adg': _number(metrics['rolling_adg'][i]),
+                'days_to_target': _number(np.ceil(metrics['days_to_target'][i]), 0),
+                'outlier': bool(metrics['outlier'][i]),
+            })
+
+    adg = metrics['adg'][~np.isnan(metrics['adg'])] if metrics else np.zeros(0)
+    result = {
+        'cohort': cohort,
+        'target': target,
+        'window': window,
+        'summary': {
+            'animals': len(animals),
+            'mean_adg': _number(adg.mean()) if len(adg) else None,
+            'median_adg': _number(np.median(adg)) if len(adg) else None,
+            'outliers': sum(a['outlier'] for a in animals),
+        },
+        'animals': animals,
+    }
+    cache.set(key, result, settings.GROWTH_CACHE_TIMEOUT)
+    return result
+
+
+def cattle_growth(cattle_id, target=None, window=ROLLING_WINDOW_DAYS):
+    # ข้อมูลกราฟของโคหนึ่งตัว (หน้า cattle_detail)
+    ids, days, weights = load_weight_series(cattle_ids=[cattle_id])
+    metrics = growth_metrics(ids, days, weights, target=target, window=window)
+    rolling = rolling_gain(ids, days, weights, window)
+    return {
+        'cattle_id': cattle_id,
+        'dates': [_date(d) for d in days],
+        'weights': [round(float(w), 2) for w in weights],
+        'rolling_adg': [_number(g) for g in rolling],
+        'adg': _number(metrics['adg'][0]) if metrics else None,
+        'days_to_target': _number(np.ceil(metrics['days_to_target'][0]), 0) if metrics else None,
+    }
@@ -0,0 +1,124 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import invalidate_growth
+from .models import (
+    CalendarEvent, CalendarEventException, Cattle, CattleStatus, ChangeLog, FeedingRation, FeedingSlot, HealthCheck,
+    Notification, Report, Treatment, Vaccination, VitalBaseline,
+)
+from .pedigree import invalidate_pedigree
+from .search import invalidate_search_index
+from .services import invalidate_herd_summary, pens_of, record_changes, refresh_pens, touch_tables
+from .snapshot import mark_history_rewritten
+
+ARCHIVE_CHUNK_SIZE = 500
+PURGE_BATCH_SIZE = 1000
+# โคที่ถูก purge พร้อมกันต่อรอบ — ประวัติของแต่ละตารางยังลบทีละ batch_size แถว
+PURGE_CATTLE_PER_ROUND = 100
+
+# ลำดับการลบ (ลูกก่อนแม่) → field ที่ชี้ไปยังโค
+PURGE_ORDER = [
+    (CalendarEventException, 'event__cattle'),
+    (FeedingSlot, 'ration__cattle'),
+    (Notification, 'cattle'),
+    (Report, 'cattle'),
+    (HealthCheck, 'cattle'),
+    (Treatment, 'cattle'),
+    (Vaccination, 'cattle'),
+    (VitalBaseline, 'cattle'),
+    (CattleStatus, 'cattle'),
+    (FeedingRation, 'cattle'),
+    (CalendarEvent, 'cattle'),
+]
+
+
+def _chunks(ids, size=ARCHIVE_CHUNK_SIZE):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _herd_changed():
+    # update()/raw delete ไม่ส่ง signal → ล้าง cache และเลื่อนเวอร์ชัน feed เอง
+    invalidate_herd_summary()
+    invalidate_growth()
+    invalidate_pedigree()
+    invalidate_search_index()
+    touch_tables(Cattle, HealthCheck)
+
+
+def archive_cattle(cattle_ids, when=None):
+    # คัดออก (soft delete): UPDATE ทีละ chunk → ทุกหน้า/API มองไม่เห็นทันที ไม่แตะประวัติ
+    when = when or timezone.now()
+    cattle_ids = list(cattle_ids)
+    archived = 0
+    pens = set()
+    with transaction.atomic():
+        for chunk in _chunks(cattle_ids):
+            pens |= pens_of(chunk)
+            archived += Cattle.objects.filter(pk__in=chunk).update(archived_at=when)
+        refresh_pens(pens)
+        # สำหรับแท็บเล็ต การคัดออก = ลบ (พร้อมประวัติ)
+        record_changes(Cattle, cattle_ids, ChangeLog.DELETE)
+        _herd_changed()
+    return archived
+
+
+def restore_cattle(cattle_ids):
+    # กู้คืนโคที่ยังไม่ถูก purge
+    restored = 0
+    pens = set()
+    with transaction.atomic():
+        for chunk in _chunks(cattle_ids):
+            restored += Cattle.all_objects.filter(pk__in=chunk, archived_at__isnull=False).update(archived_at=None)
+            pens |= pens_of(chunk)
+            # แท็บเล็ตลบโคตัวนี้พร้อมประวัติไปแล้ว → ส่งกลับไปทั้งหมด
+            record_changes(Cattle, chunk)
+            for model in (HealthCheck, Vaccination, FeedingRation, CalendarEvent):
+                record_changes(model, model.objects.filter(cattle_id__in=chunk).values_list('pk', flat=True))
+        refresh_pens(pens)
+        _herd_changed()
+    return restored
+
+
+def _delete_in_batches(model, lookup, cattle_ids, batch_size):
+    # DELETE ... WHERE pk IN (...) ตรงที่ฐานข้อมูล ทีละ batch_size แถว / transaction สั้นๆ
+    # (ไม่ผ่าน Collector → ไม่โหลดแถวขึ้นหน่วยความจำ ไม่มี signal ต่อแถว)
+    rows = model.objects.filter(**{f'{lookup}__in': cattle_ids}).order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        pks = list(rows[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            deleted += model.objects.filter(pk__in=pks)._raw_delete(model.objects.db)
+
+
+def purge_archived(before=None, batch_size=PURGE_BATCH_SIZE, progress=None):
+    # ลบโคที่คัดออกก่อน before พร้อมประวัติทั้งหมด — หยุดกลางทางแล้วรันใหม่ได้ (โคถูกลบเป็นลำดับสุดท้าย)
+    if before is None:
+        before = timezone.now() - datetime.timedelta(days=settings.ARCHIVE_RETENTION_DAYS)
+    pending = Cattle.all_objects.filter(archived_at__isnull=False, archived_at__lte=before).order_by('pk')
+    expected = pending.count()
+    totals = {}
+    purged = 0
+    while True:
+        cattle_ids = list(pending.values_list('pk', flat=True)[:PURGE_CATTLE_PER_ROUND])
+        if not cattle_ids:
+            break
+        for model, lookup in PURGE_ORDER:
+            deleted = _delete_in_batches(model, lookup, cattle_ids, batch_size)
+            totals[model._meta.model_name] = totals.get(model._meta.model_name, 0) + deleted
+        with transaction.atomic():
+            purged += Cattle.all_objects.filter(pk__in=cattle_ids)._raw_delete(Cattle.all_objects.db)
+        if progress:
+            progress(purged, expected)
+
+    if purged:
+        mark_history_rewritten()
+        _herd_changed()
+    totals['cattle'] = purged
+    return totals
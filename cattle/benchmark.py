@@ -0,0 +1,253 @@
+import asyncio
+import itertools
+import json
+import ssl
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+import django
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .metrics import QueryRecorder
+from .models import CalendarEvent, Cattle, HealthCheck, Vaccination
+
+PERCENTILES = (50, 90, 95, 99)
+# p95 ช้าลงเกินกี่ % จึงถือว่า regression
+REGRESSION_THRESHOLD = 20.0
+
+
+def sample_cattle(count=5):
+    # เลือกโคตัวอย่างกระจายตามช่วง id (ไม่ใช้ ORDER BY RANDOM() ที่ช้ามากในฝูงใหญ่)
+    bounds = Cattle.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return []
+    samples = []
+    for pk in np.linspace(first, last, count).astype(np.int64).tolist():
+        cattle = Cattle.objects.filter(pk__gte=pk).order_by('pk').values('pk', 'tag_no').first()
+        if cattle and cattle not in samples:
+            samples.append(cattle)
+    return samples
+
+
+def default_scenarios(samples):
+    # (ชื่อ, url, query params) — หน้าที่ขึ้นกับโครายตัววนใช้โคตัวอย่าง
+    window = timezone.localdate()
+    calendar = {'start': (window.replace(day=1)).isoformat(), 'end': (window.replace(day=28)).isoformat()}
+    scenarios = [
+        ('dashboard', reverse('cattle:dashboard'), {}),
+        ('cattle_list', reverse('cattle:cattle_list'), {}),
+        ('cattle_list_sick', reverse('cattle:cattle_list'), {'sick': '1'}),
+        ('cattle_list_for_sale', reverse('cattle:cattle_list'), {'for_sale': '1'}),
+        ('calendar_events', reverse('cattle:api_calendar_events'), calendar),
+        ('farm_calendar_events', reverse('cattle:farm_calendar_events'), calendar),
+        ('api_cattle_list', reverse('cattle:cattle-list'), {}),
+        ('api_healthcheck_list', reverse('cattle:healthcheck-list'), {}),
+    ]
+    for cattle in samples:
+        pk, tag_no = cattle['pk'], cattle['tag_no']
+        scenarios += [
+            ('cattle_list_search', reverse('cattle:cattle_list'), {'q': tag_no[:-1]}),
+            ('cattle_detail', reverse('cattle:cattle_detail', args=[pk]), {}),
+            ('api_search', reverse('cattle:api_search'), {'q': tag_no}),
+            ('api_cattle_detail', reverse('cattle:cattle-detail', args=[pk]), {}),
+            ('api_cattle_healthchecks', reverse('cattle:cattle-healthchecks', args=[pk]), {}),
+        ]
+    return scenarios
+
+
+def _response_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    summary = {'mean': round(float(values.mean()), 3), 'max': round(float(values.max()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}'] = round(float(value), 3)
+    return summary
+
+
+def run_benchmark(repeat=20, warmup=2, cold=False, only=None, samples=5, label='', progress=None):
+    client = Client()
+    scenarios = default_scenarios(sample_cattle(samples))
+    if only:
+        scenarios = [s for s in scenarios if s[0] in only]
+
+    timings = {}
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for name, url, params in scenarios:
+            for i in range(warmup + repeat):
+                if cold:
+                    cache.clear()
+                queries = QueryRecorder()
+                with connection.execute_wrapper(queries):
+                    start = time.perf_counter()
+                    response = client.get(url, params)
+                    size = _response_size(response)
+                    elapsed = time.perf_counter() - start
+                if i < warmup:
+                    continue
+                run = timings.setdefault(name, {'url': url, 'status': set(), 'ms': [], 'queries': [], 'db_ms': [], 'bytes': []})
+                run['status'].add(response.status_code)
+                run['ms'].append(elapsed * 1000)
+                run['queries'].append(queries.count)
+                run['db_ms'].append(queries.duration * 1000)
+                run['bytes'].append(size)
+
+    results = {}
+    for name, run in timings.items():
+        if progress:
+            progress(name, run)
+        results[name] = {
+            'url': run['url'],
+            'status': sorted(run['status']),
+            'runs': len(run['ms']),
+            'latency_ms': _summary(run['ms']),
+            'queries': {'min': min(run['queries']), 'max': max(run['queries'])},
+            'db_ms': _summary(run['db_ms']),
+            'bytes': int(np.mean(run['bytes'])),
+        }
+    return {
+        'label': label,
+        'created_at': timezone.now().isoformat(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'cold_cache': cold,
+        'herd': {
+            'cattle': Cattle.objects.count(),
+            'healthchecks': HealthCheck.objects.count(),
+            'vaccinations': Vaccination.objects.count(),
+            'events': CalendarEvent.objects.count(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    # เทียบผลสองรอบ → [{scenario, p50/p95 เปลี่ยนไปกี่ %, query เพิ่ม/ลด, regression}]
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        row = {'scenario': name}
+        for key in ('p50', 'p95'):
+            old, new = before['latency_ms'][key], result['latency_ms'][key]
+            row[f'{key}_change_pct'] = round((new - old) / old * 100, 1) if old else None
+        row['queries_change'] = result['queries']['max'] - before['queries']['max']
+        row['regression'] = (row['p95_change_pct'] or 0) > threshold or row['queries_change'] > 0
+        rows.append(row)
+    return rows
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ---------------- Load test (request พร้อมกันหลายตัวกับเซิร์ฟเวอร์จริง) ----------------
+# ใช้เทียบ WSGI (gunicorn sync workers) กับ ASGI (uvicorn) — รันเซิร์ฟเวอร์แต่ละแบบแล้วยิงชุดเดียวกัน
+LOAD_CONCURRENCY = (1, 10, 50, 100)
+
+
+def feed_paths(samples):
+    # feed JSON ที่แท็บเล็ต poll บ่อย
+    window = timezone.localdate()
+    calendar = urlencode({'start': window.replace(day=1).isoformat(), 'end': window.replace(day=28).isoformat()})
+    paths = [
+        f"{reverse('cattle:api_calendar_events')}?{calendar}",
+        f"{reverse('cattle:farm_calendar_events')}?{calendar}",
+        reverse('cattle:api_herd_summary'),
+    ]
+    paths += [f"{reverse('cattle:api_search')}?{urlencode({'q': c['tag_no']})}" for c in samples]
+    return paths
+
+
+async def _fetch(url, path, timeout):
+    # HTTP/1.1 แบบง่าย (Connection: close) — ไม่ต้องพึ่ง client library
+    port = url.port or (443 if url.scheme == 'https' else 80)
+    context = ssl.create_default_context() if url.scheme == 'https' else None
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(url.hostname, port, ssl=context), timeout)
+    try:
+        writer.write((
+            f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n'
+            f'Accept: application/json\r\nConnection: close\r\n\r\n'
+        ).encode())
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(data.split(b' ', 2)[1]), len(data)
+
+
+async def _load(base_url, paths, concurrency, requests, timeout):
+    url = urlsplit(base_url)
+    prefix = url.path.rstrip('/')
+    tickets = itertools.count()
+    latencies, statuses = [], Counter()
+
+    async def worker():
+        while (n := next(tickets)) < requests:
+            start = time.perf_counter()
+            try:
+                status, _ = await _fetch(url, prefix + paths[n % len(paths)], timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                status = 'error'
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(status)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'seconds': round(elapsed, 3),
+        'rps': round(requests / elapsed, 1),
+        'latency_ms': _summary(latencies),
+        'status': dict(statuses),
+    }
+
+
+def run_load_test(base_url, paths, concurrency=LOAD_CONCURRENCY, requests=500, timeout=30.0, label='', progress=None):
+    levels = {}
+    for level in concurrency:
+        result = asyncio.run(_load(base_url, paths, level, requests, timeout))
+        if progress:
+            progress(result)
+        levels[str(level)] = result
+    return {
+        'label': label,
+        'created_at': timezone.now().isoformat(),
+        'base_url': base_url,
+        'paths': paths,
+        'levels': levels,
+    }
+
+
+def compare_load(baseline, current):
+    # เทียบ throughput / p95 ของแต่ละระดับ concurrency (เช่น WSGI → ASGI)
+    rows = []
+    for level, result in current['levels'].items():
+        before = baseline.get('levels', {}).get(level)
+        if before is None:
+            continue
+        rows.append({
+            'concurrency': int(level),
+            'rps_before': before['rps'],
+            'rps_after': result['rps'],
+            'rps_change_pct': round((result['rps'] - before['rps']) / before['rps'] * 100, 1) if before['rps'] else None,
+            'p95_before': before['latency_ms']['p95'],
+            'p95_after': result['latency_ms']['p95'],
+        })
+    return rows
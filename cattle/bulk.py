@@ -0,0 +1,191 @@
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .analytics import invalidate_growth
+from .models import CalendarEvent, Cattle, HealthCheck, Vaccination
+from .pedigree import invalidate_pedigree
+from .search import invalidate_search_index
+from .serializers import (
+    CalendarEventRoundSerializer, CattleImportSerializer, HealthCheckReadingSerializer, VaccinationRoundSerializer,
+)
+from .services import (
+    assign_pens, invalidate_herd_summary, pens_of, rebuild_cattle_status, record_changes, refresh_pens, touch_tables,
+)
+from .vitals import score_healthchecks
+
+# จำนวน parameter ต่อ query (SQLite รุ่นเก่ารับได้ไม่เกิน 999)
+LOOKUP_CHUNK_SIZE = 900
+
+CATTLE_UPSERT_FIELDS = ['name', 'gender', 'breed', 'category', 'housing', 'birth_date', 'mother', 'father']
+
+
+def lookup_tags(tags):
+    # tag_no → (cattle id, คัดออกแล้วหรือไม่) ในไม่กี่ query (แบ่งเป็นชุด)
+    # รวมโคที่คัดออกแล้ว: tag_no ของโคเหล่านั้นยัง unique ในฐานข้อมูลจนกว่าจะ purge
+    tags = list(set(tags))
+    tag_map = {}
+    for i in range(0, len(tags), LOOKUP_CHUNK_SIZE):
+        chunk = tags[i:i + LOOKUP_CHUNK_SIZE]
+        rows = Cattle.all_objects.filter(tag_no__in=chunk).values_list('tag_no', 'id', 'archived_at')
+        tag_map.update((tag, (pk, archived_at is not None)) for tag, pk, archived_at in rows)
+    return tag_map
+
+
+def resolve_tags(tags):
+    # tag_no → cattle id เฉพาะโคที่ยังไม่คัดออก
+    return {tag: pk for tag, (pk, archived) in lookup_tags(tags).items() if not archived}
+
+
+def _archived_error(tag):
+    return {'tag_no': [f'โคหมายเลข {tag} ถูกคัดออกแล้ว (กู้คืนได้จาก admin)']}
+
+
+def _validate_rows(serializer, rows, start_row):
+    # ใช้ serializer ตัวเดียวทั้งชุด → ไม่ต้องสร้าง fields ใหม่ทุกแถว
+    valid, errors = [], []
+    for index, row in enumerate(rows, start=start_row):
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as exc:
+            errors.append({'row': index, 'errors': exc.detail})
+    return valid, errors
+
+
+# ---------------- HealthCheck ----------------
+def validate_healthchecks(readings, start_row=0):
+    # คืนค่า (HealthCheck ที่ยังไม่บันทึก, errors ต่อแถว)
+    valid, errors = _validate_rows(HealthCheckReadingSerializer(), readings, start_row)
+    tag_map = lookup_tags(data['tag_no'] for _, data in valid)
+
+    checks = []
+    for index, data in valid:
+        cattle_id, archived = tag_map.get(data['tag_no'], (None, False))
+        if cattle_id is None:
+            errors.append({'row': index, 'errors': {'tag_no': [f"ไม่พบโคหมายเลข {data['tag_no']}"]}})
+            continue
+        if archived:
+            errors.append({'row': index, 'errors': _archived_error(data['tag_no'])})
+            continue
+        fields = {k: v for k, v in data.items() if k != 'tag_no'}
+        checks.append(HealthCheck(cattle_id=cattle_id, **fields))
+
+    errors.sort(key=lambda e: e['row'])
+    return checks, errors
+
+
+def save_healthchecks(checks, vaccinations=(), events=(), batch_size=1000):
+    # วัคซีน/กิจกรรมปฏิทินของรอบตรวจเดียวกันลงใน transaction เดียวกัน (bulk insert ทั้งหมด)
+    with transaction.atomic():
+        HealthCheck.objects.bulk_create(checks, batch_size=batch_size)
+        Vaccination.objects.bulk_create(vaccinations, batch_size=batch_size)
+        CalendarEvent.objects.bulk_create(events, batch_size=batch_size)
+        # bulk_create ไม่ส่ง signal → อัปเดตสถานะล่าสุดเองทีเดียว
+        rebuild_cattle_status({c.cattle_id for c in checks}, batch_size=batch_size)
+        score_healthchecks(checks, batch_size=batch_size)
+        touch_tables(HealthCheck, *([CalendarEvent] if events else []))
+        record_changes(HealthCheck, [c.pk for c in checks])
+        record_changes(Vaccination, [v.pk for v in vaccinations])
+        record_changes(CalendarEvent, [e.pk for e in events])
+    invalidate_growth()
+    return len(checks)
+
+
+def ingest_healthchecks(readings, partial=False, batch_size=1000):
+    # บันทึก HealthCheck หลายรายการใน transaction เดียว → คืนค่า (จำนวนที่บันทึก, errors ต่อแถว)
+    # partial=False: ถ้ามีแถวผิดแม้แต่แถวเดียว จะไม่บันทึกอะไรเลย
+    checks, errors = validate_healthchecks(readings)
+    if errors and not partial:
+        return 0, errors
+    return save_healthchecks(checks, batch_size=batch_size), errors
+
+
+# ---------------- รอบตรวจทั้งคอก ----------------
+def round_extras(cattle_ids, vaccination=None, event=None):
+    # วัคซีน / กิจกรรมเดียวกันสำหรับโคทุกตัวในรอบ (ข้อมูลที่ validate แล้ว)
+    vaccinations = [Vaccination(cattle_id=pk, **vaccination) for pk in cattle_ids] if vaccination else []
+    events = [CalendarEvent(cattle_id=pk, **event) for pk in cattle_ids] if event else []
+    return vaccinations, events
+
+
+def _validate_shared(serializer, data, key, errors):
+    if not data:
+        return None
+    try:
+        return serializer.run_validation(data)
+    except ValidationError as exc:
+        errors.append({key: exc.detail})
+        return None
+
+
+def ingest_round(readings, check_date=None, vaccination=None, event=None, partial=False, batch_size=1000):
+    # รอบตรวจทั้งคอก: ค่าของแต่ละตัว (tag_no) + วัคซีน/กิจกรรมที่ใช้ร่วมกัน → คืนค่า (จำนวนที่บันทึก, errors)
+    # readings ที่ไม่ระบุ check_date ใช้ check_date ของรอบ
+    if check_date:
+        readings = [{'check_date': check_date, **reading} if isinstance(reading, dict) else reading for reading in readings]
+    shared_errors = []
+    vaccination = _validate_shared(VaccinationRoundSerializer(), vaccination, 'vaccination', shared_errors)
+    event = _validate_shared(CalendarEventRoundSerializer(), event, 'event', shared_errors)
+    checks, errors = validate_healthchecks(readings)
+    errors = shared_errors + errors
+    # วัคซีน/กิจกรรมผิด = ผิดทั้งรอบ แม้ partial
+    if shared_errors or (errors and not partial):
+        return 0, errors
+
+    cattle_ids = list(dict.fromkeys(c.cattle_id for c in checks))
+    vaccinations, events = round_extras(cattle_ids, vaccination, event)
+    return save_healthchecks(checks, vaccinations, events, batch_size=batch_size), errors
+
+
+# ---------------- Cattle ----------------
+def validate_cattle(rows, start_row=0):
+    # คืนค่า (Cattle ที่ยังไม่บันทึก, errors ต่อแถว) — tag_no ซ้ำในชุดเดียวกันใช้แถวหลังสุด
+    # โคที่มีอยู่แล้วตรวจเฉพาะคอลัมน์ที่ส่งมา (เช่น ย้ายคอกอย่างเดียว) ส่วนโคใหม่ต้องระบุเพศ
+    # tag ของโคที่คัดออกแล้วถูกปฏิเสธ (เหมือนฟอร์ม/API) — ไม่งั้น upsert จะเขียนทับแถวที่มองไม่เห็น
+    valid, errors = _validate_rows(CattleImportSerializer(partial=True), rows, start_row)
+    existing = lookup_tags(data['tag_no'] for _, data in valid)
+
+    by_tag = {}
+    for index, data in valid:
+        if existing.get(data['tag_no'], (None, False))[1]:
+            errors.append({'row': index, 'errors': _archived_error(data['tag_no'])})
+            continue
+        if data['tag_no'] not in existing and not data.get('gender'):
+            errors.append({'row': index, 'errors': {'gender': ['ต้องระบุเพศสำหรับโคใหม่']}})
+            continue
+        by_tag[data['tag_no']] = Cattle(**data)
+
+    errors.sort(key=lambda e: e['row'])
+    return list(by_tag.values()), errors
+
+
+def upsert_cattle(cattle, update_fields=None, batch_size=1000):
+    # insert หรือ update ตาม tag_no → คืนค่า (เพิ่มใหม่, อัปเดต)
+    # update_fields: อัปเดตเฉพาะคอลัมน์ที่มีในไฟล์ (ค่าเริ่มต้น = ทุกคอลัมน์)
+    if update_fields is None:
+        update_fields = CATTLE_UPSERT_FIELDS
+    existing = lookup_tags(c.tag_no for c in cattle)
+    archived = sorted(tag for tag, (_, is_archived) in existing.items() if is_archived)
+    if archived:
+        raise ValueError(f"โคที่คัดออกแล้ว: {', '.join(archived)} (กู้คืนก่อน upsert)")
+    update_fields = list(update_fields)
+    if 'housing' in update_fields:
+        update_fields.append('pen')
+    if update_fields:
+        conflict_options = {'update_conflicts': True, 'unique_fields': ['tag_no'], 'update_fields': update_fields}
+    else:
+        conflict_options = {'ignore_conflicts': True}
+    with transaction.atomic():
+        # คอกเดิมของโคที่ถูกย้าย + คอกใหม่ ต้องนับยอดใหม่ทั้งคู่
+        moved_from = pens_of(pk for pk, _ in existing.values()) if 'pen' in update_fields else set()
+        assign_pens(cattle)
+        Cattle.objects.bulk_create(cattle, batch_size=batch_size, **conflict_options)
+        refresh_pens(moved_from | {c.pen_id for c in cattle})
+        touch_tables(Cattle)
+        # update_conflicts ไม่คืน pk ของแถวที่อัปเดต → หา id จาก tag_no อีกรอบ
+        record_changes(Cattle, resolve_tags(c.tag_no for c in cattle).values())
+    invalidate_herd_summary()
+    invalidate_pedigree()
+    invalidate_search_index()
+    invalidate_growth()
+    updated = sum(1 for c in cattle if c.tag_no in existing)
+    return len(cattle) - updated, updated
@@ -0,0 +1,135 @@
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import CalendarEvent, CalendarEventException
+
+# ช่วงเริ่มต้นเมื่อไม่ได้ส่ง start/end มา → เดือนปัจจุบัน + ขอบตารางปฏิทิน
+DEFAULT_WINDOW_PADDING = datetime.timedelta(days=7)
+
+
+def _parse_bound(value):
+    if not value:
+        return None
+    # '+' ใน query string ที่ไม่ได้ encode จะกลายเป็นช่องว่าง
+    value = value.strip().replace(' ', '+')
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValueError(f'รูปแบบวันที่ไม่ถูกต้อง: {value}')
+        dt = datetime.datetime.combine(d, datetime.time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def default_window():
+    today = timezone.localdate()
+    first = today.replace(day=1)
+    next_month = (first + datetime.timedelta(days=32)).replace(day=1)
+    start = timezone.make_aware(datetime.datetime.combine(first, datetime.time.min)) - DEFAULT_WINDOW_PADDING
+    end = timezone.make_aware(datetime.datetime.combine(next_month, datetime.time.min)) + DEFAULT_WINDOW_PADDING
+    return start, end
+
+
+def parse_window(params):
+    # FullCalendar ส่ง ?start=...&end=... มาตามช่วงที่กำลังแสดงอยู่
+    start = _parse_bound(params.get('start'))
+    end = _parse_bound(params.get('end'))
+    if start is None and end is None:
+        return default_window()
+    default_start, default_end = default_window()
+    start = start or (end - (default_end - default_start))
+    end = end or (start + (default_end - default_start))
+    if end <= start:
+        raise ValueError('end ต้องมากกว่า start')
+    return start, end
+
+
+class Occurrence:
+    # ครั้งหนึ่งของกิจกรรมซ้ำ — field อื่นๆ (id, cattle, event_type) อ่านจากชุดกิจกรรม
+    __slots__ = ('event', 'original_start', 'start', 'end', 'title', 'notes')
+
+    def __init__(self, event, original_start, duration, exception=None):
+        self.event = event
+        self.original_start = original_start
+        self.start = original_start
+        self.end = original_start + duration if event.end else None
+        self.title = event.title
+        self.notes = event.notes
+        if exception is not None:
+            self.start = exception.start or self.start
+            self.end = exception.end or (self.start + duration if event.end else None)
+            self.title = exception.title or self.title
+            self.notes = exception.notes or self.notes
+
+    def __getattr__(self, name):
+        return getattr(self.event, name)
+
+
+def _overlaps(item, start, end):
+    return item.start < end and (item.end >= start if item.end else item.start >= start)
+
+
+def _window_queryset(start, end, queryset=None):
+    # กิจกรรมปกติที่คาบเกี่ยวกับช่วง [start, end) + ชุดกิจกรรมซ้ำที่ยังไม่จบก่อน start
+    if queryset is None:
+        queryset = CalendarEvent.objects.all()
+    return queryset.filter(
+        Q(recurrence='') & (Q(end__gte=start) | Q(end__isnull=True, start__gte=start))
+        | ~Q(recurrence='') & (Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=start)),
+        start__lt=end,
+        cattle__archived_at__isnull=True,
+    ).select_related('cattle').order_by('start', 'id')
+
+
+def _exceptions_queryset(series, start, end):
+    # เฉพาะข้อยกเว้นที่ครั้งเดิมหรือเวลาใหม่อยู่ใกล้ช่วงที่ขอ (ย้อนเผื่อความยาวของกิจกรรม)
+    pad = max((event.end - event.start for event in series if event.end), default=datetime.timedelta(0))
+    return CalendarEventException.objects.filter(event__in=[event.pk for event in series]).filter(
+        Q(original_start__gte=start - pad, original_start__lt=end) | Q(start__gte=start - pad, start__lt=end)
+    )
+
+
+def expand(events, exceptions, start, end):
+    # แตกกิจกรรมซ้ำเป็นรายครั้งเฉพาะในช่วง → งานเท่ากับจำนวนครั้งที่แสดงจริง
+    overrides = {}
+    for exception in exceptions:
+        overrides.setdefault(exception.event_id, {})[exception.original_start] = exception
+
+    items = []
+    for event in events:
+        rule = event.rule()
+        if rule is None:
+            items.append(event)
+            continue
+        pending = dict(overrides.get(event.pk, {}))
+        for original_start in rule.starts(start, end):
+            exception = pending.pop(original_start, None)
+            if exception is None or not exception.cancelled:
+                items.append(Occurrence(event, original_start, rule.duration, exception))
+        # ครั้งที่ถูกย้ายเข้ามาในช่วงจากวันอื่น
+        for original_start, exception in pending.items():
+            if not exception.cancelled and exception.start:
+                items.append(Occurrence(event, original_start, rule.duration, exception))
+    items = [item for item in items if _overlaps(item, start, end)]
+    items.sort(key=lambda item: (item.start, item.id))
+    return items
+
+
+def events_in_window(start, end, queryset=None):
+    # กิจกรรมที่คาบเกี่ยวกับช่วง [start, end) — ไม่มี end ถือว่าจบที่ start
+    events = list(_window_queryset(start, end, queryset))
+    series = [event for event in events if event.recurrence]
+    exceptions = _exceptions_queryset(series, start, end) if series else []
+    return expand(events, exceptions, start, end)
+
+
+async def aevents_in_window(start, end, queryset=None):
+    events = [event async for event in _window_queryset(start, end, queryset)]
+    series = [event for event in events if event.recurrence]
+    exceptions = [exception async for exception in _exceptions_queryset(series, start, end)] if series else []
+    return expand(events, exceptions, start, end)
@@ -0,0 +1,97 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Cattle, FeedingRation, HealthCheck, Treatment, Vaccination
+
+EXPORT_CHUNK_SIZE = 2000
+
+# record_type → (model, {คอลัมน์: field ใน ORM}, ordering)
+EXPORT_SOURCES = {
+    'cattle': (Cattle, {
+        'tag_no': 'tag_no',
+        'name': 'name',
+        'gender': 'gender',
+        'breed': 'breed',
+        'category': 'category',
+        'housing': 'housing',
+        'birth_date': 'birth_date',
+        'mother': 'mother',
+        'father': 'father',
+        'status': 'current_status__latest_status',
+        'date': 'current_status__latest_check_date',
+        'weight': 'current_status__latest_weight',
+    }, ('id',)),
+    'healthcheck': (HealthCheck, {
+        'tag_no': 'cattle__tag_no',
+        'date': 'check_date',
+        'status': 'status',
+        'temperature': 'temperature',
+        'heart_rate': 'heart_rate',
+        'weight': 'weight',
+        'notes': 'notes',
+    }, ('cattle_id', 'check_date', 'id')),
+    'treatment': (Treatment, {
+        'tag_no': 'cattle__tag_no',
+        'date': 'treatment_date',
+        'diagnosis': 'diagnosis',
+        'medication': 'medication',
+        'doctor_name': 'doctor_name',
+        'notes': 'notes',
+    }, ('cattle_id', 'treatment_date', 'id')),
+    'vaccination': (Vaccination, {
+        'tag_no': 'cattle__tag_no',
+        'date': 'vaccine_date',
+        'vaccine_name': 'vaccine_name',
+        'next_due_date': 'next_due_date',
+        'doctor_name': 'doctor_name',
+    }, ('cattle_id', 'vaccine_date', 'id')),
+    'ration': (FeedingRation, {
+        'tag_no': 'cattle__tag_no',
+        'ration_id': 'ration_id',
+        'feeding_time': 'feeding_time',
+        'fresh_weight': 'fresh_weight',
+        'dry_weight': 'dry_weight',
+        'supplement': 'supplement',
+    }, ('cattle_id', 'id')),
+}
+
+EXPORT_COLUMNS = ['record_type']
+for _model, _columns, _ordering in EXPORT_SOURCES.values():
+    EXPORT_COLUMNS += [c for c in _columns if c not in EXPORT_COLUMNS]
+
+
+def iter_records(record_types=None, chunk_size=EXPORT_CHUNK_SIZE):
+    # อ่านทีละ chunk จากฐานข้อมูล (server-side cursor บน PostgreSQL) → หน่วยความจำคงที่
+    for record_type, (model, columns, ordering) in EXPORT_SOURCES.items():
+        if record_types and record_type not in record_types:
+            continue
+        names = list(columns)
+        rows = model.objects.order_by(*ordering).values_list(*columns.values())
+        if model is not Cattle:
+            # ประวัติของโคที่คัดออกแล้วไม่ถูก export (Cattle.objects กรองตัวโคให้อยู่แล้ว)
+            rows = rows.filter(cattle__archived_at__isnull=True)
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = {'record_type': record_type}
+            record.update(zip(names, row))
+            yield record
+
+
+class Echo:
+    # csv.writer ต้องการ object ที่มี write() → คืนค่าบรรทัดออกไปตรงๆ
+    def write(self, value):
+        return value
+
+
+def stream_csv(records):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    # BOM ให้ Excel อ่านภาษาไทยได้ถูกต้อง
+    yield '\ufeff' + writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+def stream_ndjson(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
@@ -0,0 +1,140 @@
+import datetime
+import hashlib
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Cattle, FeedingRation, FeedingSlot
+from .services import table_state, touch_tables
+
+# "07:30, 16:30 / น้ำสะอาดตลอดวัน", "7.30 น. และ 16.30 น." → เวลาแต่ละรอบ
+TIME_PATTERN = re.compile(r'(?<!\d)([01]?\d|2[0-3])[:.]([0-5]\d)(?!\d)')
+CENT = Decimal('0.01')
+FEED_PLAN_CACHE_PREFIX = 'cattle:feed_plan'
+
+
+def parse_feeding_times(text):
+    times = {datetime.time(int(hour), int(minute)) for hour, minute in TIME_PATTERN.findall(text or '')}
+    return sorted(times)
+
+
+def _split(weight, parts):
+    # แบ่งปริมาณต่อวันเท่าๆ กัน เศษสตางค์ไปอยู่รอบสุดท้าย → ผลรวมเท่าเดิมพอดี
+    weight = Decimal(weight or 0)
+    portion = (weight / parts).quantize(CENT)
+    return [portion] * (parts - 1) + [weight - portion * (parts - 1)]
+
+
+def slots_for(ration_pk, feeding_time, fresh_weight, dry_weight):
+    times = parse_feeding_times(feeding_time) or [None]
+    fresh = _split(fresh_weight, len(times))
+    dry = _split(dry_weight, len(times))
+    return [
+        FeedingSlot(ration_id=ration_pk, time=time, fresh_weight=fresh[i], dry_weight=dry[i])
+        for i, time in enumerate(times)
+    ]
+
+
+def rebuild_feeding_slots(ration_ids=None, batch_size=5000):
+    # สร้าง FeedingSlot ใหม่จาก feeding_time (ใช้หลัง bulk_create / import ที่ไม่ส่ง signal)
+    rations = FeedingRation.objects.order_by('pk')
+    if ration_ids is not None:
+        ration_ids = list(ration_ids)
+        rations = rations.filter(pk__in=ration_ids)
+    total = 0
+    with transaction.atomic():
+        stale = FeedingSlot.objects.all()
+        if ration_ids is not None:
+            stale = stale.filter(ration_id__in=ration_ids)
+        stale.delete()
+        batch = []
+        for row in rations.values_list('pk', 'feeding_time', 'fresh_weight', 'dry_weight').iterator(chunk_size=batch_size):
+            batch.extend(slots_for(*row))
+            total += 1
+            if len(batch) >= batch_size:
+                FeedingSlot.objects.bulk_create(batch, batch_size=batch_size)
+                batch = []
+        FeedingSlot.objects.bulk_create(batch, batch_size=batch_size)
+        touch_tables(FeedingRation)
+    return total
+
+
+def _kg(value):
+    return float(round(value or 0, 2))
+
+
+def _rollup(rows, key):
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row[key], {key: row[key], 'rations': 0, 'fresh_kg': 0.0, 'dry_kg': 0.0})
+        total['rations'] += row['rations']
+        total['fresh_kg'] += row['fresh_kg']
+        total['dry_kg'] += row['dry_kg']
+    for total in totals.values():
+        total['fresh_kg'] = round(total['fresh_kg'], 2)
+        total['dry_kg'] = round(total['dry_kg'], 2)
+    return sorted(totals.values(), key=lambda total: (total[key] is None, total[key] or ''))
+
+
+def _fed_on(date):
+    # โคที่อยู่ในฝูงวันนั้น: เกิดแล้ว (หรือไม่ระบุวันเกิด) และยังไม่ถูกคัดออกภายในวันนั้น
+    # สูตรอาหารไม่มีประวัติย้อนหลัง → ใช้สูตรปัจจุบันของโคแต่ละตัวเสมอ
+    return (
+        (Q(ration__cattle__birth_date__isnull=True) | Q(ration__cattle__birth_date__lte=date))
+        & (Q(ration__cattle__archived_at__isnull=True) | Q(ration__cattle__archived_at__date__gt=date))
+    )
+
+
+def compute_feed_plan(date):
+    # ใบให้อาหารทั้งฝูงของวันที่ date: GROUP BY คอก × สูตร × รอบ ใน query เดียว ยอดรวมแต่ละมิติคิดต่อจากผลนั้น
+    grouped = (
+        FeedingSlot.objects.filter(_fed_on(date))
+        .values('ration__cattle__housing', 'ration__ration_id', 'time')
+        .annotate(
+            animals=Count('ration__cattle', distinct=True),
+            rations=Count('pk'),
+            fresh=Sum('fresh_weight'),
+            dry=Sum('dry_weight'),
+        )
+        .order_by('ration__cattle__housing', 'ration__ration_id', 'time')
+    )
+    rows = [
+        {
+            'housing': row['ration__cattle__housing'],
+            'ration_id': row['ration__ration_id'],
+            'slot': row['time'].strftime('%H:%M') if row['time'] else None,
+            'animals': row['animals'],
+            'rations': row['rations'],
+            'fresh_kg': _kg(row['fresh']),
+            'dry_kg': _kg(row['dry']),
+        }
+        for row in grouped
+    ]
+    return {
+        'date': date.isoformat(),
+        'rows': rows,
+        'by_housing': _rollup(rows, 'housing'),
+        'by_ration': _rollup(rows, 'ration_id'),
+        'by_slot': _rollup(rows, 'slot'),
+        'total': {
+            'fresh_kg': round(sum(row['fresh_kg'] for row in rows), 2),
+            'dry_kg': round(sum(row['dry_kg'] for row in rows), 2),
+        },
+    }
+
+
+def feed_plan(date=None):
+    # cache ต่อวัน + เวอร์ชันของตาราง (สูตรอาหารหรือคอกเปลี่ยน → key ใหม่ทันที)
+    date = date or timezone.localdate() + datetime.timedelta(days=1)
+    token, _ = table_state(FeedingRation, Cattle)
+    key = f'{FEED_PLAN_CACHE_PREFIX}:{date.isoformat()}:{hashlib.md5(token.encode()).hexdigest()}'
+    plan = cache.get(key)
+    if plan is None:
+        plan = compute_feed_plan(date)
+        cache.set(key, plan, settings.FEED_PLAN_CACHE_TIMEOUT)
+    return plan
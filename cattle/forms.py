@@ -1,6 +1,7 @@
 from django import forms
 from django.utils import timezone
 from .models import Cattle, HealthCheck, CalendarEvent, Vaccination, FeedingRation
+from .importer import IMPORT_KINDS
 
 # สำหรับ HealthCheck status ภาษาไทย
 STATUS_CHOICES = (
@@ -53,12 +54,20 @@ class CattleForm(forms.ModelForm):
                 )
 
         return cattle
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # ไม่บังคับทุกฟิลด์
         for field in self.fields.values():
             field.required = False
 
+    def clean_tag_no(self):
+        # validate_unique มองไม่เห็นโคที่คัดออกแล้ว (Cattle.objects) แต่ tag_no ยัง unique ในฐานข้อมูล
+        tag_no = self.cleaned_data.get('tag_no')
+        if tag_no and Cattle.all_objects.filter(tag_no=tag_no, archived_at__isnull=False).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError('หมายเลขนี้เป็นของโคที่ถูกคัดออกแล้ว')
+        return tag_no
+
 # ------------------ HealthCheckForm ------------------
 class HealthCheckForm(forms.ModelForm):
     status = forms.ChoiceField(choices=STATUS_CHOICES, label='สถานะ')
@@ -134,3 +143,50 @@ class CalendarEventInlineForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         for field in self.fields.values():
             field.required = False   # 👈 optional
+
+
+# ------------------ รอบตรวจทั้งคอก ------------------
+class PenRoundForm(forms.Form):
+    check_date = forms.DateField(
+        label='วันที่ตรวจ',
+        initial=timezone.localdate,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+    )
+
+
+class PenRoundRowForm(HealthCheckForm):
+    # หนึ่งแถวต่อโค — วันที่ตรวจใช้ร่วมกันจาก PenRoundForm
+    cattle = forms.IntegerField(widget=forms.HiddenInput)
+    include = forms.BooleanField(required=False, initial=True, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+
+    class Meta(HealthCheckForm.Meta):
+        fields = ['temperature', 'heart_rate', 'weight', 'status', 'notes']
+        widgets = {
+            **HealthCheckForm.Meta.widgets,
+            'notes': forms.TextInput(attrs={'class': 'form-control form-control-sm'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['status'].widget.attrs['class'] = 'form-select form-select-sm'
+
+
+PenRoundFormSet = forms.formset_factory(PenRoundRowForm, extra=0)
+
+
+# ------------------ ImportForm ------------------
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(
+        choices=list(IMPORT_KINDS.items()),
+        label='ประเภทข้อมูล',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    file = forms.FileField(
+        label='ไฟล์ (.csv หรือ .xlsx)',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+    dry_run = forms.BooleanField(
+        label='ตรวจสอบอย่างเดียว (ไม่บันทึก)',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
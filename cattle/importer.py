@@ -0,0 +1,144 @@
+import codecs
+import csv
+import datetime
+import io
+import os
+import zipfile
+from itertools import islice
+
+from django.db import transaction
+
+from .bulk import (
+    CATTLE_UPSERT_FIELDS, save_healthchecks, upsert_cattle, validate_cattle, validate_healthchecks,
+)
+
+IMPORT_BATCH_SIZE = 1000
+# ส่วนต้นไฟล์ที่ใช้ตรวจว่าเป็น UTF-8 หรือไม่ (Excel ภาษาไทยบันทึก CSV เป็น cp874/TIS-620)
+CSV_SNIFF_BYTES = 64 * 1024
+
+IMPORT_KINDS = {
+    'cattle': 'ข้อมูลโค',
+    'healthcheck': 'ประวัติสุขภาพ (HealthCheck)',
+}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def _clean(row):
+    # ตัดช่องว่าง และแปลงช่องว่างเปล่าเป็น None
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        cleaned[str(key).strip()] = value
+    return cleaned
+
+
+def _csv_encoding(file):
+    head = file.read(CSV_SNIFF_BYTES)
+    file.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return 'cp874'
+    return 'utf-8-sig'
+
+
+def _read_csv(file):
+    encoding = _csv_encoding(file)
+    text = io.TextIOWrapper(file, encoding=encoding, newline='')
+    reader = csv.DictReader(text)
+    try:
+        for row in reader:
+            yield _clean(row)
+    except UnicodeDecodeError:
+        raise ImportFileError(
+            f'อ่านไฟล์ CSV ไม่ได้ (หลังบรรทัด {reader.line_num}): ไม่ใช่ข้อความ UTF-8 หรือ TIS-620 '
+            '— บันทึกเป็น "CSV UTF-8" แล้วลองใหม่'
+        ) from None
+    except csv.Error as e:
+        raise ImportFileError(f'ไฟล์ CSV ไม่ถูกต้อง (บรรทัด {reader.line_num}): {e}') from None
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFileError('ต้องติดตั้ง openpyxl เพื่อนำเข้าไฟล์ Excel (.xlsx)')
+
+    # ไฟล์ที่ไม่ใช่ zip / zip ที่ไม่มีส่วนของ workbook / XML ในไฟล์เสีย (ParseError เป็น SyntaxError)
+    broken = (zipfile.BadZipFile, KeyError, SyntaxError, InvalidFileException)
+    message = 'ไฟล์ Excel เสียหายหรือไม่ใช่ไฟล์ .xlsx — เปิดใน Excel แล้วบันทึกเป็น .xlsx ใหม่'
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except broken:
+        raise ImportFileError(message) from None
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or []
+        header = [str(h).strip() if h is not None else None for h in header]
+        for values in rows:
+            if not any(v is not None for v in values):
+                continue
+            # เซลล์วันที่ใน Excel อ่านออกมาเป็น datetime
+            values = [v.date() if isinstance(v, datetime.datetime) and v.time() == datetime.time.min else v for v in values]
+            yield _clean(dict(zip(header, values)))
+    except broken:
+        raise ImportFileError(message) from None
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.csv':
+        return _read_csv(file)
+    if ext in ('.xlsx', '.xlsm'):
+        return _read_xlsx(file)
+    raise ImportFileError(f'ไม่รองรับไฟล์ประเภท {ext or filename} (ใช้ .csv หรือ .xlsx)')
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_rows(kind, rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    # นำเข้าเป็นชุดละ batch_size แถว ใน transaction เดียว
+    # แถวที่ผิดจะถูกข้ามและรายงานใน errors, dry_run=True ตรวจอย่างเดียวไม่บันทึก
+    if kind not in IMPORT_KINDS:
+        raise ImportFileError(f'ไม่รู้จักประเภทข้อมูล: {kind}')
+
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'errors': []}
+    with transaction.atomic():
+        for batch in _batches(rows, batch_size):
+            start_row = result['rows']
+            result['rows'] += len(batch)
+
+            if kind == 'cattle':
+                cattle, errors = validate_cattle(batch, start_row=start_row)
+                if cattle and not dry_run:
+                    columns = set().union(*(row.keys() for row in batch))
+                    update_fields = [f for f in CATTLE_UPSERT_FIELDS if f in columns]
+                    created, updated = upsert_cattle(cattle, update_fields=update_fields, batch_size=batch_size)
+                    result['created'] += created
+                    result['updated'] += updated
+            else:
+                checks, errors = validate_healthchecks(batch, start_row=start_row)
+                if checks and not dry_run:
+                    result['created'] += save_healthchecks(checks, batch_size=batch_size)
+
+            result['errors'] += errors
+            if progress:
+                progress(result)
+    return result
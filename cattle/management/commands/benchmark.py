@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cattle.benchmark import REGRESSION_THRESHOLD, compare, load_results, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'วัดเวลา/จำนวน query ของหน้าหลักและ API แล้วบันทึกผลเป็น JSON (ใช้ร่วมกับ generate_herd)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='จำนวนรอบที่วัดต่อ scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='รอบอุ่นเครื่องที่ไม่นับ')
+        parser.add_argument('--samples', type=int, default=5, help='จำนวนโคตัวอย่างสำหรับหน้ารายตัว')
+        parser.add_argument('--cold', action='store_true', help='ล้าง cache ก่อนทุก request')
+        parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='วัดเฉพาะ scenario ที่ระบุ')
+        parser.add_argument('--label', default='', help='ชื่อรอบ เช่น เวอร์ชันหรือ commit')
+        parser.add_argument('--output', help='บันทึกผลเป็นไฟล์ JSON')
+        parser.add_argument('--compare', metavar='BASELINE', help='เทียบกับผลรอบก่อน (ไฟล์ JSON)')
+        parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='p95 ช้าลงเกินกี่ %% ถือว่า regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        def progress(name, run):
+            ms = sorted(run['ms'])
+            self.stdout.write(
+                f"  {name:<26} p50 {ms[len(ms) // 2]:8.1f} ms  queries {max(run['queries']):4d}"
+            )
+
+        results = run_benchmark(
+            repeat=options['repeat'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            only=options['only'],
+            samples=options['samples'],
+            label=options['label'],
+            progress=progress,
+        )
+        herd = ', '.join(f'{kind} {count:,}' for kind, count in results['herd'].items())
+        self.stdout.write(f'ฝูง: {herd}')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"บันทึกผลที่ {options['output']}"))
+
+        if options['compare']:
+            rows = compare(load_results(options['compare']), results, options['threshold'])
+            for row in rows:
+                line = (
+                    f"  {row['scenario']:<26} p50 {row['p50_change_pct'] or 0:+6.1f}%  "
+                    f"p95 {row['p95_change_pct'] or 0:+6.1f}%  queries {row['queries_change']:+d}"
+                )
+                self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+            regressions = [row['scenario'] for row in rows if row['regression']]
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"regression: {', '.join(regressions)}")
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cattle.synthetic import generate_herd
+
+
+class Command(BaseCommand):
+    help = 'สร้างฟาร์มจำลอง (โค, HealthCheck, วัคซีน, อาหาร, ปฏิทิน) สำหรับทดสอบประสิทธิภาพ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cattle', type=int, default=1000, help='จำนวนโค เช่น 1000, 100000, 1000000')
+        parser.add_argument('--checks', type=int, default=24, help='HealthCheck เฉลี่ยต่อตัว')
+        parser.add_argument('--vaccinations', type=int, default=3, help='วัคซีนเฉลี่ยต่อตัว')
+        parser.add_argument('--rations', type=int, default=1, help='สูตรอาหารเฉลี่ยต่อตัว')
+        parser.add_argument('--events', type=int, default=2, help='กิจกรรมปฏิทินเฉลี่ยต่อตัว')
+        parser.add_argument('--history-days', type=int, default=3 * 365, help='ย้อนหลังกี่วัน')
+        parser.add_argument('--prefix', default='SYN', help='คำนำหน้าหมายเลขโค (ต้องไม่ซ้ำกับข้อมูลเดิม)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(created):
+            self.stdout.write(
+                f"  โค {created['cattle']:,}/{options['cattle']:,} "
+                f"(HealthCheck {created['healthcheck']:,}) {time.perf_counter() - started:.0f}s"
+            )
+
+        created = generate_herd(
+            cattle=options['cattle'],
+            checks_per_animal=options['checks'],
+            vaccinations_per_animal=options['vaccinations'],
+            rations_per_animal=options['rations'],
+            events_per_animal=options['events'],
+            history_days=options['history_days'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        summary = ', '.join(f'{kind} {count:,}' for kind, count in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'สร้างฟาร์มจำลองเสร็จใน {time.perf_counter() - started:.1f}s: {summary}'
+        ))
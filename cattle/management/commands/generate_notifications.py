@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cattle.notifications import generate_notifications
+
+
+class Command(BaseCommand):
+    help = 'สร้างการแจ้งเตือนวัคซีน ตรวจสุขภาพ และชั่งน้ำหนักที่ถึงกำหนด (รันซ้ำได้ ไม่สร้างซ้ำ)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-days', type=int, help='แจ้งเตือนวัคซีนล่วงหน้ากี่วัน')
+        parser.add_argument('--checkup-days', type=int, help='ไม่ได้ตรวจสุขภาพเกินกี่วัน')
+        parser.add_argument('--weight-days', type=int, help='ไม่ได้ชั่งน้ำหนักเกินกี่วัน')
+        parser.add_argument(
+            '--every', type=int, metavar='SECONDS',
+            help='รันต่อเนื่องทุกๆ SECONDS วินาที (scheduler ในโปรเซส)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = generate_notifications(
+                lead_days=options['lead_days'],
+                checkup_days=options['checkup_days'],
+                weight_days=options['weight_days'],
+            )
+            candidates = ', '.join(f'{kind} {count}' for kind, count in result['candidates'].items())
+            self.stdout.write(self.style.SUCCESS(
+                f"สร้างการแจ้งเตือนใหม่ {result['created']} รายการ (ตรวจพบ: {candidates})"
+            ))
+            if not options['every']:
+                break
+            close_old_connections()
+            time.sleep(options['every'])
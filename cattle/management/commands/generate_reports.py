@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cattle.reports import REPORT_BATCH_SIZE, generate_monthly_reports
+
+
+class Command(BaseCommand):
+    help = 'สร้างรายงานสุขภาพรายเดือนของโคทุกตัวแบบขนานหลาย process (รันซ้ำเดือนเดิม = แทนที่ของเดิม)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', metavar='YYYY-MM', help='เดือนของรายงาน (ค่าเริ่มต้น: เดือนที่แล้ว)')
+        parser.add_argument('--workers', type=int, help='จำนวน process (ค่าเริ่มต้น: REPORT_WORKERS หรือจำนวน CPU)')
+        parser.add_argument('--batch-size', type=int, default=REPORT_BATCH_SIZE, help='จำนวนโคต่อชุดที่ส่งให้แต่ละ process')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month ต้องอยู่ในรูปแบบ YYYY-MM')
+        else:
+            month = (timezone.localdate().replace(day=1) - datetime.timedelta(days=1))
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total}')
+
+        start = time.perf_counter()
+        count = generate_monthly_reports(
+            month.year, month.month,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'สร้างรายงานเดือน {month:%Y-%m} จำนวน {count} ฉบับ ใน {time.perf_counter() - start:.1f} วินาที'
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cattle.importer import IMPORT_BATCH_SIZE, IMPORT_KINDS, ImportFileError, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = 'นำเข้าข้อมูลโคหรือ HealthCheck จากไฟล์ CSV/Excel (upsert ตาม tag_no)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORT_KINDS))
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help='ตรวจสอบข้อมูลอย่างเดียว ไม่บันทึก')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(f"  ... {result['rows']} แถว (ผิดพลาด {len(result['errors'])})")
+
+        try:
+            with open(options['path'], 'rb') as f:
+                rows = read_rows(f, options['path'])
+                result = import_rows(
+                    options['kind'],
+                    rows,
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size'],
+                    progress=progress,
+                )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors'][:50]:
+            self.stderr.write(f"แถว {error['row'] + 2}: {error['errors']}")
+        if len(result['errors']) > 50:
+            self.stderr.write(f"... และอีก {len(result['errors']) - 50} แถว")
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}อ่าน {result['rows']} แถว: เพิ่ม {result['created']}, อัปเดต {result['updated']}, "
+            f"ผิดพลาด {len(result['errors'])}"
+        ))
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from cattle.benchmark import LOAD_CONCURRENCY, compare_load, feed_paths, load_results, run_load_test, sample_cattle
+
+
+class Command(BaseCommand):
+    help = 'ยิง request พร้อมกันไปยังเซิร์ฟเวอร์ที่รันอยู่ เพื่อวัด throughput ของ JSON feed (เทียบ WSGI กับ ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='URL ของเซิร์ฟเวอร์ที่จะทดสอบ')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=list(LOAD_CONCURRENCY),
+            help='จำนวน request พร้อมกัน (วัดทีละระดับ)',
+        )
+        parser.add_argument('--requests', type=int, default=500, help='จำนวน request ต่อระดับ')
+        parser.add_argument('--path', nargs='+', help='path ที่จะยิง (ค่าเริ่มต้น: feed ปฏิทิน สรุปฝูง และค้นหา)')
+        parser.add_argument('--samples', type=int, default=3, help='จำนวนโคตัวอย่างสำหรับ path ค้นหา')
+        parser.add_argument('--timeout', type=float, default=30.0, help='timeout ต่อ request (วินาที)')
+        parser.add_argument('--label', default='', help='ชื่อรอบ เช่น wsgi หรือ asgi')
+        parser.add_argument('--output', help='บันทึกผลเป็นไฟล์ JSON')
+        parser.add_argument('--compare', metavar='BASELINE', help='เทียบกับผลรอบก่อน (ไฟล์ JSON)')
+
+    def handle(self, *args, **options):
+        def progress(result):
+            latency = result['latency_ms']
+            status = ', '.join(f'{code}: {count}' for code, count in sorted(result['status'].items()))
+            self.stdout.write(
+                f"  concurrency {result['concurrency']:4d}  {result['rps']:8.1f} req/s  "
+                f"p50 {latency['p50']:8.1f} ms  p95 {latency['p95']:8.1f} ms  ({status})"
+            )
+
+        paths = options['path'] or feed_paths(sample_cattle(options['samples']))
+        results = run_load_test(
+            options['base_url'],
+            paths,
+            concurrency=options['concurrency'],
+            requests=options['requests'],
+            timeout=options['timeout'],
+            label=options['label'],
+            progress=progress,
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"บันทึกผลที่ {options['output']}"))
+
+        if options['compare']:
+            for row in compare_load(load_results(options['compare']), results):
+                self.stdout.write(
+                    f"  concurrency {row['concurrency']:4d}  req/s {row['rps_before']:8.1f} → {row['rps_after']:8.1f} "
+                    f"({row['rps_change_pct'] or 0:+.1f}%)  p95 {row['p95_before']:.1f} → {row['p95_after']:.1f} ms"
+                )
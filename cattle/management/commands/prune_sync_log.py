@@ -0,0 +1,25 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cattle.sync import SYNC_PRUNE_BATCH_SIZE, prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'ลบ change log ของ delta sync ที่เก่ากว่ากำหนด (แท็บเล็ตที่ token เก่ากว่านี้จะดาวน์โหลดใหม่ทั้งหมด)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='เก็บไว้กี่วัน (ค่าเริ่มต้น: SYNC_LOG_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=SYNC_PRUNE_BATCH_SIZE, help='จำนวน seq ต่อคำสั่ง DELETE')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = settings.SYNC_LOG_RETENTION_DAYS
+        deleted = prune_change_log(
+            before=timezone.now() - datetime.timedelta(days=days),
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'ลบ change log {deleted} รายการ'))
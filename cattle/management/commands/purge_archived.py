@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cattle.archive import PURGE_BATCH_SIZE, purge_archived
+
+
+class Command(BaseCommand):
+    help = 'ลบโคที่คัดออกแล้วพร้อมประวัติทั้งหมด ทีละชุดด้วย DELETE ที่ฐานข้อมูล (หยุดแล้วรันใหม่ได้)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int,
+            help='ลบเฉพาะโคที่คัดออกมานานกว่านี้ (ค่าเริ่มต้น: ARCHIVE_RETENTION_DAYS)',
+        )
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='จำนวนแถวต่อคำสั่ง DELETE')
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        if days is None:
+            days = settings.ARCHIVE_RETENTION_DAYS
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total}')
+
+        start = time.perf_counter()
+        totals = purge_archived(
+            before=timezone.now() - datetime.timedelta(days=days),
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        for table, count in totals.items():
+            self.stdout.write(f'  {table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'ลบโคที่คัดออก {totals["cattle"]} ตัว ใน {time.perf_counter() - start:.1f} วินาที'
+        ))
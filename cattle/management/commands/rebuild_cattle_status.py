@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cattle.services import rebuild_cattle_status
+
+
+class Command(BaseCommand):
+    help = 'คำนวณสถานะล่าสุดของโคทุกตัวใหม่จาก HealthCheck'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_cattle_status(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'อัปเดตสถานะโค {total} ตัวเรียบร้อยแล้ว'))
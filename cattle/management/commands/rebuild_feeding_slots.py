@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cattle.feeding import rebuild_feeding_slots
+
+
+class Command(BaseCommand):
+    help = 'แยกเวลาให้อาหาร (feeding_time) ของทุกสูตรอาหารเป็นรอบ (FeedingSlot) ใหม่ทั้งฝูง'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = rebuild_feeding_slots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'อัปเดตรอบการให้อาหารของ {total} สูตรเรียบร้อยแล้ว'))
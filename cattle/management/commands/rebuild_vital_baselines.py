@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cattle.vitals import rebuild_vital_baselines
+
+
+class Command(BaseCommand):
+    help = 'คำนวณค่าปกติของอุณหภูมิ/ชีพจรและตรวจหาค่าผิดปกติของทุก HealthCheck ใหม่ทั้งฝูง'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_vital_baselines(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'อัปเดตค่าปกติของโค {total} ตัวเรียบร้อยแล้ว'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cattle.snapshot import refresh_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = 'สร้าง/ต่อท้าย columnar snapshot ของ HealthCheck (ไฟล์ .npy) สำหรับงานวิเคราะห์'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='สร้างใหม่ทั้งหมดแทนการต่อท้าย')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = refresh_snapshot(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"snapshot ({result['mode']}) เพิ่ม {result['added']:,} แถว รวม {result['rows']:,} แถว "
+            f"ที่ {snapshot_dir()} ใน {time.perf_counter() - started:.1f}s"
+        ))
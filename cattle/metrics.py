@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# ตัวเก็บ metrics ในหน่วยความจำของโปรเซส เขียนรูปแบบ Prometheus text เอง ไม่ต้องพึ่ง prometheus_client
+# หลาย worker (gunicorn -w N): ตั้ง METRICS_DIR → แต่ละ worker เขียนค่าของตัวเองลงไฟล์ /metrics รวมทุกไฟล์
+# ถ้าไม่ตั้ง /metrics เห็นเฉพาะ worker ที่ตอบ request นั้น (ถูกต้องเฉพาะ server แบบ worker เดียว)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# จำนวน SQL สูงสุดที่เก็บไว้ต่อ request สำหรับ slow request log
+MAX_LOGGED_QUERIES = 200
+# method อื่นนอกจากนี้นับรวมเป็น OTHER → client ส่ง method แปลกๆ มาไม่ทำให้ series งอกไม่จำกัด
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'})
+# เขียนไฟล์ของ worker ไม่บ่อยกว่านี้ (วินาที) — /metrics เขียนของตัวเองทันทีก่อนรวม
+FLUSH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+# (pid, เวลาที่เขียนไฟล์ล่าสุด) ของโปรเซสนี้ — pid เปลี่ยนหลัง fork
+_flushed = (None, 0.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        with _lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return value if total is None else total + value
+
+    def render(self, series=None):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted((self.series if series is None else series).items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels → [นับต่อช่อง (ไม่สะสม) ..., +Inf, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            row = self.series.get(labels)
+            if row is None:
+                row = self.series[labels] = [0] * (len(self.buckets) + 1) + [0]
+            row[index] += 1
+            row[-1] += value
+
+    @staticmethod
+    def merge(total, row):
+        return list(row) if total is None else [a + b for a, b in zip(total, row)]
+
+    def render(self, series=None):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, row in sorted((self.series if series is None else series).items()):
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), row[:-1]):
+                total += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", bound)])} {total}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(row[-1])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {total}'
+
+
+REQUESTS = Counter(
+    'cattle_http_requests_total', 'จำนวน request แยกตาม view และ status', ('view', 'method', 'status'),
+)
+LATENCY = Histogram(
+    'cattle_http_request_duration_seconds', 'เวลาตอบ request (วินาที)', ('view', 'method'), LATENCY_BUCKETS,
+)
+QUERY_COUNT = Histogram(
+    'cattle_db_queries_per_request', 'จำนวน SQL query ต่อ request', ('view',), QUERY_COUNT_BUCKETS,
+)
+QUERY_TIME = Histogram(
+    'cattle_db_query_seconds_per_request', 'เวลารวมของ SQL ต่อ request (วินาที)', ('view',), QUERY_TIME_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'cattle_http_response_size_bytes', 'ขนาด response (ไม่รวม streaming)', ('view',), SIZE_BUCKETS,
+)
+SLOW_REQUESTS = Counter(
+    'cattle_http_slow_requests_total', 'จำนวน request ที่ช้ากว่า SLOW_REQUEST_MS', ('view',),
+)
+REGISTRY = (REQUESTS, LATENCY, QUERY_COUNT, QUERY_TIME, RESPONSE_SIZE, SLOW_REQUESTS)
+
+
+class QueryRecorder:
+    # ใช้กับ connection.execute_wrapper → นับ query ได้โดยไม่ต้องเปิด DEBUG
+    __slots__ = ('count', 'duration', 'statements', 'keep_sql')
+
+    def __init__(self, keep_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self.keep_sql = keep_sql
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.keep_sql and len(self.statements) < MAX_LOGGED_QUERIES:
+                self.statements.append((elapsed, sql))
+
+
+# recorder ของ request ปัจจุบัน — ใช้ ContextVar เพราะ async view รัน query ใน thread ของ sync_to_async
+# (connection เป็นของแต่ละ thread) แต่ context ถูกส่งต่อไปด้วยเสมอ
+_current_recorder = ContextVar('cattle_query_recorder', default=None)
+
+
+def _dispatch(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _install(connection):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    _install(connection)
+
+
+connection_created.connect(_install_on_connect)
+
+
+@contextmanager
+def recording(recorder):
+    # นับ query ทุก connection ทุก thread ที่ทำงานให้ request นี้
+    for connection in connections.all():
+        _install(connection)
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+def record_request(view, method, status, duration, queries, size=None):
+    method = method if method in HTTP_METHODS else 'OTHER'
+    REQUESTS.inc((view, method, status))
+    LATENCY.observe((view, method), duration)
+    QUERY_COUNT.observe((view,), queries.count)
+    QUERY_TIME.observe((view,), queries.duration)
+    if size is not None:
+        RESPONSE_SIZE.observe((view,), size)
+    flush()
+
+
+# ---------------- หลาย worker (METRICS_DIR) ----------------
+def flush(force=False):
+    # เขียนค่าของโปรเซสนี้ลง <METRICS_DIR>/<pid>.json (เขียนไฟล์ชั่วคราวแล้ว rename → ผู้อ่านไม่เห็นไฟล์ครึ่งๆ)
+    # ไฟล์ของ worker ที่ตายแล้วยังถูกรวมต่อ (counter ไม่ลดลง) — ล้างโฟลเดอร์ตอนเริ่ม server ใหม่ทั้งชุด
+    global _flushed
+    if not settings.METRICS_DIR:
+        return
+    pid, now = os.getpid(), time.monotonic()
+    if not force and _flushed[0] == pid and now - _flushed[1] < FLUSH_INTERVAL:
+        return
+    _flushed = (pid, now)
+    with _lock:
+        data = {metric.name: [[list(labels), value] for labels, value in metric.series.items()] for metric in REGISTRY}
+    folder = Path(settings.METRICS_DIR)
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp = folder / f'{pid}.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, folder / f'{pid}.json')
+
+
+def _collect():
+    # series ของทุก worker รวมกัน → {ชื่อ metric: {labels: ค่า}}
+    merged = {metric.name: {} for metric in REGISTRY}
+    for path in Path(settings.METRICS_DIR).glob('*.json'):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # worker กำลังเขียน / ไฟล์เสีย → รอบหน้าค่อยนับ
+        for metric in REGISTRY:
+            series = merged[metric.name]
+            for labels, value in data.get(metric.name, []):
+                labels = tuple(labels)
+                series[labels] = metric.merge(series.get(labels), value)
+    return merged
+
+
+def render_metrics():
+    lines = []
+    if settings.METRICS_DIR:
+        flush(force=True)
+        merged = _collect()
+        for metric in REGISTRY:
+            lines.extend(metric.render(merged[metric.name]))
+    else:
+        with _lock:
+            for metric in REGISTRY:
+                lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,62 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import SLOW_REQUESTS, QueryRecorder, record_request, recording
+
+slow_logger = logging.getLogger('cattle.slow_requests')
+
+
+class MetricsMiddleware:
+    # วัดเวลา / จำนวน query / ขนาด response ต่อ URL name แล้วส่งออกที่ /metrics
+    # request ที่ช้ากว่า SLOW_REQUEST_MS จะถูก log พร้อม SQL ที่รัน
+    # รองรับทั้ง WSGI และ ASGI (ไม่บังคับให้ async view ถูกแปลงเป็น sync)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        queries = QueryRecorder(keep_sql=settings.SLOW_REQUEST_MS > 0)
+        start = time.perf_counter()
+        with recording(queries):
+            response = self.get_response(request)
+        self.record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        queries = QueryRecorder(keep_sql=settings.SLOW_REQUEST_MS > 0)
+        start = time.perf_counter()
+        with recording(queries):
+            response = await self.get_response(request)
+        self.record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, queries, duration):
+        match = request.resolver_match
+        view = (match.view_name if match else None) or '<unmatched>'
+        size = None if response.streaming else len(response.content)
+        record_request(view, request.method, response.status_code, duration, queries, size)
+
+        slow_ms = settings.SLOW_REQUEST_MS
+        if slow_ms and duration * 1000 >= slow_ms:
+            SLOW_REQUESTS.inc((view,))
+            slow_logger.warning(
+                'slow request %s %s (%s) %.0f ms, %d queries %.0f ms\n%s',
+                request.method, request.get_full_path(), view, duration * 1000,
+                queries.count, queries.duration * 1000,
+                '\n'.join(f'  [{elapsed * 1000:.1f} ms] {sql}' for elapsed, sql in queries.statements),
+            )
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.13 on 2026-10-17 19:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def populate_cattle_status(apps, schema_editor):
+    Cattle = apps.get_model('cattle', 'Cattle')
+    CattleStatus = apps.get_model('cattle', 'CattleStatus')
+    HealthCheck = apps.get_model('cattle', 'HealthCheck')
+
+    latest = HealthCheck.objects.filter(cattle=models.OuterRef('pk')).order_by('-check_date', '-id')
+    rows = Cattle.objects.annotate(
+        latest_status=models.Subquery(latest.values('status')[:1]),
+        latest_check_date=models.Subquery(latest.values('check_date')[:1]),
+        latest_weight=models.Subquery(latest.values('weight')[:1]),
+    ).filter(latest_status__isnull=False).values_list('pk', 'latest_status', 'latest_check_date', 'latest_weight')
+
+    now = timezone.now()
+    CattleStatus.objects.bulk_create(
+        [
+            CattleStatus(cattle_id=pk, latest_status=status, latest_check_date=check_date, latest_weight=weight, updated_at=now)
+            for pk, status, check_date, weight in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0011_alter_cattle_father_alter_cattle_mother'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CattleStatus',
+            fields=[
+                ('cattle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_status', serialize=False, to='cattle.cattle')),
+                ('latest_status', models.CharField(blank=True, choices=[('healthy', 'ปกติ'), ('sick', 'ป่วย'), ('forsale', 'พร้อมขาย')], max_length=20, null=True)),
+                ('latest_check_date', models.DateField(blank=True, null=True)),
+                ('latest_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['cattle', '-check_date', '-id'], name='healthcheck_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cattlestatus',
+            index=models.Index(fields=['latest_status'], name='cattlestatus_status_idx'),
+        ),
+        migrations.RunPython(populate_cattle_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.13 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0012_cattlestatus'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['start', 'end'], name='calendarevent_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['end', 'start'], name='calendarevent_end_idx'),
+        ),
+    ]
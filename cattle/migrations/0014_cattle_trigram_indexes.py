@@ -0,0 +1,37 @@
+from django.db import migrations
+
+TRIGRAM_FIELDS = ['tag_no', 'name', 'breed', 'housing']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN trigram index มีเฉพาะ PostgreSQL — SQLite ใช้ n-gram index ในหน่วยความจำแทน (cattle/search.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in TRIGRAM_FIELDS:
+        # ตัวแรกใช้กับ % (similarity) ตัวที่สองใช้กับ __icontains (Django แปลงเป็น UPPER(...) LIKE UPPER(...))
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS cattle_{field}_trgm ON cattle_cattle USING gin ({field} gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS cattle_{field}_upper_trgm ON cattle_cattle USING gin (UPPER({field}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS cattle_{field}_trgm')
+        schema_editor.execute(f'DROP INDEX IF EXISTS cattle_{field}_upper_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0013_calendarevent_window_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
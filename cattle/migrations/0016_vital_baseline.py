@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0015_notification_source_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VitalBaseline',
+            fields=[
+                ('cattle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vital_baseline', serialize=False, to='cattle.cattle')),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('temperature_mean', models.FloatField(default=0)),
+                ('temperature_m2', models.FloatField(default=0)),
+                ('heart_rate_count', models.PositiveIntegerField(default=0)),
+                ('heart_rate_mean', models.FloatField(default=0)),
+                ('heart_rate_m2', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='healthcheck',
+            name='heart_rate_zscore',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='healthcheck',
+            name='is_anomaly',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='healthcheck',
+            name='temperature_zscore',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(condition=models.Q(('is_anomaly', True)), fields=['-check_date'], name='healthcheck_anomaly_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0017_table_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='kind',
+            field=models.CharField(choices=[('manual', 'เขียนเอง'), ('monthly', 'รายเดือน')], default='manual', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='period_end',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='period_start',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(fields=('cattle', 'kind', 'period_start'), name='report_unique_period'),
+        ),
+    ]
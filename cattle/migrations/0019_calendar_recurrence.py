@@ -0,0 +1,69 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0018_report_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarEventException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('cancelled', models.BooleanField(default=False)),
+                ('start', models.DateTimeField(blank=True, null=True)),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, max_length=200, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='interval',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence',
+            field=models.CharField(blank=True, choices=[('', 'ไม่ซ้ำ'), ('daily', 'ทุกวัน'), ('weekly', 'ทุกสัปดาห์')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='until',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='weekdays',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(condition=models.Q(('recurrence', ''), _negated=True), fields=['recurrence_end', 'start'], name='calendarevent_recurring_idx'),
+        ),
+        migrations.AddField(
+            model_name='calendareventexception',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='cattle.calendarevent'),
+        ),
+        migrations.AddConstraint(
+            model_name='calendareventexception',
+            constraint=models.UniqueConstraint(fields=('event', 'original_start'), name='calendarevent_exception_unique'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:31
+
+import datetime
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TIME_PATTERN = re.compile(r'(?<!\d)([01]?\d|2[0-3])[:.]([0-5]\d)(?!\d)')
+
+
+def _split(weight, parts):
+    weight = Decimal(weight or 0)
+    portion = (weight / parts).quantize(Decimal('0.01'))
+    return [portion] * (parts - 1) + [weight - portion * (parts - 1)]
+
+
+def populate_feeding_slots(apps, schema_editor):
+    FeedingRation = apps.get_model('cattle', 'FeedingRation')
+    FeedingSlot = apps.get_model('cattle', 'FeedingSlot')
+
+    batch = []
+    rows = FeedingRation.objects.values_list('pk', 'feeding_time', 'fresh_weight', 'dry_weight')
+    for pk, feeding_time, fresh_weight, dry_weight in rows.iterator():
+        times = sorted({datetime.time(int(h), int(m)) for h, m in TIME_PATTERN.findall(feeding_time or '')}) or [None]
+        fresh = _split(fresh_weight, len(times))
+        dry = _split(dry_weight, len(times))
+        batch.extend(
+            FeedingSlot(ration_id=pk, time=time, fresh_weight=fresh[i], dry_weight=dry[i])
+            for i, time in enumerate(times)
+        )
+        if len(batch) >= 5000:
+            FeedingSlot.objects.bulk_create(batch)
+            batch = []
+    FeedingSlot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0019_calendar_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedingSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.TimeField(blank=True, null=True)),
+                ('fresh_weight', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('dry_weight', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('ration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='cattle.feedingration')),
+            ],
+            options={
+                'ordering': ['time'],
+            },
+        ),
+        migrations.RunPython(populate_feeding_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def populate_housing(apps, schema_editor):
+    Cattle = apps.get_model('cattle', 'Cattle')
+    Housing = apps.get_model('cattle', 'Housing')
+
+    names = {
+        (name or '').strip()
+        for name in Cattle.objects.exclude(housing__isnull=True).values_list('housing', flat=True).distinct()
+    } - {''}
+    Housing.objects.bulk_create([Housing(name=name) for name in sorted(names)], batch_size=1000)
+    pens = dict(Housing.objects.values_list('name', 'pk'))
+    # ชื่อคอกที่ต่างกันแค่ช่องว่างหน้า/หลังรวมเป็นคอกเดียว
+    for housing in Cattle.objects.exclude(housing__isnull=True).values_list('housing', flat=True).distinct():
+        pen_id = pens.get(housing.strip())
+        if pen_id:
+            Cattle.objects.filter(housing=housing).update(pen_id=pen_id)
+
+    rollup = Cattle.objects.filter(pen__isnull=False).values('pen_id').annotate(
+        head_count=models.Count('pk'),
+        sick_count=models.Count('pk', filter=models.Q(current_status__latest_status='sick')),
+        for_sale_count=models.Count('pk', filter=models.Q(current_status__latest_status='forsale')),
+        avg_weight=models.Avg('current_status__latest_weight'),
+    ).order_by()
+    now = timezone.now()
+    for row in rollup:
+        avg_weight = row['avg_weight']
+        Housing.objects.filter(pk=row['pen_id']).update(
+            head_count=row['head_count'],
+            sick_count=row['sick_count'],
+            for_sale_count=row['for_sale_count'],
+            avg_weight=round(avg_weight, 2) if avg_weight is not None else None,
+            updated_at=now,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0020_feedingslot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Housing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('head_count', models.PositiveIntegerField(default=0)),
+                ('sick_count', models.PositiveIntegerField(default=0)),
+                ('for_sale_count', models.PositiveIntegerField(default=0)),
+                ('avg_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cattle',
+            name='pen',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cattle', to='cattle.housing'),
+        ),
+        migrations.RunPython(populate_housing, migrations.RunPython.noop),
+    ]
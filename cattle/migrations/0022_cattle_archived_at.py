@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0021_housing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cattle',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
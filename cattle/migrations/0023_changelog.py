@@ -0,0 +1,27 @@
+# Generated by Django 4.2.13 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0022_cattle_archived_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'เพิ่ม/แก้ไข'), ('delete', 'ลบ')], max_length=10)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('client_ref', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['table', 'object_id', 'seq'], name='changelog_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+import datetime
+
+from django.db import migrations
+
+
+def extend_recurrence_end(apps, schema_editor):
+    # ชุดกิจกรรมที่มีครั้งถูกย้ายไปหลังครั้งสุดท้าย → recurrence_end ต้องครอบคลุมครั้งนั้นด้วย
+    CalendarEventException = apps.get_model('cattle', 'CalendarEventException')
+    CalendarEvent = apps.get_model('cattle', 'CalendarEvent')
+
+    moved = (
+        CalendarEventException.objects.filter(cancelled=False, start__isnull=False, event__recurrence_end__isnull=False)
+        .values_list('event_id', 'start', 'end', 'event__start', 'event__end', 'event__recurrence_end')
+    )
+    latest = {}
+    for event_id, start, end, series_start, series_end, recurrence_end in moved.iterator():
+        end = end or start + ((series_end - series_start) if series_end else datetime.timedelta(0))
+        if end > latest.get(event_id, recurrence_end):
+            latest[event_id] = end
+    for event_id, end in latest.items():
+        CalendarEvent.objects.filter(pk=event_id).update(recurrence_end=end)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0023_changelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(extend_recurrence_end, migrations.RunPython.noop),
+    ]
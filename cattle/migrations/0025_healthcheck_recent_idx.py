@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cattle', '0024_extend_moved_occurrences'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthcheck',
+            index=models.Index(fields=['-check_date', '-id'], name='healthcheck_recent_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .recurrence import RECURRENCE_CHOICES, Rule, parse_weekdays
+
 
 STATUS_CHOICES = [
     ('healthy', 'ปกติ'),
@@ -7,6 +9,35 @@ STATUS_CHOICES = [
     ('forsale', 'พร้อมขาย'),
 ]
 
+class Housing(models.Model):
+    # คอก/โรงเรือน พร้อมยอดสรุปที่คำนวณไว้ล่วงหน้า (services.refresh_pens) สำหรับ dashboard รายคอก
+    name = models.CharField(max_length=100, unique=True)
+    head_count = models.PositiveIntegerField(default=0)
+    sick_count = models.PositiveIntegerField(default=0)
+    for_sale_count = models.PositiveIntegerField(default=0)
+    avg_weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # น้ำหนักล่าสุดเฉลี่ย
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def id_for(cls, name):
+        name = (name or '').strip()
+        if not name:
+            return None
+        return cls.objects.get_or_create(name=name)[0].pk
+
+
+class ActiveCattleManager(models.Manager):
+    # โคที่ยังไม่ถูกคัดออก — ทุกหน้า/API/งานสรุปใช้ manager นี้ (Cattle.all_objects = รวมที่คัดออกแล้ว)
+    def get_queryset(self):
+        return super().get_queryset().filter(archived_at__isnull=True)
+
+
 class Cattle(models.Model):
     tag_no = models.CharField(max_length=50, unique=True)  # AnimalID
     name = models.CharField(max_length=100, blank=True, null=True)
@@ -17,10 +48,40 @@ class Cattle(models.Model):
     breed = models.CharField(max_length=100, blank=True, null=True)
     category = models.CharField(max_length=100, blank=True, null=True)  # ประเภท (โคนม, โคสาว, โคขุน)
     housing = models.CharField(max_length=100, blank=True, null=True)   # คอก/โรงเรือน
+    # คอกที่ตรงกับ housing (กำหนดให้ตอน save) — ใช้ index นี้แทนการกรองข้อความ
+    pen = models.ForeignKey(
+        Housing, on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='cattle'
+    )
 
     birth_date = models.DateField(blank=True, null=True)
     mother = models.CharField(max_length=50, blank=True, null=True)
     father = models.CharField(max_length=50, blank=True, null=True)
+    # คัดออก/จำหน่ายแล้ว → ซ่อนทันที ประวัติถูกลบภายหลังทีละชุด (manage.py purge_archived)
+    archived_at = models.DateTimeField(blank=True, null=True, editable=False, db_index=True)
+
+    objects = ActiveCattleManager()
+    all_objects = models.Manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # จำค่าเดิมไว้ → ล้าง cache (สายพันธุ์, ค้นหา) เฉพาะเมื่อ field ที่เกี่ยวข้องเปลี่ยน
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return {f.attname for f in self._meta.concrete_fields}
+        return {name for name, value in loaded.items() if self.__dict__.get(name) != value}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if 'housing' in self.changed_fields() and (update_fields is None or 'housing' in update_fields):
+            self.pen_id = Housing.id_for(self.housing)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'pen'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.tag_no} - {self.name or 'Unnamed'}"
@@ -37,6 +98,21 @@ class FeedingRation(models.Model):
     def __str__(self):
         return f"{self.ration_id} for {self.cattle.tag_no}"
     
+class FeedingSlot(models.Model):
+    # รอบการให้อาหารที่แยกจาก FeedingRation.feeding_time (time = null เมื่อไม่ได้ระบุเวลา)
+    # ปริมาณต่อรอบ = ปริมาณต่อวันหารจำนวนรอบ → รวมยอดด้วย GROUP BY ได้ทันที
+    ration = models.ForeignKey(FeedingRation, on_delete=models.CASCADE, related_name='slots')
+    time = models.TimeField(blank=True, null=True)
+    fresh_weight = models.DecimalField(max_digits=5, decimal_places=2)
+    dry_weight = models.DecimalField(max_digits=5, decimal_places=2)
+
+    class Meta:
+        ordering = ['time']
+
+    def __str__(self):
+        return f"{self.ration.ration_id} @ {self.time or '-'}"
+
+
 class HealthCheck(models.Model):  
     cattle = models.ForeignKey(Cattle, on_delete=models.CASCADE, related_name='healthchecks')
     check_date = models.DateField()
@@ -52,11 +128,52 @@ class HealthCheck(models.Model):
         default='healthy'
     )
 
+    # ผลเทียบกับค่าปกติของโคตัวนี้ (VitalBaseline) — ระบบคำนวณเอง
+    temperature_zscore = models.FloatField(null=True, blank=True, editable=False)
+    heart_rate_zscore = models.FloatField(null=True, blank=True, editable=False)
+    is_anomaly = models.BooleanField(default=False, editable=False)
+
     class Meta:
         ordering = ['-check_date']
+        indexes = [
+            # ใช้หา HealthCheck ล่าสุดของโคแต่ละตัว
+            models.Index(fields=['cattle', '-check_date', '-id'], name='healthcheck_latest_idx'),
+            # /api/healthchecks/ ทั้งฝูง: cursor pagination ล่าสุดก่อน
+            models.Index(fields=['-check_date', '-id'], name='healthcheck_recent_idx'),
+            models.Index(
+                fields=['-check_date'], name='healthcheck_anomaly_idx',
+                condition=models.Q(is_anomaly=True),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # จำโคเดิมไว้ เผื่อมีการย้าย HealthCheck ไปโคตัวอื่นตอนแก้ไข
+        instance._loaded_cattle_id = instance.__dict__.get('cattle_id')
+        # จำค่าชีพเดิมไว้ → แก้แค่หมายเหตุไม่ต้องคำนวณ baseline ใหม่
+        instance._loaded_vitals = (instance.__dict__.get('temperature'), instance.__dict__.get('heart_rate'))
+        return instance
 
     def __str__(self):
         return f"Health {self.cattle.tag_no} on {self.check_date}"
+
+
+class CattleStatus(models.Model):
+    # สถานะล่าสุดของโคแต่ละตัว (denormalized จาก HealthCheck ล่าสุด)
+    cattle = models.OneToOneField(Cattle, on_delete=models.CASCADE, primary_key=True, related_name='current_status')
+    latest_status = models.CharField(max_length=20, choices=STATUS_CHOICES, blank=True, null=True)
+    latest_check_date = models.DateField(blank=True, null=True)
+    latest_weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latest_status'], name='cattlestatus_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Status {self.cattle.tag_no}: {self.latest_status or '-'}"
     
 class Treatment(models.Model):
     cattle = models.ForeignKey(Cattle, on_delete=models.CASCADE, related_name='treatments')
@@ -81,6 +198,57 @@ class Vaccination(models.Model):
         return f"Vaccine {self.vaccine_name} for {self.cattle.tag_no}"
 
 
+class VitalBaseline(models.Model):
+    # สถิติสะสมของค่าชีพแต่ละตัว (Welford: จำนวน, ค่าเฉลี่ย, ผลรวมกำลังสองของส่วนเบี่ยงเบน)
+    # อัปเดตทีละค่าแบบ O(1) ไม่ต้องอ่านประวัติย้อนหลัง
+    cattle = models.OneToOneField(
+        Cattle, on_delete=models.CASCADE, primary_key=True, related_name='vital_baseline'
+    )
+    temperature_count = models.PositiveIntegerField(default=0)
+    temperature_mean = models.FloatField(default=0)
+    temperature_m2 = models.FloatField(default=0)
+    heart_rate_count = models.PositiveIntegerField(default=0)
+    heart_rate_mean = models.FloatField(default=0)
+    heart_rate_m2 = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Baseline {self.cattle.tag_no}"
+
+
+class TableVersion(models.Model):
+    # ตัวนับการเปลี่ยนแปลงต่อตาราง (เช่น "cattle.calendarevent") ใช้ทำ ETag / Last-Modified ของ feed
+    table = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+
+class ChangeLog(models.Model):
+    # บันทึกการเปลี่ยนแปลงสำหรับ delta sync ของแท็บเล็ต — seq เพิ่มขึ้นเรื่อยๆ ใช้เป็น token ของ client
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    seq = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=100)  # เช่น "cattle.healthcheck"
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=[(UPSERT, 'เพิ่ม/แก้ไข'), (DELETE, 'ลบ')])
+    recorded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # คีย์กันส่งซ้ำจาก client (รายการที่สร้างตอน offline แล้วส่งใหม่หลังเน็ตหลุด)
+    client_ref = models.CharField(max_length=64, blank=True, null=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # ตรวจ conflict: มีการแก้ไข object นี้หลัง token ของ client หรือไม่
+            models.Index(fields=['table', 'object_id', 'seq'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} {self.table}:{self.object_id}"
+
+
 class Notification(models.Model):
     cattle = models.ForeignKey(Cattle, on_delete=models.CASCADE, related_name='notifications')
     type = models.CharField(
@@ -99,15 +267,40 @@ class Notification(models.Model):
         choices=[('pending', 'Pending'), ('done', 'Done')],
         default='pending'
     )
+    # คีย์กันซ้ำของการแจ้งเตือนที่ระบบสร้างเอง เช่น "vaccine:12", "checkup:2024-01-31"
+    source_key = models.CharField(max_length=100, blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cattle', 'type', 'source_key'], name='notification_unique_source'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'notify_date'], name='notification_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Notification {self.type} for {self.cattle.tag_no}"
 
 
 class Report(models.Model):
+    KINDS = [
+        ('manual', 'เขียนเอง'),
+        ('monthly', 'รายเดือน'),
+    ]
+
     cattle = models.ForeignKey(Cattle, on_delete=models.CASCADE, related_name='reports')
     report_date = models.DateField(auto_now_add=True)
     content = models.TextField()
+    # รายงานที่ระบบสร้าง (manage.py generate_reports) ระบุช่วงเวลาที่ครอบคลุม
+    kind = models.CharField(max_length=20, choices=KINDS, default='manual')
+    period_start = models.DateField(blank=True, null=True)
+    period_end = models.DateField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # รันซ้ำเดือนเดิม → แทนที่รายงานเดิมของโคตัวนั้น
+            models.UniqueConstraint(fields=['cattle', 'kind', 'period_start'], name='report_unique_period'),
+        ]
 
     def __str__(self):
         return f"Report {self.cattle.tag_no} - {self.report_date}"
@@ -126,7 +319,68 @@ class CalendarEvent(models.Model):
     end = models.DateTimeField(blank=True, null=True)
     event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
     notes = models.TextField(blank=True, null=True)
+    # กิจกรรมซ้ำ: แถวเดียวแทนทุกครั้ง (start/end คือครั้งแรก) สร้างแต่ละครั้งเฉพาะช่วงที่ปฏิทินขอ
+    recurrence = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, blank=True, default='')
+    interval = models.PositiveSmallIntegerField(default=1)  # ทุกๆ N วัน / N สัปดาห์
+    weekdays = models.CharField(max_length=20, blank=True, default='')  # "0,3" = จันทร์, พฤหัส (weekly)
+    until = models.DateField(blank=True, null=True)
+    count = models.PositiveIntegerField(blank=True, null=True)
+    # เวลาสิ้นสุดของครั้งสุดท้าย (null = ไม่มีที่สิ้นสุด) คำนวณตอน save
+    recurrence_end = models.DateTimeField(blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # ใช้ดึงกิจกรรมตามช่วงวันที่ที่ปฏิทินกำลังแสดง
+            models.Index(fields=['start', 'end'], name='calendarevent_start_idx'),
+            models.Index(fields=['end', 'start'], name='calendarevent_end_idx'),
+            models.Index(
+                fields=['recurrence_end', 'start'], name='calendarevent_recurring_idx',
+                condition=~models.Q(recurrence=''),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.cattle.tag_no})"
+
+    def rule(self):
+        if not self.recurrence:
+            return None
+        return Rule(
+            self.start, self.end, self.recurrence,
+            interval=self.interval, weekdays=parse_weekdays(self.weekdays), until=self.until, count=self.count,
+        )
+
+    def series_end(self):
+        # เวลาสิ้นสุดของครั้งสุดท้าย รวมครั้งที่ถูกย้ายไปหลังครั้งสุดท้ายของชุด (None = ไม่ซ้ำ / ไม่มีที่สิ้นสุด)
+        rule = self.rule()
+        last = rule.last_end() if rule else None
+        if last is None or self.pk is None:
+            return last
+        for start, end in self.exceptions.filter(cancelled=False, start__isnull=False).values_list('start', 'end'):
+            last = max(last, end or start + rule.duration)
+        return last
+
+    def save(self, *args, **kwargs):
+        self.recurrence_end = self.series_end()
+        super().save(*args, **kwargs)
+
+
+class CalendarEventException(models.Model):
+    # ยกเลิกหรือแก้ไขเฉพาะครั้งหนึ่งของกิจกรรมซ้ำ อ้างอิงด้วยเวลาเริ่มเดิมของครั้งนั้น
+    event = models.ForeignKey(CalendarEvent, on_delete=models.CASCADE, related_name='exceptions')
+    original_start = models.DateTimeField()
+    cancelled = models.BooleanField(default=False)
+    # ค่าที่เว้นว่าง = ใช้ค่าเดิมของชุดกิจกรรม
+    start = models.DateTimeField(blank=True, null=True)
+    end = models.DateTimeField(blank=True, null=True)
+    title = models.CharField(max_length=200, blank=True, null=True)
+    notes = models.TextField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'original_start'], name='calendarevent_exception_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.event.title} @ {self.original_start}"
     
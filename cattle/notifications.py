@@ -0,0 +1,115 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .models import Cattle, HealthCheck, Notification, Vaccination
+
+NOTIFICATION_BATCH_SIZE = 1000
+
+
+def _vaccine_due(today, lead_days):
+    # วัคซีนที่ถึงกำหนด (หรือเลยกำหนด) ภายใน lead_days วัน และยังไม่มีการฉีดเข็มถัดไป
+    horizon = today + datetime.timedelta(days=lead_days)
+    later_dose = Vaccination.objects.filter(
+        cattle=OuterRef('cattle'),
+        vaccine_name=OuterRef('vaccine_name'),
+        vaccine_date__gt=OuterRef('vaccine_date'),
+    )
+    rows = (
+        Vaccination.objects.filter(next_due_date__lte=horizon, cattle__archived_at__isnull=True)
+        .filter(~Exists(later_dose))
+        .values_list('id', 'cattle_id', 'cattle__tag_no', 'vaccine_name', 'next_due_date')
+    )
+    for vaccination_id, cattle_id, tag_no, vaccine_name, due in rows.iterator(chunk_size=NOTIFICATION_BATCH_SIZE):
+        yield Notification(
+            cattle_id=cattle_id,
+            type='vaccine',
+            source_key=f'vaccine:{vaccination_id}',
+            notify_date=due,
+            message=f'โค {tag_no} ถึงกำหนดฉีดวัคซีน {vaccine_name} วันที่ {due:%d/%m/%Y}',
+        )
+
+
+def _checkup_overdue(today, interval_days):
+    # ไม่ได้ตรวจสุขภาพเกิน interval_days วัน (ใช้ CattleStatus จึงไม่ต้องไล่ HealthCheck)
+    cutoff = today - datetime.timedelta(days=interval_days)
+    rows = (
+        Cattle.objects.filter(
+            Q(current_status__isnull=True) | Q(current_status__latest_check_date__lt=cutoff)
+        )
+        .values_list('id', 'tag_no', 'current_status__latest_check_date')
+    )
+    for cattle_id, tag_no, last_check in rows.iterator(chunk_size=NOTIFICATION_BATCH_SIZE):
+        if last_check is None:
+            message = f'โค {tag_no} ยังไม่เคยตรวจสุขภาพ'
+            due = today
+        else:
+            message = f'โค {tag_no} ไม่ได้ตรวจสุขภาพตั้งแต่ {last_check:%d/%m/%Y}'
+            due = last_check + datetime.timedelta(days=interval_days)
+        yield Notification(
+            cattle_id=cattle_id,
+            type='checkup',
+            source_key=f'checkup:{last_check or "never"}',
+            notify_date=due,
+            message=message,
+        )
+
+
+def _weight_overdue(today, interval_days):
+    # ไม่ได้ชั่งน้ำหนักเกิน interval_days วัน — GROUP BY โคครั้งเดียว
+    cutoff = today - datetime.timedelta(days=interval_days)
+    last_weighed = dict(
+        HealthCheck.objects.filter(weight__isnull=False)
+        .values('cattle_id')
+        .annotate(last=Max('check_date'))
+        .values_list('cattle_id', 'last')
+    )
+    rows = Cattle.objects.values_list('id', 'tag_no')
+    for cattle_id, tag_no in rows.iterator(chunk_size=NOTIFICATION_BATCH_SIZE):
+        last = last_weighed.get(cattle_id)
+        if last is not None and last >= cutoff:
+            continue
+        if last is None:
+            message = f'โค {tag_no} ยังไม่มีข้อมูลน้ำหนัก'
+            due = today
+        else:
+            message = f'โค {tag_no} ไม่ได้ชั่งน้ำหนักตั้งแต่ {last:%d/%m/%Y}'
+            due = last + datetime.timedelta(days=interval_days)
+        yield Notification(
+            cattle_id=cattle_id,
+            type='weight',
+            source_key=f'weight:{last or "never"}',
+            notify_date=due,
+            message=message,
+        )
+
+
+def generate_notifications(today=None, lead_days=None, checkup_days=None, weight_days=None):
+    # สร้างการแจ้งเตือนแบบ set-based → รันซ้ำได้ (unique source_key + ignore_conflicts)
+    today = today or timezone.localdate()
+    lead_days = settings.NOTIFICATION_VACCINE_LEAD_DAYS if lead_days is None else lead_days
+    checkup_days = settings.NOTIFICATION_CHECKUP_DAYS if checkup_days is None else checkup_days
+    weight_days = settings.NOTIFICATION_WEIGHT_DAYS if weight_days is None else weight_days
+
+    sources = {
+        'vaccine': _vaccine_due(today, lead_days),
+        'checkup': _checkup_overdue(today, checkup_days),
+        'weight': _weight_overdue(today, weight_days),
+    }
+    before = Notification.objects.count()
+    candidates = {}
+    for kind, notifications in sources.items():
+        batch = []
+        candidates[kind] = 0
+        for notification in notifications:
+            batch.append(notification)
+            if len(batch) >= NOTIFICATION_BATCH_SIZE:
+                Notification.objects.bulk_create(batch, ignore_conflicts=True)
+                candidates[kind] += len(batch)
+                batch = []
+        Notification.objects.bulk_create(batch, ignore_conflicts=True)
+        candidates[kind] += len(batch)
+
+    return {'candidates': candidates, 'created': Notification.objects.count() - before}
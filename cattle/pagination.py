@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CattleCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+
+
+class HealthCheckCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    # ล่าสุดก่อน → ใช้ index (-check_date, -id) ของทั้งฝูง หรือ (cattle, -check_date, -id) เมื่อดูทีละตัว
+    ordering = ('-check_date', '-id')
@@ -0,0 +1,237 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+from .models import Cattle
+from .services import bump_cache_version, cache_version
+
+PEDIGREE_VERSION_KEY = 'cattle:pedigree_version'
+PEDIGREE_FIELDS = {'tag_no', 'name', 'mother', 'father'}
+UNKNOWN = -1
+
+# กราฟที่สร้างไว้แล้วในโปรเซสนี้ → (version, Pedigree)
+_cached = None
+
+
+class Pedigree:
+    # กราฟพ่อแม่ของทั้งฝูงในหน่วยความจำ สร้างจาก Cattle.mother / Cattle.father (ข้อความ)
+    # พ่อแม่จับคู่ด้วย tag_no ก่อน ถ้าไม่เจอจึงลองชื่อ (ต้องไม่ซ้ำ) ที่เหลือถือว่า unresolved
+    # archived: id ของโคที่คัดออกแล้ว — ยังอยู่ในกราฟในฐานะบรรพบุรุษ แต่ไม่นับเป็นสมาชิกฝูง
+
+    def __init__(self, rows, archived=()):
+        rows = list(rows)
+        self.archived = set(archived)
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.tags = [r[1] for r in rows]
+        self.index = {cattle_id: i for i, cattle_id in enumerate(self.ids.tolist())}
+
+        by_tag = {tag: i for i, tag in enumerate(self.tags)}
+        by_name = {}
+        for i, r in enumerate(rows):
+            if r[2]:
+                by_name.setdefault(r[2].strip(), []).append(i)
+
+        n = len(rows)
+        self.sire = np.full(n, UNKNOWN, dtype=np.int64)
+        self.dam = np.full(n, UNKNOWN, dtype=np.int64)
+        self.unresolved = []
+        for i, (_, _, _, mother, father) in enumerate(rows):
+            for field, value, target in (('mother', mother, self.dam), ('father', father, self.sire)):
+                value = (value or '').strip()
+                if not value:
+                    continue
+                parent = by_tag.get(value)
+                if parent is None and len(by_name.get(value, [])) == 1:
+                    parent = by_name[value][0]
+                if parent is None or parent == i:
+                    self.unresolved.append({'cattle_id': int(self.ids[i]), 'field': field, 'value': value, 'reason': 'not_found'})
+                else:
+                    target[i] = parent
+
+        self.children = [[] for _ in range(n)]
+        for i in range(n):
+            for parent in (self.sire[i], self.dam[i]):
+                if parent != UNKNOWN:
+                    self.children[parent].append(i)
+
+        self.generation = self._generations()
+        # สำหรับคำนวณ F: list ธรรมดาเร็วกว่าอ่านทีละค่าจาก numpy ในลูป
+        self._parents = list(zip(self.sire.tolist(), self.dam.tolist()))
+        self._depth = self.generation.tolist()
+        # F ที่คำนวณแล้ว (index → F) และของแต่ละคู่พ่อแม่ สะสมไว้ตลอดอายุของกราฟ
+        self._f = {}
+        self._family_f = {}
+        self._inbreeding_all = None
+
+    @classmethod
+    def from_db(cls):
+        # รวมโคที่คัดออกแล้ว → ลูกยังเชื่อมกับพ่อแม่จนกว่าจะลบจริง (purge)
+        rows = list(
+            Cattle.all_objects.order_by('pk').values_list('pk', 'tag_no', 'name', 'mother', 'father', 'archived_at')
+        )
+        return cls([r[:5] for r in rows], archived=[r[0] for r in rows if r[5] is not None])
+
+    def is_active(self, cattle_id):
+        return cattle_id in self.index and cattle_id not in self.archived
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _generations(self):
+        # topological order (Kahn) → generation = 1 + max(generation ของพ่อแม่)
+        # ข้อมูลที่วนเป็นวง (โคเป็นบรรพบุรุษของตัวเอง) จะถูกตัดและรายงานเป็น unresolved
+        n = len(self.ids)
+        pending = (self.sire != UNKNOWN).astype(np.int64) + (self.dam != UNKNOWN).astype(np.int64)
+        generation = np.zeros(n, dtype=np.int64)
+        queue = deque(np.flatnonzero(pending == 0).tolist())
+        done = 0
+        while queue:
+            i = queue.popleft()
+            done += 1
+            for child in self.children[i]:
+                generation[child] = max(generation[child], generation[i] + 1)
+                pending[child] -= 1
+                if pending[child] == 0:
+                    queue.append(child)
+
+        if done < n:
+            self._break_cycles(np.flatnonzero(pending > 0).tolist())
+            return self._generations()
+        return generation
+
+    def _break_cycles(self, remaining):
+        # ตัดโคที่เป็นแค่ปลายทางของวงออกก่อน เหลือเฉพาะโคที่อยู่บนวงจริงๆ
+        core = set(remaining)
+        outgoing = {i: sum(1 for c in self.children[i] if c in core) for i in core}
+        leaves = deque(i for i, count in outgoing.items() if count == 0)
+        while leaves:
+            i = leaves.popleft()
+            core.discard(i)
+            for parent in (self.sire[i], self.dam[i]):
+                if parent in core:
+                    outgoing[parent] -= 1
+                    if outgoing[parent] == 0:
+                        leaves.append(parent)
+
+        for i in core:
+            for field, parents in (('father', self.sire), ('mother', self.dam)):
+                if parents[i] in core:
+                    self.unresolved.append({
+                        'cattle_id': int(self.ids[i]), 'field': field,
+                        'value': self.tags[parents[i]], 'reason': 'cycle',
+                    })
+                    self.children[parents[i]].remove(i)
+                    parents[i] = UNKNOWN
+
+    # ---------------- ค้นหาบรรพบุรุษ / ลูกหลาน ----------------
+    def _walk(self, cattle_id, step, max_depth=None):
+        start = self.index[cattle_id]
+        depth = {start: 0}
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            if max_depth is not None and depth[i] >= max_depth:
+                continue
+            for j in step(i):
+                if j != UNKNOWN and j not in depth:
+                    depth[j] = depth[i] + 1
+                    queue.append(j)
+        del depth[start]
+        return {int(self.ids[i]): d for i, d in depth.items()}
+
+    def ancestors(self, cattle_id, max_depth=None):
+        # {cattle_id: จำนวนรุ่นที่ห่าง}
+        return self._walk(cattle_id, lambda i: (self.sire[i], self.dam[i]), max_depth)
+
+    def descendants(self, cattle_id, max_depth=None):
+        return self._walk(cattle_id, lambda i: self.children[i], max_depth)
+
+    def common_ancestors(self, a, b):
+        return sorted(set(self.ancestors(a)) & set(self.ancestors(b)))
+
+    # ---------------- สัมประสิทธิ์เลือดชิด (Wright) ----------------
+    # ไม่สร้าง relationship matrix (A) ทั้งฝูง (O(n²) หน่วยความจำ) — ใช้ A = L·D·L' แบบ Meuwissen & Luo (1992):
+    # ต่อโคหนึ่งตัวไล่เฉพาะบรรพบุรุษของมัน → หน่วยความจำ O(n + จำนวนบรรพบุรุษ)
+    def _trace(self, i):
+        # {j: L[i, j]} สัดส่วนยีนที่ i ได้รับจากบรรพบุรุษ j (รวมตัวเอง = 1)
+        # ไล่จากรุ่นหลังไปรุ่นแรก → ค่าของ j ครบก่อนส่งต่อให้พ่อแม่ของ j เสมอ
+        parents, depth = self._parents, self._depth
+        trace = {i: 1.0}
+        heap = [(-depth[i], i)]
+        while heap:
+            _, j = heapq.heappop(heap)
+            half = 0.5 * trace[j]
+            for parent in parents[j]:
+                if parent == UNKNOWN:
+                    continue
+                if parent not in trace:
+                    trace[parent] = 0.0
+                    heapq.heappush(heap, (-depth[parent], parent))
+                trace[parent] += half
+        return trace
+
+    def _variance(self, j):
+        # D[j] = 0.5 - 0.25 (F พ่อ + F แม่) โดยพ่อแม่ที่ไม่รู้จักนับ F = -1
+        return 0.5 - 0.25 * sum(self._f[p] if p != UNKNOWN else -1.0 for p in self._parents[j])
+
+    def _inbreeding(self, order):
+        # order เรียงตามรุ่น → F ของพ่อแม่พร้อมก่อนลูกเสมอ
+        for i in order:
+            if i in self._f:
+                continue
+            sire, dam = self._parents[i]
+            if sire == UNKNOWN or dam == UNKNOWN:
+                self._f[i] = 0.0
+                continue
+            family = (min(sire, dam), max(sire, dam))
+            if family not in self._family_f:
+                # พี่น้องร่วมพ่อแม่มี F เท่ากัน → ไล่บรรพบุรุษครั้งเดียวต่อคู่
+                trace = self._trace(i)
+                self._family_f[family] = sum(l * l * self._variance(j) for j, l in trace.items() if j != i) + self._variance(i) - 1.0
+            self._f[i] = self._family_f[family]
+        return self._f
+
+    def _lineage(self, i):
+        # บรรพบุรุษของ i (รวมตัวเอง) เรียงตามรุ่น
+        return sorted(self._trace(i), key=self._depth.__getitem__)
+
+    def inbreeding_of(self, cattle_id):
+        # F ของโคตัวเดียว คำนวณเฉพาะสายบรรพบุรุษ
+        i = self.index[cattle_id]
+        return round(self._inbreeding(self._lineage(i))[i], 6)
+
+    def inbreeding(self):
+        # {cattle_id: F} ของทั้งฝูง (โคนอกสายพันธุ์ F = 0)
+        if self._inbreeding_all is None:
+            f = self._inbreeding(np.argsort(self.generation, kind='stable').tolist())
+            self._inbreeding_all = {int(self.ids[i]): round(f[i], 6) for i in range(len(self.ids))}
+        return self._inbreeding_all
+
+    def coancestry(self, a, b):
+        # = F ของลูกที่เกิดจาก a x b = A[a, b] / 2 โดย A[a, b] = Σ L[a, k]·L[b, k]·D[k] เฉพาะบรรพบุรุษร่วม k
+        i, j = self.index[a], self.index[b]
+        trace_a, trace_b = self._trace(i), self._trace(j)
+        common = [k for k in trace_a if k in trace_b]
+        self._inbreeding(sorted(common, key=self._depth.__getitem__))
+        return float(0.5 * sum(trace_a[k] * trace_b[k] * self._variance(k) for k in common))
+
+    def parents(self, cattle_id):
+        i = self.index[cattle_id]
+        return {
+            'father': int(self.ids[self.sire[i]]) if self.sire[i] != UNKNOWN else None,
+            'mother': int(self.ids[self.dam[i]]) if self.dam[i] != UNKNOWN else None,
+        }
+
+
+def invalidate_pedigree():
+    bump_cache_version(PEDIGREE_VERSION_KEY)
+
+
+def get_pedigree():
+    # ใช้กราฟเดิมจนกว่าข้อมูลพ่อแม่จะเปลี่ยน
+    global _cached
+    version = cache_version(PEDIGREE_VERSION_KEY)
+    if _cached is None or _cached[0] != version:
+        _cached = (version, Pedigree.from_db())
+    return _cached[1]
@@ -0,0 +1,95 @@
+import datetime
+
+from django.utils import timezone
+
+# กฎการเกิดซ้ำของกิจกรรมปฏิทิน — คำนวณเฉพาะครั้งที่อยู่ในช่วงที่ขอ (ไม่ไล่จากครั้งแรก)
+# คิดตามวันที่/เวลาท้องถิ่น (TIME_ZONE) เพื่อให้ "ทุกวัน 07:30" ตรงเวลาเดิมเสมอ
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+RECURRENCE_CHOICES = [
+    ('', 'ไม่ซ้ำ'),
+    (DAILY, 'ทุกวัน'),
+    (WEEKLY, 'ทุกสัปดาห์'),
+]
+WEEKDAY_CHOICES = [
+    (0, 'จ.'), (1, 'อ.'), (2, 'พ.'), (3, 'พฤ.'), (4, 'ศ.'), (5, 'ส.'), (6, 'อา.'),
+]
+
+
+def parse_weekdays(value):
+    # "0,2,4" → (0, 2, 4) (จันทร์ = 0)
+    return tuple(sorted({int(day) for day in str(value or '').split(',') if day.strip() != ''}))
+
+
+def format_weekdays(days):
+    return ','.join(str(day) for day in sorted(set(int(day) for day in days)))
+
+
+class Rule:
+    def __init__(self, start, end, freq, interval=1, weekdays=(), until=None, count=None):
+        local = timezone.localtime(start)
+        self.first = local.date()
+        self.time = local.time().replace(tzinfo=None)
+        self.duration = (end - start) if end else datetime.timedelta(0)
+        self.until = until
+        self.count = count
+        interval = max(int(interval or 1), 1)
+        if freq == WEEKLY:
+            self.days = tuple(sorted(set(weekdays))) or (self.first.weekday(),)
+            self.step = 7 * interval
+            # สัปดาห์แรก (นับจากวันจันทร์) ข้ามวันที่มาก่อนวันเริ่ม
+            self.anchor = self.first - datetime.timedelta(days=self.first.weekday())
+            self.skipped = sum(1 for day in self.days if day < self.first.weekday())
+        else:
+            self.days = (0,)
+            self.step = interval
+            self.anchor = self.first
+            self.skipped = 0
+
+    def _at(self, date):
+        return timezone.make_aware(datetime.datetime.combine(date, self.time))
+
+    def _nth_date(self, n):
+        period, position = divmod(n + self.skipped, len(self.days))
+        return self.anchor + datetime.timedelta(days=period * self.step + self.days[position])
+
+    def dates(self, date_from, date_to):
+        # วันที่ของแต่ละครั้งในช่วง [date_from, date_to] (ไม่สนใจครั้งก่อนหน้า)
+        period = max(0, (date_from - self.anchor).days // self.step)
+        while True:
+            base = self.anchor + datetime.timedelta(days=period * self.step)
+            if base > date_to:
+                return
+            for position, day in enumerate(self.days):
+                date = base + datetime.timedelta(days=day)
+                if date < self.first or date < date_from:
+                    continue
+                if date > date_to or (self.until and date > self.until):
+                    return
+                if self.count is not None and period * len(self.days) + position - self.skipped >= self.count:
+                    return
+                yield date
+            period += 1
+
+    def starts(self, window_start, window_end):
+        # เวลาเริ่มของแต่ละครั้งที่คาบเกี่ยวกับ [window_start, window_end) ตามเงื่อนไขเดียวกับกิจกรรมปกติ
+        date_from = timezone.localtime(window_start - self.duration).date() - datetime.timedelta(days=1)
+        date_to = timezone.localtime(window_end).date()
+        for date in self.dates(date_from, date_to):
+            start = self._at(date)
+            if start >= window_end:
+                return
+            if start + self.duration >= window_start:
+                yield start
+
+    def last_end(self):
+        # เวลาสิ้นสุดของครั้งสุดท้าย (None = ไม่มีที่สิ้นสุด) — ใช้เป็นขอบเขตตอนกรองด้วย SQL
+        last = None
+        if self.count is not None:
+            last = self._nth_date(max(self.count, 1) - 1)
+        if self.until is not None:
+            last = min(last, self.until) if last else self.until
+        if last is None:
+            return None
+        return self._at(last) + self.duration
@@ -0,0 +1,162 @@
+import calendar
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Prefetch, Q
+from django.template.loader import render_to_string
+
+from .models import Cattle, HealthCheck, Report, Treatment, Vaccination
+
+REPORT_BATCH_SIZE = 500
+THAI_MONTHS = [
+    'มกราคม', 'กุมภาพันธ์', 'มีนาคม', 'เมษายน', 'พฤษภาคม', 'มิถุนายน',
+    'กรกฎาคม', 'สิงหาคม', 'กันยายน', 'ตุลาคม', 'พฤศจิกายน', 'ธันวาคม',
+]
+# นัดวัคซีนที่จะแสดงในรายงาน (นับจากวันสิ้นเดือน)
+UPCOMING_VACCINE_DAYS = 31
+
+
+def month_period(year, month):
+    return datetime.date(year, month, 1), datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def _summarize(cattle, start, end):
+    # ตัวเลขสรุปของโคหนึ่งตัวจากข้อมูลที่ prefetch มาแล้ว (ไม่มี query เพิ่ม)
+    checks = cattle.period_checks
+    temperatures = [float(c.temperature) for c in checks if c.temperature is not None]
+    heart_rates = [c.heart_rate for c in checks if c.heart_rate is not None]
+    weighed = [c for c in checks if c.weight is not None]
+    weight = None
+    if weighed:
+        first, last = weighed[0], weighed[-1]
+        days = (last.check_date - first.check_date).days
+        weight = {
+            'first': first.weight,
+            'last': last.weight,
+            'change': last.weight - first.weight,
+            'adg': round(float(last.weight - first.weight) / days, 3) if days else None,
+        }
+    upcoming_until = end + datetime.timedelta(days=UPCOMING_VACCINE_DAYS)
+    return {
+        'c': cattle,
+        'status': getattr(cattle, 'current_status', None),
+        'period_label': f'{THAI_MONTHS[start.month - 1]} {start.year + 543}',
+        'checks': len(checks),
+        'anomalies': sum(1 for c in checks if c.is_anomaly),
+        'sick': sum(1 for c in checks if c.status == 'sick'),
+        'temperature': {
+            'mean': _mean(temperatures),
+            'min': min(temperatures, default=None),
+            'max': max(temperatures, default=None),
+        },
+        'heart_rate': {
+            'mean': _mean(heart_rates),
+            'min': min(heart_rates, default=None),
+            'max': max(heart_rates, default=None),
+        },
+        'weight': weight,
+        'treatments': cattle.period_treatments,
+        'vaccinations': [v for v in cattle.period_vaccinations if start <= v.vaccine_date <= end],
+        'upcoming': [
+            v for v in cattle.period_vaccinations
+            if v.next_due_date and end < v.next_due_date <= upcoming_until
+        ],
+        'rations': cattle.rations.all(),
+    }
+
+
+def build_reports(cattle_ids, start, end):
+    # รายงานของโคชุดหนึ่ง → [(cattle_id, content)] ใช้ query คงที่ต่อชุด ไม่ขึ้นกับจำนวนโค
+    upcoming_until = end + datetime.timedelta(days=UPCOMING_VACCINE_DAYS)
+    herd = (
+        Cattle.objects.filter(pk__in=cattle_ids)
+        .select_related('current_status')
+        .prefetch_related(
+            Prefetch(
+                'healthchecks',
+                queryset=HealthCheck.objects.filter(check_date__range=(start, end)).order_by('check_date', 'id'),
+                to_attr='period_checks',
+            ),
+            Prefetch(
+                'treatments',
+                queryset=Treatment.objects.filter(treatment_date__range=(start, end)).order_by('treatment_date', 'id'),
+                to_attr='period_treatments',
+            ),
+            Prefetch(
+                'vaccinations',
+                queryset=Vaccination.objects.filter(
+                    Q(vaccine_date__range=(start, end)) | Q(next_due_date__gt=end, next_due_date__lte=upcoming_until)
+                ).order_by('vaccine_date', 'id'),
+                to_attr='period_vaccinations',
+            ),
+            'rations',
+        )
+    )
+    return [
+        (cattle.pk, render_to_string('monthly_report.txt', _summarize(cattle, start, end)))
+        for cattle in herd
+    ]
+
+
+def _init_worker():
+    # process ลูกต้องมี Django พร้อม (กรณี spawn) และห้ามใช้ connection ที่สืบทอดมาจากโปรเซสแม่
+    import django
+    django.setup()
+
+
+def _build_batch(args):
+    cattle_ids, start, end = args
+    try:
+        return build_reports(cattle_ids, start, end)
+    finally:
+        connections.close_all()
+
+
+def _save_reports(rows, start, end, batch_size):
+    Report.objects.bulk_create(
+        [
+            Report(cattle_id=cattle_id, content=content, kind='monthly', period_start=start, period_end=end)
+            for cattle_id, content in rows
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['cattle', 'kind', 'period_start'],
+        update_fields=['content', 'period_end', 'report_date'],
+    )
+
+
+def _collect(results, start, end, batch_size, expected, progress):
+    total = 0
+    for rows in results:
+        with transaction.atomic():
+            _save_reports(rows, start, end, batch_size)
+        total += len(rows)
+        if progress:
+            progress(total, expected)
+    return total
+
+
+def generate_monthly_reports(year, month, workers=None, batch_size=REPORT_BATCH_SIZE, cattle_ids=None, progress=None):
+    # สร้างรายงานรายเดือนของทั้งฝูงแบบขนาน: แต่ละ worker ดึงข้อมูลทีละ batch_size ตัวแล้ว render
+    # โปรเซสแม่รับผลทีละชุดแล้ว bulk_create (รันซ้ำเดือนเดิม = แทนที่ของเดิม)
+    start, end = month_period(year, month)
+    if cattle_ids is None:
+        cattle_ids = Cattle.objects.order_by('pk').values_list('pk', flat=True)
+    cattle_ids = list(cattle_ids)
+    batches = [(cattle_ids[i:i + batch_size], start, end) for i in range(0, len(cattle_ids), batch_size)]
+    workers = workers or settings.REPORT_WORKERS or os.cpu_count() or 1
+
+    if workers == 1 or len(batches) <= 1:
+        return _collect(map(_build_batch, batches), start, end, batch_size, len(cattle_ids), progress)
+
+    # ปิด connection ก่อน fork ไม่ให้ process ลูกใช้ socket เดียวกับโปรเซสแม่
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return _collect(pool.map(_build_batch, batches), start, end, batch_size, len(cattle_ids), progress)
@@ -0,0 +1,155 @@
+import numpy as np
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Cattle
+from .services import bump_cache_version, cache_version
+
+SEARCH_VERSION_KEY = 'cattle:search_version'
+SEARCH_LIMIT = 20
+# จำนวนผลลัพธ์สูงสุดที่ /api/search/ ส่งกลับต่อครั้ง
+SEARCH_MAX_LIMIT = 100
+
+# น้ำหนักของแต่ละ field เวลาจัดอันดับ (หมายเลขประจำตัวสำคัญที่สุด)
+SEARCH_FIELDS = {
+    'tag_no': 1.0,
+    'name': 0.9,
+    'breed': 0.6,
+    'housing': 0.6,
+}
+
+# index ที่สร้างไว้แล้วในโปรเซสนี้ → (version, NgramIndex)
+_cached = None
+
+
+def normalize(value):
+    return ' '.join((value or '').casefold().split())
+
+
+def trigrams(value):
+    # แบบเดียวกับ pg_trgm: เติมช่องว่างหน้า 2 ตัว หลัง 1 ตัว ต่อคำ
+    grams = set()
+    for word in normalize(value).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramIndex:
+    # trigram index ในหน่วยความจำ สำหรับฐานข้อมูลที่ไม่มี pg_trgm (SQLite)
+    # postings ของแต่ละ field เก็บเป็น numpy array เรียงตาม trigram → ค้นหาด้วย bincount
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.values = {field: [normalize(r[i + 1]) for r in rows] for i, field in enumerate(SEARCH_FIELDS)}
+        self.vocabulary = {}
+        self.postings = {}
+        self.sizes = {}
+
+        for field, values in self.values.items():
+            # คำนวณ trigram ครั้งเดียวต่อค่าที่ไม่ซ้ำ (สายพันธุ์/คอกมีค่าซ้ำกันเยอะ)
+            unique = {}
+            value_index = np.array([unique.setdefault(v, len(unique)) for v in values], dtype=np.int64)
+            unique_grams = [
+                [self.vocabulary.setdefault(g, len(self.vocabulary)) for g in trigrams(v)]
+                for v in unique
+            ]
+            unique_sizes = np.array([len(g) for g in unique_grams], dtype=np.int64)
+            unique_offsets = np.concatenate(([0], np.cumsum(unique_sizes)[:-1])) if len(unique) else unique_sizes
+            flat = np.array([g for grams in unique_grams for g in grams], dtype=np.int64)
+
+            # กระจาย trigram ของแต่ละค่ากลับไปยังทุกแถว (vectorized)
+            sizes = unique_sizes[value_index] if len(values) else np.zeros(0, dtype=np.int64)
+            positions = np.repeat(np.arange(len(values)), sizes)
+            within = np.arange(int(sizes.sum())) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            gram_ids = flat[np.repeat(unique_offsets[value_index], sizes) + within] if len(flat) else flat
+
+            order = np.argsort(gram_ids, kind='stable')
+            self.postings[field] = (gram_ids[order], positions[order])
+            self.sizes[field] = sizes
+
+    @classmethod
+    def from_db(cls):
+        return cls(Cattle.objects.order_by('pk').values_list('pk', *SEARCH_FIELDS))
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        # คืนค่า [(cattle_id, score)] เรียงจากคะแนนมากไปน้อย
+        grams = [self.vocabulary[g] for g in trigrams(query) if g in self.vocabulary]
+        query_size = len(trigrams(query))
+        needle = normalize(query)
+        if not needle or not len(self.ids):
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float64)
+        for field, weight in SEARCH_FIELDS.items():
+            gram_ids, positions = self.postings[field]
+            starts = np.searchsorted(gram_ids, grams, side='left')
+            ends = np.searchsorted(gram_ids, grams, side='right')
+            if not len(grams) or not (ends - starts).any():
+                continue
+            hits = np.bincount(
+                np.concatenate([positions[s:e] for s, e in zip(starts, ends)]),
+                minlength=len(self.ids),
+            )
+            # similarity แบบ pg_trgm = ร่วม / (รวมทั้งสองฝั่ง - ร่วม)
+            union = query_size + self.sizes[field] - hits
+            similarity = np.divide(hits, union, out=np.zeros(len(self.ids)), where=union > 0)
+            np.maximum(scores, weight * similarity, out=scores)
+
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        # คัดเฉพาะกลุ่มบน แล้วให้คะแนนเพิ่มกับที่ตรงทั้งคำหรือขึ้นต้นด้วยคำค้นหา
+        shortlist = limit * 10
+        if len(candidates) > shortlist:
+            candidates = candidates[np.argpartition(-scores[candidates], shortlist)[:shortlist]]
+        for position in candidates.tolist():
+            for field, weight in SEARCH_FIELDS.items():
+                value = self.values[field][position]
+                if value == needle:
+                    scores[position] += weight
+                elif value.startswith(needle):
+                    scores[position] += 0.5 * weight
+
+        top = candidates[np.argsort(-scores[candidates], kind='stable')[:limit]]
+        return [(int(self.ids[i]), round(float(scores[i]), 4)) for i in top]
+
+
+def invalidate_search_index():
+    bump_cache_version(SEARCH_VERSION_KEY)
+
+
+def get_search_index():
+    global _cached
+    version = cache_version(SEARCH_VERSION_KEY)
+    if _cached is None or _cached[0] != version:
+        _cached = (version, NgramIndex.from_db())
+    return _cached[1]
+
+
+def _postgres_search(query, limit):
+    # ใช้ GIN index (gin_trgm_ops) ทั้ง % และ ILIKE
+    query = query.strip()
+    match = Q()
+    for field in SEARCH_FIELDS:
+        match |= Q(**{f'{field}__icontains': query}) | TrigramSimilar(F(field), query)
+    score = Greatest(*[TrigramSimilarity(field, query) * weight for field, weight in SEARCH_FIELDS.items()])
+    rows = (
+        Cattle.objects.filter(match)
+        .annotate(score=score)
+        .order_by('-score', 'tag_no')
+        .values_list('pk', 'score')[:limit]
+    )
+    return [(pk, round(float(score or 0), 4)) for pk, score in rows]
+
+
+def search_cattle(query, limit=SEARCH_LIMIT):
+    if not normalize(query) or limit < 1:
+        return []
+    if connection.vendor == 'postgresql':
+        return _postgres_search(query, limit)
+    return get_search_index().search(query, limit)
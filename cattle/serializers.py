@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Cattle, HealthCheck
+from rest_framework.validators import UniqueValidator
+from .models import CalendarEvent, Cattle, CattleStatus, FeedingRation, HealthCheck, Vaccination
 
 
 class HealthCheckSerializer(serializers.ModelSerializer):
@@ -8,9 +10,83 @@ class HealthCheckSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class HealthCheckReadingSerializer(serializers.ModelSerializer):
+    # ข้อมูลจากเครื่องชั่ง/แท็บเล็ตข้างซอง อ้างอิงโคด้วย tag_no
+    tag_no = serializers.CharField(max_length=50)
+
+    class Meta:
+        model = HealthCheck
+        fields = ['tag_no', 'check_date', 'temperature', 'heart_rate', 'weight', 'status', 'notes']
+
+
+class VaccinationRoundSerializer(serializers.ModelSerializer):
+    # วัคซีนที่ฉีดให้ทุกตัวในรอบตรวจ (ไม่ต้องระบุโค)
+    class Meta:
+        model = Vaccination
+        fields = ['vaccine_name', 'vaccine_date', 'next_due_date', 'doctor_name']
+
+
+class CalendarEventRoundSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CalendarEvent
+        fields = ['title', 'start', 'end', 'event_type', 'notes']
+
+
+class CattleImportSerializer(serializers.ModelSerializer):
+    # upsert ตาม tag_no → ไม่ต้องเช็ค unique ทีละแถว
+    tag_no = serializers.CharField(max_length=50)
+
+    class Meta:
+        model = Cattle
+        fields = ['tag_no', 'name', 'gender', 'breed', 'category', 'housing', 'birth_date', 'mother', 'father']
+
+
+class CattleStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CattleStatus
+        fields = ['latest_status', 'latest_check_date', 'latest_weight', 'updated_at']
+
+
 class CattleSerializer(serializers.ModelSerializer):
-    healthchecks = HealthCheckSerializer(many=True, read_only=True)
+    # แสดงเฉพาะ HealthCheck ล่าสุด N รายการ → ประวัติทั้งหมดอยู่ที่ /api/cattle/<id>/healthchecks/
+    healthchecks = serializers.SerializerMethodField()
+    current_status = CattleStatusSerializer(read_only=True)
 
     class Meta:
         model = Cattle
         fields = '__all__'
+        # tag_no ต้องไม่ซ้ำกับโคที่คัดออกแล้วด้วย (ยังอยู่ในฐานข้อมูลจนกว่าจะ purge)
+        extra_kwargs = {'tag_no': {'validators': [UniqueValidator(queryset=Cattle.all_objects.all())]}}
+
+    def get_healthchecks(self, obj):
+        checks = getattr(obj, 'recent_healthchecks', None)
+        if checks is None:
+            checks = obj.healthchecks.order_by('-check_date', '-id')[:settings.API_RECENT_HEALTHCHECKS]
+        return HealthCheckSerializer(checks, many=True, context=self.context).data
+
+
+# ---------------- Delta sync (/api/sync/) ----------------
+# แถวเดียวต่อ object ไม่มีข้อมูลซ้อน → ขนาดข้อมูลตามจำนวนที่เปลี่ยนจริง
+class CattleSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cattle
+        fields = '__all__'
+        extra_kwargs = {'tag_no': {'validators': [UniqueValidator(queryset=Cattle.all_objects.all())]}}
+
+
+class VaccinationSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Vaccination
+        fields = '__all__'
+
+
+class FeedingRationSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FeedingRation
+        fields = '__all__'
+
+
+class CalendarEventSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CalendarEvent
+        fields = '__all__'
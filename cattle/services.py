@@ -0,0 +1,292 @@
+import contextlib
+import contextvars
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Cattle, CattleStatus, ChangeLog, HealthCheck, Housing, TableVersion
+
+STATUS_FIELDS = ['latest_status', 'latest_check_date', 'latest_weight']
+
+HERD_SUMMARY_CACHE_KEY = 'cattle:herd_summary'
+
+
+# ---------------- สถานะล่าสุดของโค ----------------
+def latest_checks():
+    # HealthCheck ล่าสุดก่อน (วันที่ตรวจ แล้วตาม id)
+    return HealthCheck.objects.order_by('-check_date', '-id')
+
+
+def refresh_cattle_status(cattle_id):
+    latest = latest_checks().filter(cattle_id=cattle_id).values('status', 'check_date', 'weight').first()
+    if latest is None:
+        CattleStatus.objects.filter(cattle_id=cattle_id).delete()
+        status = None
+    else:
+        status, _ = CattleStatus.objects.update_or_create(
+            cattle_id=cattle_id,
+            defaults={
+                'latest_status': latest['status'],
+                'latest_check_date': latest['check_date'],
+                'latest_weight': latest['weight'],
+            },
+        )
+    refresh_pens(pens_of([cattle_id]))
+    return status
+
+
+def rebuild_cattle_status(cattle_ids=None, batch_size=1000):
+    # คำนวณใหม่ทั้งฝูง (หรือเฉพาะ cattle_ids) แบบเป็นชุด
+    if cattle_ids is None:
+        total = _rebuild_status_rows(Cattle.objects.all(), batch_size)
+    else:
+        cattle_ids = sorted(set(cattle_ids))
+        total = 0
+        for i in range(0, len(cattle_ids), batch_size):
+            chunk = cattle_ids[i:i + batch_size]
+            total += _rebuild_status_rows(Cattle.objects.filter(pk__in=chunk), batch_size)
+    invalidate_herd_summary()
+    touch_tables(CattleStatus)
+    refresh_pens(None if cattle_ids is None else pens_of(cattle_ids))
+    return total
+
+
+def _rebuild_status_rows(cattle_qs, batch_size):
+    latest = latest_checks().filter(cattle=OuterRef('pk'))
+    rows = cattle_qs.annotate(
+        latest_status=Subquery(latest.values('status')[:1]),
+        latest_check_date=Subquery(latest.values('check_date')[:1]),
+        latest_weight=Subquery(latest.values('weight')[:1]),
+    ).values_list('pk', *STATUS_FIELDS).order_by('pk')
+
+    total = 0
+    batch, empty = [], []
+    for pk, status, check_date, weight in rows.iterator(chunk_size=batch_size):
+        if status is None:
+            empty.append(pk)
+        else:
+            batch.append(CattleStatus(
+                cattle_id=pk,
+                latest_status=status,
+                latest_check_date=check_date,
+                latest_weight=weight,
+            ))
+        if len(batch) >= batch_size:
+            total += _save_status_batch(batch)
+            batch = []
+        if len(empty) >= batch_size:
+            CattleStatus.objects.filter(cattle_id__in=empty).delete()
+            empty = []
+
+    total += _save_status_batch(batch)
+    if empty:
+        CattleStatus.objects.filter(cattle_id__in=empty).delete()
+    return total
+
+
+def _save_status_batch(batch):
+    if not batch:
+        return 0
+    CattleStatus.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['cattle'],
+        update_fields=STATUS_FIELDS + ['updated_at'],
+    )
+    return len(batch)
+
+
+# ---------------- ยอดสรุปรายคอก (Housing) ----------------
+PEN_FIELDS = ['head_count', 'sick_count', 'for_sale_count', 'avg_weight']
+
+
+def assign_pens(cattle):
+    # สำหรับ bulk_create: แปลงชื่อคอกเป็น Housing (สร้างที่ยังไม่มีใน query เดียว) แล้วตั้ง pen_id ให้ทุกตัว
+    names = {(c.housing or '').strip() for c in cattle} - {''}
+    if names:
+        Housing.objects.bulk_create([Housing(name=name) for name in names], ignore_conflicts=True)
+    pens = dict(Housing.objects.filter(name__in=names).values_list('name', 'pk')) if names else {}
+    for c in cattle:
+        c.pen_id = pens.get((c.housing or '').strip())
+    return cattle
+
+
+def pens_of(cattle_ids):
+    return set(Cattle.objects.filter(pk__in=list(cattle_ids), pen__isnull=False).values_list('pen_id', flat=True))
+
+
+def refresh_pens(pen_ids=None):
+    # นับใหม่เฉพาะคอกที่ระบุ (None = ทุกคอก) ด้วย GROUP BY ผ่าน index ของ pen → ไม่ต้องสแกนทั้งฝูง
+    pens = Housing.objects.all()
+    if pen_ids is not None:
+        pen_ids = {pk for pk in pen_ids if pk is not None}
+        if not pen_ids:
+            return 0
+        pens = pens.filter(pk__in=pen_ids)
+    cattle = Cattle.objects.filter(pen__isnull=False)
+    if pen_ids is not None:
+        cattle = cattle.filter(pen_id__in=pen_ids)
+    rollup = {
+        row.pop('pen_id'): row
+        for row in cattle.values('pen_id').annotate(
+            head_count=Count('pk'),
+            sick_count=Count('pk', filter=Q(current_status__latest_status='sick')),
+            for_sale_count=Count('pk', filter=Q(current_status__latest_status='forsale')),
+            avg_weight=Avg('current_status__latest_weight'),
+        ).order_by()
+    }
+    now = timezone.now()
+    updated = []
+    empty = {'head_count': 0, 'sick_count': 0, 'for_sale_count': 0, 'avg_weight': None}
+    for pen in pens:
+        row = rollup.get(pen.pk, empty)
+        pen.head_count = row['head_count']
+        pen.sick_count = row['sick_count']
+        pen.for_sale_count = row['for_sale_count']
+        pen.avg_weight = round(row['avg_weight'], 2) if row['avg_weight'] is not None else None
+        pen.updated_at = now
+        updated.append(pen)
+    Housing.objects.bulk_update(updated, PEN_FIELDS + ['updated_at'], batch_size=500)
+    touch_tables(Housing)
+    return len(updated)
+
+
+# ---------------- สรุปภาพรวมฝูง (Dashboard) ----------------
+def _herd_summary_aggregates():
+    # นับทั้งหมด / ป่วย / พร้อมขาย ใน query เดียว
+    return {
+        'total': Count('pk'),
+        'sick_count': Count('pk', filter=Q(current_status__latest_status='sick')),
+        'for_sale_count': Count('pk', filter=Q(current_status__latest_status='forsale')),
+    }
+
+
+def compute_herd_summary():
+    return Cattle.objects.aggregate(**_herd_summary_aggregates())
+
+
+def herd_summary():
+    # key ผูกกับเวอร์ชันในฐานข้อมูล → ล้างจาก worker ใดก็เห็นผลทุก worker
+    key = f'{HERD_SUMMARY_CACHE_KEY}:{cache_version(HERD_SUMMARY_CACHE_KEY)}'
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_herd_summary()
+        cache.set(key, summary, settings.HERD_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+async def aherd_summary():
+    # สำหรับ async view (ASGI) — cache และ aggregate แบบ async
+    key = f'{HERD_SUMMARY_CACHE_KEY}:{await acache_version(HERD_SUMMARY_CACHE_KEY)}'
+    summary = await cache.aget(key)
+    if summary is None:
+        summary = await Cattle.objects.aaggregate(**_herd_summary_aggregates())
+        await cache.aset(key, summary, settings.HERD_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_herd_summary():
+    bump_cache_version(HERD_SUMMARY_CACHE_KEY)
+
+
+# ---------------- เลขเวอร์ชันของ cache ในโปรเซส ----------------
+# เก็บเป็นตัวนับใน TableVersion (ฐานข้อมูล) ไม่ใช่ใน cache → ทุก worker เห็นเลขเดียวกันแม้ cache เป็น LocMemCache
+def cache_version(key):
+    # ข้อมูลที่สร้างไว้ในหน่วยความจำของแต่ละโปรเซส ใช้เลขเวอร์ชันนี้ตรวจว่ายังใช้ได้อยู่หรือไม่
+    return table_versions(key)[key][0]
+
+
+async def acache_version(key):
+    return (await atable_versions(key))[key][0]
+
+
+def bump_cache_version(key):
+    # เลื่อนหลัง commit → worker อื่นไม่สร้าง cache ใหม่จากข้อมูลที่ยังไม่ commit
+    touch_tables(key)
+
+
+# ---------------- เวอร์ชันของตาราง (ETag / Last-Modified) ----------------
+def _table_label(table):
+    # รับได้ทั้ง model หรือชื่อ (สำหรับตัวนับที่ไม่ใช่ตารางจริง เช่น "cattle.healthcheck.rewrite")
+    return table if isinstance(table, str) else table._meta.label_lower
+
+
+def touch_tables(*tables):
+    # เลื่อนเวอร์ชันหลัง commit → ไม่ถือ row lock ตลอด transaction ใหญ่ และไม่นับถ้า rollback
+    labels = sorted({_table_label(table) for table in tables})
+    transaction.on_commit(lambda: _bump_tables(labels))
+
+
+def _bump_tables(labels):
+    now = timezone.now()
+    for label in labels:
+        if not TableVersion.objects.filter(table=label).update(version=F('version') + 1, updated_at=now):
+            TableVersion.objects.get_or_create(table=label, defaults={'version': 1})
+
+
+def _versions_query(tables):
+    labels = sorted({_table_label(table) for table in tables})
+    query = TableVersion.objects.filter(table__in=labels).values_list('table', 'version', 'updated_at')
+    return {label: (0, None) for label in labels}, query
+
+
+def table_versions(*tables):
+    # {label: (version, updated_at)} ใน query เดียวด้วย primary key (ตารางที่ยังไม่เคยเปลี่ยน = version 0)
+    versions, query = _versions_query(tables)
+    versions.update((table, (version, updated_at)) for table, version, updated_at in query)
+    return versions
+
+
+async def atable_versions(*tables):
+    versions, query = _versions_query(tables)
+    async for table, version, updated_at in query:
+        versions[table] = (version, updated_at)
+    return versions
+
+
+def _state(versions):
+    token = ','.join(f'{label}:{version}' for label, (version, _) in versions.items())
+    last_modified = max((updated_at for _, updated_at in versions.values() if updated_at), default=None)
+    return token, last_modified
+
+
+def table_state(*tables):
+    # (token ของเวอร์ชัน, เวลาแก้ไขล่าสุด) สำหรับ ETag / Last-Modified
+    return _state(table_versions(*tables))
+
+
+async def atable_state(*tables):
+    return _state(await atable_versions(*tables))
+
+
+# ---------------- Change log (delta sync) ----------------
+# model ที่ผู้เรียกบันทึก change log เอง (push ของ sync บันทึกพร้อม ref) → signal ไม่ต้องบันทึกซ้ำ
+_self_logged = contextvars.ContextVar('cattle_self_logged', default=None)
+
+
+@contextlib.contextmanager
+def logging_changes_of(model):
+    reset = _self_logged.set(model)
+    try:
+        yield
+    finally:
+        _self_logged.reset(reset)
+
+
+def logs_own_changes(model):
+    return _self_logged.get() is model
+
+
+def record_changes(model, ids, op=ChangeLog.UPSERT, client_refs=None):
+    # บันทึกหลัง commit เหมือน touch_tables → seq เรียงตามลำดับที่ข้อมูล commit จริง และไม่บันทึกถ้า rollback
+    # client_refs: {object_id: ref} ของรายการที่ client ส่งมา (กันส่งซ้ำ)
+    label = model._meta.label_lower
+    client_refs = client_refs or {}
+    rows = [ChangeLog(table=label, object_id=pk, op=op, client_ref=client_refs.get(pk)) for pk in ids]
+    if rows:
+        transaction.on_commit(
+            lambda: ChangeLog.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=bool(client_refs))
+        )
@@ -0,0 +1,161 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    CalendarEvent, CalendarEventException, Cattle, CattleStatus, ChangeLog, FeedingRation, HealthCheck, Housing, Vaccination,
+)
+from .analytics import invalidate_growth
+from .feeding import rebuild_feeding_slots
+from .pedigree import PEDIGREE_FIELDS, invalidate_pedigree
+from .search import SEARCH_FIELDS, invalidate_search_index
+from .services import (
+    invalidate_herd_summary, logs_own_changes, record_changes, refresh_cattle_status, refresh_pens, touch_tables,
+)
+from .snapshot import mark_history_rewritten
+from .vitals import rebuild_vital_baselines, score_healthcheck
+
+
+def _deleting_cattle(origin):
+    # ลบโคทั้งตัว → CattleStatus ถูกลบตามไปเอง ไม่ต้องคำนวณใหม่
+    if isinstance(origin, Cattle):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Cattle
+
+
+@receiver(post_save, sender=HealthCheck)
+def healthcheck_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_cattle_status(instance.cattle_id)
+
+    loaded_cattle_id = getattr(instance, '_loaded_cattle_id', None)
+    moved = loaded_cattle_id and loaded_cattle_id != instance.cattle_id
+    if moved:
+        refresh_cattle_status(loaded_cattle_id)
+
+    # ค่าชีพ: รายการใหม่อัปเดต baseline แบบ O(1) ส่วนการแก้ไขค่าเดิมต้องคำนวณโคตัวนั้นใหม่
+    vitals = (instance.temperature, instance.heart_rate)
+    if created:
+        score_healthcheck(instance)
+    else:
+        mark_history_rewritten()
+        if moved or getattr(instance, '_loaded_vitals', None) != vitals:
+            rebuild_vital_baselines({instance.cattle_id, loaded_cattle_id} - {None})
+
+    instance._loaded_cattle_id = instance.cattle_id
+    instance._loaded_vitals = vitals
+
+
+@receiver(post_delete, sender=HealthCheck)
+def healthcheck_deleted(sender, instance, origin=None, **kwargs):
+    mark_history_rewritten()
+    if _deleting_cattle(origin):
+        return
+    refresh_cattle_status(instance.cattle_id)
+    if instance.temperature is not None or instance.heart_rate is not None:
+        rebuild_vital_baselines([instance.cattle_id])
+
+
+@receiver(post_save, sender=Cattle)
+@receiver(post_delete, sender=Cattle)
+@receiver(post_save, sender=HealthCheck)
+@receiver(post_delete, sender=HealthCheck)
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+def clear_herd_summary(sender, **kwargs):
+    invalidate_herd_summary()
+
+
+@receiver(post_save, sender=HealthCheck)
+@receiver(post_delete, sender=HealthCheck)
+@receiver(post_save, sender=Cattle)
+@receiver(post_delete, sender=Cattle)
+def clear_growth(sender, **kwargs):
+    invalidate_growth()
+
+
+@receiver(post_save, sender=Cattle)
+@receiver(post_delete, sender=Cattle)
+@receiver(post_save, sender=HealthCheck)
+@receiver(post_delete, sender=HealthCheck)
+@receiver(post_save, sender=CattleStatus)
+@receiver(post_delete, sender=CattleStatus)
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+@receiver(post_save, sender=FeedingRation)
+@receiver(post_delete, sender=FeedingRation)
+@receiver(post_save, sender=Housing)
+@receiver(post_delete, sender=Housing)
+def bump_table_version(sender, **kwargs):
+    touch_tables(sender)
+
+
+# change log ของ delta sync (/api/sync/)
+@receiver(post_save, sender=Cattle)
+@receiver(post_save, sender=HealthCheck)
+@receiver(post_save, sender=Vaccination)
+@receiver(post_save, sender=FeedingRation)
+@receiver(post_save, sender=CalendarEvent)
+def log_change(sender, instance, raw=False, **kwargs):
+    if not raw and not logs_own_changes(sender):
+        record_changes(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Cattle)
+@receiver(post_delete, sender=HealthCheck)
+@receiver(post_delete, sender=Vaccination)
+@receiver(post_delete, sender=FeedingRation)
+@receiver(post_delete, sender=CalendarEvent)
+def log_delete(sender, instance, origin=None, **kwargs):
+    # ลบโคทั้งตัว → client ลบประวัติของโคตัวนั้นเอง ไม่ต้องบันทึกทีละแถว
+    if sender is not Cattle and _deleting_cattle(origin):
+        return
+    record_changes(sender, [instance.pk], ChangeLog.DELETE)
+
+
+@receiver(post_save, sender=FeedingRation)
+def ration_saved(sender, instance, raw=False, **kwargs):
+    # แยก feeding_time เป็นรอบ (FeedingSlot) ใหม่ทุกครั้งที่บันทึก
+    if not raw:
+        rebuild_feeding_slots([instance.pk])
+
+
+@receiver(post_save, sender=CalendarEventException)
+@receiver(post_delete, sender=CalendarEventException)
+def bump_calendar_version(sender, **kwargs):
+    # ข้อยกเว้นของกิจกรรมซ้ำเปลี่ยน feed ปฏิทิน → ETag ต้องเปลี่ยนด้วย
+    touch_tables(CalendarEvent)
+
+
+@receiver(post_save, sender=CalendarEventException)
+@receiver(post_delete, sender=CalendarEventException)
+def extend_series_end(sender, instance, raw=False, origin=None, **kwargs):
+    # ครั้งที่ถูกย้ายไปหลังครั้งสุดท้ายต้องอยู่ในขอบเขต recurrence_end ที่ใช้กรองด้วย SQL
+    if raw or _deleting_cattle(origin):
+        return
+    if isinstance(origin, CalendarEvent) or isinstance(origin, QuerySet) and origin.model is CalendarEvent:
+        return  # ลบทั้งชุด
+    event = CalendarEvent.objects.filter(pk=instance.event_id).first()
+    if event is not None:
+        CalendarEvent.objects.filter(pk=event.pk).update(recurrence_end=event.series_end())
+
+
+@receiver(post_save, sender=Cattle)
+def cattle_saved(sender, instance, created=False, **kwargs):
+    changed = instance.changed_fields()
+    if created or changed & PEDIGREE_FIELDS:
+        invalidate_pedigree()
+    if created or changed & set(SEARCH_FIELDS):
+        invalidate_search_index()
+    # ย้ายคอก → นับใหม่ทั้งคอกเดิมและคอกใหม่
+    if created or 'pen_id' in changed:
+        refresh_pens({instance.pen_id, getattr(instance, '_loaded_values', {}).get('pen_id')})
+    instance._loaded_values = {f.attname: getattr(instance, f.attname) for f in sender._meta.concrete_fields}
+
+
+@receiver(post_delete, sender=Cattle)
+def cattle_deleted(sender, instance, **kwargs):
+    invalidate_pedigree()
+    invalidate_search_index()
+    refresh_pens([instance.pen_id])
@@ -0,0 +1,268 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import HealthCheck
+from .services import table_versions, touch_tables
+
+# snapshot แบบ columnar ของ HealthCheck ทั้งหมด: ไฟล์ .npy ต่อคอลัมน์ เปิดด้วย memory map (ไม่ copy)
+# แต่ละ segment เรียงตาม (cattle_id, check_date, id) และมี index ช่วงแถวของโคแต่ละตัว
+# รอบถัดไปต่อท้ายเฉพาะแถวใหม่ (id > last_id) เป็น segment ใหม่ ครบ MAX_SEGMENTS ค่อยรวมเป็นก้อนเดียว
+
+SNAPSHOT_FORMAT = 1
+COLUMNS = {
+    'id': np.int64,
+    'cattle_id': np.int64,
+    'check_date': np.int32,  # จำนวนวันนับจาก 1970-01-01
+    'temperature': np.float32,  # ค่าว่าง = NaN
+    'heart_rate': np.float32,
+    'weight': np.float32,
+    'status': np.int8,  # index ใน STATUS_CODES, -1 = ไม่รู้จัก
+}
+STATUS_CODES = [value for value, _ in HealthCheck._meta.get_field('status').choices]
+MAX_SEGMENTS = 4
+FETCH_CHUNK_SIZE = 50000
+# ตัวนับแยกสำหรับการแก้ไข/ลบ HealthCheck เดิม (การเพิ่มใหม่ต่อท้ายได้ แต่การแก้ไขต้องสร้างใหม่ทั้งหมด)
+REWRITE_LABEL = 'cattle.healthcheck.rewrite'
+
+# snapshot ที่เปิดไว้ในโปรเซสนี้ → (mtime ของ meta.json, HealthSnapshot)
+_opened = None
+
+
+def snapshot_dir():
+    return Path(settings.HEALTH_SNAPSHOT_DIR)
+
+
+def mark_history_rewritten():
+    touch_tables(REWRITE_LABEL)
+
+
+# ---------------- อ่าน ----------------
+class HealthSnapshot:
+    def __init__(self, path, meta):
+        self.path = Path(path)
+        self.meta = meta
+        self.segments = []
+        for name in meta['segments']:
+            folder = self.path / name
+            segment = {column: np.load(folder / f'{column}.npy', mmap_mode='r') for column in COLUMNS}
+            segment['index_cattle'] = np.load(folder / 'index_cattle.npy', mmap_mode='r')
+            segment['index_offsets'] = np.load(folder / 'index_offsets.npy', mmap_mode='r')
+            self.segments.append(segment)
+
+    @classmethod
+    def open(cls, path=None):
+        path = Path(path or snapshot_dir())
+        try:
+            with open(path / 'meta.json', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            return None
+        return cls(path, meta)
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def is_current(self):
+        # ใช้เป็นฐานได้ตราบที่ไม่มีการแก้ไข/ลบแถวเดิม (query เดียว) — แถวที่เพิ่มทีหลังอ่านจาก ORM ด้วย delta()
+        # แถว id <= last_id ที่ commit ช้ากว่าตอนสร้าง snapshot จะเข้ามาเมื่อ refresh_snapshot รอบถัดไป (ตรวจจำนวนแถว)
+        return table_versions(REWRITE_LABEL)[REWRITE_LABEL][0] == self.meta['rewrite_version']
+
+    def delta(self):
+        # แถวที่เพิ่มหลังสร้าง snapshot (id > last_id) จาก ORM — ปกติมีไม่กี่แถวและใช้ index ของ primary key
+        return _fetch(HealthCheck.objects.filter(id__gt=self.meta['last_id']))
+
+    def columns(self, names, cattle_ids=None):
+        # คอลัมน์ของทั้งฝูง (หรือเฉพาะโคที่ระบุ) เรียงตาม (cattle_id, check_date, id)
+        # segment เดียวและไม่กรอง → คืน memmap ตรงๆ ไม่ copy
+        if len(self.segments) == 1 and cattle_ids is None:
+            return {name: self.segments[0][name] for name in names}
+        if cattle_ids is not None:
+            wanted = np.unique(np.asarray(list(cattle_ids), dtype=np.int64))
+        parts = {name: [] for name in set(names) | {'cattle_id', 'check_date', 'id'}}
+        for segment in self.segments:
+            rows = slice(None)
+            if cattle_ids is not None:
+                rows = _rows_for(segment, wanted)
+            for name in parts:
+                parts[name].append(segment[name][rows])
+        merged = {name: np.concatenate(values) if values else np.zeros(0, COLUMNS[name]) for name, values in parts.items()}
+        order = np.lexsort((merged['id'], merged['check_date'], merged['cattle_id']))
+        return {name: merged[name][order] for name in names}
+
+    def for_cattle(self, cattle_id):
+        return self.columns(list(COLUMNS), cattle_ids=[cattle_id])
+
+    def weight_series(self, cattle_ids=None):
+        # รูปแบบเดียวกับ analytics.load_weight_series → (ids, days, weights) = snapshot + แถวใหม่จาก ORM
+        data = self.columns(['cattle_id', 'check_date', 'weight'], cattle_ids)
+        added = self.delta()
+        if cattle_ids is not None:
+            wanted = np.asarray(list(cattle_ids), dtype=np.int64)
+            added = {name: values[np.isin(added['cattle_id'], wanted)] for name, values in added.items()}
+        if len(added['id']):
+            # lexsort คงลำดับเดิมเมื่อโคและวันเดียวกัน → แถวใหม่ (id มากกว่า) อยู่หลังแถวใน snapshot
+            merged = {name: np.concatenate((data[name], added[name])) for name in data}
+            order = np.lexsort((merged['check_date'], merged['cattle_id']))
+            data = {name: values[order] for name, values in merged.items()}
+        weighed = ~np.isnan(data['weight'])
+        return (
+            data['cattle_id'][weighed].astype(np.int64),
+            data['check_date'][weighed].astype(np.int64),
+            data['weight'][weighed].astype(np.float64),
+        )
+
+
+def _rows_for(segment, wanted):
+    # ตำแหน่งแถวของโคที่ต้องการ จาก index (cattle_id → ช่วงแถว) ของ segment
+    index = segment['index_cattle']
+    found = np.searchsorted(index, wanted)
+    found = found[(found < len(index)) & (index[np.minimum(found, len(index) - 1)] == wanted)]
+    starts = segment['index_offsets'][found]
+    ends = segment['index_offsets'][found + 1]
+    sizes = ends - starts
+    return np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(int(sizes.sum()))
+
+
+def open_snapshot():
+    # เปิดครั้งเดียวต่อโปรเซส จนกว่า meta.json จะเปลี่ยน
+    global _opened
+    try:
+        mtime = (snapshot_dir() / 'meta.json').stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _opened is None or _opened[0] != mtime:
+        _opened = (mtime, HealthSnapshot.open())
+    return _opened[1]
+
+
+def current_snapshot():
+    # snapshot ที่ตรงกับฐานข้อมูล (ไม่งั้น None → ให้ไปอ่านจาก ORM แทน)
+    snapshot = open_snapshot()
+    if snapshot is not None and snapshot.is_current():
+        return snapshot
+    return None
+
+
+# ---------------- เขียน ----------------
+def _fetch(queryset):
+    # ดึงแถวจาก DB เป็นชุดๆ แปลงเป็น numpy ทีละชุด (ไม่สร้าง model instance)
+    status_code = {status: code for code, status in enumerate(STATUS_CODES)}
+    rows = queryset.order_by('cattle_id', 'check_date', 'id').values_list(
+        'id', 'cattle_id', 'check_date', 'temperature', 'heart_rate', 'weight', 'status'
+    )
+    parts = {column: [] for column in COLUMNS}
+    chunk = []
+    for row in rows.iterator(chunk_size=FETCH_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= FETCH_CHUNK_SIZE:
+            _append_chunk(parts, chunk, status_code)
+            chunk = []
+    _append_chunk(parts, chunk, status_code)
+    return {column: np.concatenate(values) for column, values in parts.items()}
+
+
+def _append_chunk(parts, chunk, status_code):
+    ids, cattle_ids, dates, temperatures, heart_rates, weights, statuses = zip(*chunk) if chunk else ([],) * 7
+    parts['id'].append(np.array(ids, dtype=np.int64))
+    parts['cattle_id'].append(np.array(cattle_ids, dtype=np.int64))
+    parts['check_date'].append(np.array(dates, dtype='datetime64[D]').astype(np.int32))
+    parts['temperature'].append(np.array(temperatures, dtype=np.float64).astype(np.float32))
+    parts['heart_rate'].append(np.array(heart_rates, dtype=np.float64).astype(np.float32))
+    parts['weight'].append(np.array(weights, dtype=np.float64).astype(np.float32))
+    parts['status'].append(np.array([status_code.get(s, -1) for s in statuses], dtype=np.int8))
+
+
+def _write_segment(path, name, data):
+    # เขียนลงโฟลเดอร์ชั่วคราวก่อนแล้วค่อย rename → ผู้อ่านไม่เห็นไฟล์ที่เขียนไม่เสร็จ
+    tmp = path / f'{name}.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for column, dtype in COLUMNS.items():
+        np.save(tmp / f'{column}.npy', np.ascontiguousarray(data[column], dtype=dtype))
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(data['cattle_id'])) + 1)) if len(data['id']) else np.zeros(0, np.int64)
+    np.save(tmp / 'index_cattle.npy', np.asarray(data['cattle_id'][starts], dtype=np.int64))
+    np.save(tmp / 'index_offsets.npy', np.append(starts, len(data['id'])).astype(np.int64))
+    os.replace(tmp, path / name)
+
+
+def _write_meta(path, meta):
+    tmp = path / 'meta.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, path / 'meta.json')
+
+
+def _segment_name(meta):
+    return f"seg-{meta.get('next_segment', 1):06d}"
+
+
+def refresh_snapshot(full=False, path=None):
+    # คืนค่า {'mode': 'full'|'append'|'compact'|'unchanged', 'rows': ทั้งหมด, 'added': แถวใหม่}
+    path = Path(path or snapshot_dir())
+    path.mkdir(parents=True, exist_ok=True)
+    snapshot = HealthSnapshot.open(path)
+    # อ่านเวอร์ชันก่อนดึงข้อมูล → ถ้ามีการเขียนระหว่างนี้ snapshot จะไม่ถือว่าเป็นปัจจุบัน
+    versions = table_versions(HealthCheck, REWRITE_LABEL)
+    version, rewrite_version = versions['cattle.healthcheck'][0], versions[REWRITE_LABEL][0]
+
+    if snapshot is not None and not full and snapshot.meta['rewrite_version'] == rewrite_version:
+        if snapshot.meta['version'] == version:
+            return {'mode': 'unchanged', 'rows': len(snapshot), 'added': 0}
+        last_id = snapshot.meta['last_id']
+        added = _fetch(HealthCheck.objects.filter(id__gt=last_id))
+        total = len(snapshot) + len(added['id'])
+        new_last_id = int(added['id'].max()) if len(added['id']) else last_id
+        # แถวที่ commit ช้ากว่า id ที่ใหม่กว่า (หรือถูกลบ) จะทำให้จำนวนไม่ตรง → สร้างใหม่ทั้งหมด
+        if HealthCheck.objects.filter(id__lte=new_last_id).count() == total:
+            meta = dict(snapshot.meta)
+            old_segments = []
+            if len(meta['segments']) + 1 > MAX_SEGMENTS:
+                merged = snapshot.columns(list(COLUMNS))
+                data = {column: np.concatenate((merged[column], added[column])) for column in COLUMNS}
+                order = np.lexsort((data['id'], data['check_date'], data['cattle_id']))
+                data = {column: values[order] for column, values in data.items()}
+                old_segments, meta['segments'], mode = meta['segments'], [], 'compact'
+            else:
+                data, mode = added, 'append'
+            name = _segment_name(meta)
+            _write_segment(path, name, data)
+            meta.update({
+                'segments': meta['segments'] + [name],
+                'next_segment': meta.get('next_segment', 1) + 1,
+                'rows': total,
+                'last_id': new_last_id,
+                'version': version,
+                'built_at': timezone.now().isoformat(),
+            })
+            _write_meta(path, meta)
+            for old in old_segments:
+                shutil.rmtree(path / old, ignore_errors=True)
+            return {'mode': mode, 'rows': total, 'added': len(added['id'])}
+
+    data = _fetch(HealthCheck.objects.all())
+    meta = snapshot.meta if snapshot is not None else {}
+    name = _segment_name(meta)
+    _write_segment(path, name, data)
+    new_meta = {
+        'format': SNAPSHOT_FORMAT,
+        'segments': [name],
+        'next_segment': meta.get('next_segment', 1) + 1,
+        'rows': len(data['id']),
+        'last_id': int(data['id'].max()) if len(data['id']) else 0,
+        'version': version,
+        'rewrite_version': rewrite_version,
+        'status_codes': STATUS_CODES,
+        'built_at': timezone.now().isoformat(),
+    }
+    _write_meta(path, new_meta)
+    for old in meta.get('segments', []):
+        shutil.rmtree(path / old, ignore_errors=True)
+    return {'mode': 'full', 'rows': new_meta['rows'], 'added': new_meta['rows']}
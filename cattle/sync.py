@@ -0,0 +1,217 @@
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .archive import archive_cattle
+from .models import CalendarEvent, Cattle, ChangeLog, FeedingRation, HealthCheck, TableVersion, Vaccination
+from .serializers import (
+    CalendarEventSyncSerializer, CattleSyncSerializer, FeedingRationSyncSerializer, HealthCheckSerializer,
+    VaccinationSyncSerializer,
+)
+from .services import logging_changes_of, record_changes
+
+# delta sync ของแท็บเล็ตในคอก:
+#   pull  GET  /api/sync/?since=<token> → การเปลี่ยนแปลงหลัง token (ไม่มี token / token เก่ากว่าที่เก็บไว้ → reset)
+#   push  POST /api/sync/ {"token": .., "changes": [..]} → รายการที่บันทึกตอน offline พร้อมตรวจ conflict
+#         ผลที่ ok มี base = seq ของรายการที่เพิ่งบันทึก → ใช้เป็น base ตอนแก้ object นั้นครั้งถัดไป (ไม่ชนกับของตัวเอง)
+# ลบโค = ลบประวัติทั้งหมดของโคตัวนั้นฝั่ง client ด้วย (ฝั่ง server ไม่บันทึกการลบประวัติทีละแถว)
+
+SYNC_PULL_LIMIT = 1000
+SYNC_PULL_MAX = 5000
+SYNC_PUSH_LIMIT = 500
+SYNC_PRUNE_BATCH_SIZE = 10000
+# ref ที่ client สร้างเอง (เช่น UUID) ต้องไม่ยาวเกินคอลัมน์ ChangeLog.client_ref
+SYNC_REF_MAX_LENGTH = ChangeLog._meta.get_field('client_ref').max_length
+# seq สูงสุดที่ถูกลบออกจาก change log แล้ว (เก็บใน TableVersion)
+PRUNED_KEY = 'cattle.changelog.pruned'
+
+# ชื่อใน API → (model, serializer) ตามลำดับที่ client ควรนำไปใช้ (โคก่อนประวัติ)
+SYNC_TABLES = {
+    'cattle': (Cattle, CattleSyncSerializer),
+    'healthcheck': (HealthCheck, HealthCheckSerializer),
+    'vaccination': (Vaccination, VaccinationSyncSerializer),
+    'ration': (FeedingRation, FeedingRationSyncSerializer),
+    'event': (CalendarEvent, CalendarEventSyncSerializer),
+}
+
+
+def _visible(model):
+    # เฉพาะข้อมูลที่หน้าเว็บ/API เห็น — ของโคที่คัดออกแล้วนับเป็น "ลบ"
+    if model is Cattle:
+        return Cattle.objects.all()
+    return model.objects.filter(cattle__archived_at__isnull=True)
+
+
+def _pruned_seq():
+    return TableVersion.objects.filter(table=PRUNED_KEY).values_list('version', flat=True).first() or 0
+
+
+def current_token():
+    return str(ChangeLog.objects.aggregate(last=Max('seq'))['last'] or 0)
+
+
+# ---------------- Pull ----------------
+def pull_changes(since=None, limit=SYNC_PULL_LIMIT):
+    # query คงที่: change log 1 ครั้ง + ตารางละไม่เกิน 1 ครั้ง → ขนาดตามจำนวนที่เปลี่ยน ไม่ใช่ขนาดฝูง
+    if since is None or since < _pruned_seq():
+        # client ใหม่ / token หมดอายุ → ดาวน์โหลดเต็มจาก /api/cattle/ ฯลฯ แล้ว sync ต่อจาก token นี้
+        # (ขอ token ก่อนดาวน์โหลด → สิ่งที่เปลี่ยนระหว่างนั้นจะมาซ้ำใน pull ถัดไป ไม่หาย)
+        return {'token': current_token(), 'reset': True, 'more': False, 'changes': {}}
+
+    # รายการที่เพิ่งบันทึกรอไว้ก่อน → transaction ที่ commit ช้ากว่า (seq น้อยกว่า) ไม่หลุดจาก token
+    settled = timezone.now() - datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    rows = list(
+        ChangeLog.objects.filter(seq__gt=since, recorded_at__lte=settled)
+        .order_by('seq')
+        .values_list('seq', 'table', 'object_id', 'op')[:limit]
+    )
+    latest = {}
+    for _, table, object_id, op in rows:
+        latest[table, object_id] = op  # object เดียวแก้หลายครั้ง → ส่งครั้งเดียว (สถานะปัจจุบัน)
+
+    changes = {}
+    for name, (model, serializer_class) in SYNC_TABLES.items():
+        label = model._meta.label_lower
+        upserts = [object_id for (table, object_id), op in latest.items() if table == label and op == ChangeLog.UPSERT]
+        deletes = {object_id for (table, object_id), op in latest.items() if table == label and op == ChangeLog.DELETE}
+        objects = _visible(model).in_bulk(upserts) if upserts else {}
+        deletes |= set(upserts) - set(objects)
+        if objects or deletes:
+            changes[name] = {
+                'upserts': serializer_class(list(objects.values()), many=True).data,
+                'deletes': sorted(deletes),
+            }
+    return {
+        'token': str(rows[-1][0] if rows else since),
+        'reset': False,
+        'more': len(rows) == limit,
+        'changes': changes,
+    }
+
+
+# ---------------- Push ----------------
+def _conflict(model, pk, base):
+    # มีการเปลี่ยน object นี้บน server หลัง token ที่ client เห็นล่าสุด
+    return base is not None and ChangeLog.objects.filter(
+        table=model._meta.label_lower, object_id=pk, seq__gt=base,
+    ).exists()
+
+
+def _apply(change, token, applied):
+    if not isinstance(change, dict) or change.get('table') not in SYNC_TABLES:
+        return {'status': 'error', 'errors': {'table': [f'ต้องเป็นหนึ่งใน {", ".join(SYNC_TABLES)}']}}
+    model, serializer_class = SYNC_TABLES[change['table']]
+    op = change.get('op', ChangeLog.UPSERT)
+    pk = change.get('id')
+    ref = change.get('ref')
+    # ตรวจชนิดก่อนแตะฐานข้อมูล → รายการที่ผิดได้ error ของตัวเอง ไม่ทำให้ทั้งชุด 500
+    if pk is not None and (not isinstance(pk, int) or isinstance(pk, bool) or pk < 1):
+        return {'status': 'error', 'errors': {'id': ['ต้องเป็นจำนวนเต็มบวก']}}
+    if ref is not None and (not isinstance(ref, str) or not 0 < len(ref) <= SYNC_REF_MAX_LENGTH):
+        return {'status': 'error', 'id': pk, 'errors': {'ref': [f'ต้องเป็นข้อความยาว 1-{SYNC_REF_MAX_LENGTH} ตัวอักษร']}}
+    if op not in (ChangeLog.UPSERT, ChangeLog.DELETE):
+        return {'status': 'error', 'id': pk, 'errors': {'op': ['ต้องเป็น upsert หรือ delete']}}
+    if ref and ref in applied:
+        # ส่งซ้ำหลังเน็ตหลุด → บันทึกไปแล้ว
+        return {'status': 'ok', 'id': applied[ref]}
+    if op == ChangeLog.DELETE and pk is None:
+        return {'status': 'error', 'errors': {'id': ['ต้องระบุ id ที่จะลบ']}}
+
+    try:
+        base = change.get('base', token)
+        base = None if base is None else int(base)
+    except (TypeError, ValueError):
+        return {'status': 'error', 'id': pk, 'errors': {'base': ['token ไม่ถูกต้อง']}}
+
+    instance = None
+    if pk is not None:
+        instance = _visible(model).filter(pk=pk).first()
+        if instance is None:
+            # ถูกลบบน server แล้ว: ลบซ้ำ = สำเร็จ, แก้ไข = conflict
+            if op == ChangeLog.DELETE:
+                return {'status': 'ok', 'id': pk}
+            return {'status': 'conflict', 'id': pk, 'current': None}
+        if _conflict(model, pk, base):
+            return {'status': 'conflict', 'id': pk, 'current': serializer_class(instance).data}
+
+    if op == ChangeLog.DELETE:
+        if model is Cattle:
+            archive_cattle([pk])
+        else:
+            with transaction.atomic():
+                instance.delete()
+        return {'status': 'ok', 'id': pk}
+
+    serializer = serializer_class(instance, data=change.get('data') or {}, partial=instance is not None)
+    if not serializer.is_valid():
+        return {'status': 'error', 'id': pk, 'errors': serializer.errors}
+    try:
+        # change log ของรายการนี้บันทึกเองแถวเดียวพร้อม ref (ไม่ให้ signal บันทึกซ้ำ)
+        with transaction.atomic(), logging_changes_of(model):
+            obj = serializer.save()
+    except IntegrityError as exc:
+        return {'status': 'error', 'id': pk, 'errors': {'non_field_errors': [str(exc)]}}
+    record_changes(model, [obj.pk], client_refs={obj.pk: ref} if ref else None)
+    if ref:
+        # ref ถูกเขียนลง change log ตอน commit → จำไว้ก่อน เผื่อซ้ำในชุดเดียวกัน
+        applied[ref] = obj.pk
+    return {'status': 'ok', 'id': obj.pk}
+
+
+def _attach_bases(changes, results, since):
+    # seq ของ change log ที่ push นี้เขียน (หลัง commit) → base ต่อรายการ
+    written = {}
+    for change, result in zip(changes, results):
+        if result['status'] == 'ok' and isinstance(change, dict) and change.get('table') in SYNC_TABLES:
+            written.setdefault((SYNC_TABLES[change['table']][0]._meta.label_lower, result['id']), []).append(result)
+    if not written:
+        return
+    rows = ChangeLog.objects.filter(
+        seq__gt=since,
+        table__in={table for table, _ in written},
+        object_id__in={object_id for _, object_id in written},
+    ).values_list('seq', 'table', 'object_id')
+    for seq, table, object_id in rows:
+        for result in written.get((table, object_id), ()):
+            result['base'] = str(max(seq, int(result.get('base', 0))))
+
+
+def push_changes(changes, token=None):
+    # รายการที่ client บันทึกตอน offline (ตามลำดับ) → ผลต่อรายการ: ok / conflict / error
+    # รายการที่ conflict หรือผิดจะถูกข้าม ส่วนรายการอื่นในชุดบันทึกต่อ (commit ครั้งเดียวทั้งชุด)
+    # base (ต่อรายการ) หรือ token (ทั้งชุด) = token ล่าสุดที่ client pull มา — ควร pull ต่อทันทีหลัง push
+    refs = {change.get('ref') for change in changes if isinstance(change, dict) and isinstance(change.get('ref'), str)}
+    applied = dict(ChangeLog.objects.filter(client_ref__in=refs).values_list('client_ref', 'object_id')) if refs else {}
+    since = int(current_token())
+    results = []
+    with transaction.atomic():
+        for index, change in enumerate(changes):
+            results.append({'index': index, **_apply(change, token, applied)})
+        # ลงทะเบียนหลัง record_changes ทุกรายการ → ทำงานหลัง change log ของชุดนี้ถูกเขียนแล้ว
+        transaction.on_commit(lambda: _attach_bases(changes, results, since))
+    return results
+
+
+# ---------------- Retention ----------------
+def prune_change_log(before=None, batch_size=SYNC_PRUNE_BATCH_SIZE, refs_before=None):
+    # ลบ change log เก่าทีละช่วง seq — client ที่ token เก่ากว่านี้จะได้ reset แทน
+    # แถวที่มี client_ref เก็บไว้จนพ้น refs_before (ช่วงที่แท็บเล็ตอาจส่งรายการเดิมซ้ำ) → ส่งซ้ำไม่เกิดรายการคู่
+    if before is None:
+        before = timezone.now() - datetime.timedelta(days=settings.SYNC_LOG_RETENTION_DAYS)
+    if refs_before is None:
+        refs_before = timezone.now() - datetime.timedelta(days=settings.SYNC_REF_RETENTION_DAYS)
+    expired = Q(client_ref__isnull=True) | Q(recorded_at__lt=refs_before)
+    bounds = ChangeLog.objects.filter(recorded_at__lt=before).aggregate(first=Min('seq'), last=Max('seq'))
+    if bounds['last'] is None:
+        return 0
+    # บันทึกขอบเขตก่อนลบ → ระหว่างลบ client ที่ token เก่าได้ reset ทันที
+    TableVersion.objects.update_or_create(table=PRUNED_KEY, defaults={'version': bounds['last']})
+    deleted = 0
+    for lower in range(bounds['first'], bounds['last'] + 1, batch_size):
+        deleted += ChangeLog.objects.filter(
+            expired, seq__gte=lower, seq__lt=min(lower + batch_size, bounds['last'] + 1),
+        ).delete()[0]
+    return deleted
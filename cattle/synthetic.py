@@ -0,0 +1,201 @@
+import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import invalidate_growth
+from .feeding import rebuild_feeding_slots
+from .models import CalendarEvent, Cattle, FeedingRation, HealthCheck, Vaccination
+from .pedigree import invalidate_pedigree
+from .search import invalidate_search_index
+from .services import assign_pens, rebuild_cattle_status, touch_tables
+from .vitals import rebuild_vital_baselines
+
+# ข้อมูลฟาร์มจำลองสำหรับทดสอบประสิทธิภาพ — สร้างทีละชุดของโค จึงใช้หน่วยความจำคงที่แม้ฝูงใหญ่มาก
+
+BREEDS = ['บราห์มัน', 'ชาโรเลส์', 'แองกัส', 'โฮลสไตน์ฟรีเซียน', 'กำแพงแสน', 'ไทยพื้นเมือง', 'วากิว']
+CATEGORIES = ['โคนม', 'โคสาว', 'โคขุน', 'แม่พันธุ์', 'พ่อพันธุ์']
+VACCINES = ['ปากและเท้าเปื่อย (FMD)', 'คอบวม (HS)', 'ลัมปีสกิน (LSD)', 'แท้งติดต่อ (Brucellosis)']
+RATIONS = ['FTMR-1', 'FTMR-2', 'FTMR-3', 'หญ้าเนเปียร์ + อาหารข้น']
+EVENT_TITLES = {
+    'feeding': 'ปรับสูตรอาหาร',
+    'health': 'ตรวจรักษา',
+    'breeding': 'ผสมเทียม',
+    'other': 'ย้ายคอก',
+}
+ANIMALS_PER_PEN = 50
+# สัดส่วนโครุ่นแรกที่ไม่มีพ่อแม่ในฝูง
+FOUNDER_RATIO = 0.05
+MAX_AGE_DAYS = 6 * 365
+VACCINE_INTERVAL_DAYS = 180
+
+
+def _dates(today, days_ago):
+    return (np.datetime64(today) - days_ago.astype('timedelta64[D]')).astype(object)
+
+
+def _per_animal(rng, counts, ages, history_days):
+    # วันที่ย้อนหลัง (เรียงจากเก่าไปใหม่) ของแต่ละโค → (index ของโค, จำนวนวันก่อนวันนี้)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    span = np.minimum(ages, history_days)[owner]
+    days_ago = np.floor(rng.random(len(owner)) * span).astype(np.int64)
+    order = np.lexsort((-days_ago, owner))
+    return owner[order], days_ago[order]
+
+
+def _plan(n, rng):
+    # คุณสมบัติที่ต้องรู้ล่วงหน้าทั้งฝูง (เพศ, อายุ, พ่อแม่) — โคลำดับแรกๆ อายุมากกว่าเสมอ
+    genders = np.where(rng.random(n) < 0.7, 'female', 'male')
+    ages = (MAX_AGE_DAYS * (1 - np.arange(n) / max(n, 1)) * rng.uniform(0.9, 1.0, n)).astype(np.int64) + 30
+
+    founders = max(1, int(n * FOUNDER_RATIO))
+    females = np.flatnonzero(genders == 'female')
+    # พ่อพันธุ์มีไม่กี่ตัว (ผสมเทียม) → เลือกจากตัวผู้ 2% แรกของฝูง
+    bulls = np.flatnonzero(genders == 'male')
+    bulls = bulls[:max(1, len(bulls) // 50)]
+    mothers = np.full(n, -1)
+    fathers = np.full(n, -1)
+    idx = np.arange(founders, n)
+    available = np.searchsorted(females, idx)
+    has_mother = available > 0
+    mothers[idx[has_mother]] = females[np.floor(rng.random(has_mother.sum()) * available[has_mother]).astype(np.int64)]
+    available = np.searchsorted(bulls, idx)
+    has_father = available > 0
+    fathers[idx[has_father]] = bulls[np.floor(rng.random(has_father.sum()) * available[has_father]).astype(np.int64)]
+    return genders, ages, mothers, fathers
+
+
+def generate_herd(
+    cattle=1000,
+    checks_per_animal=24,
+    vaccinations_per_animal=3,
+    rations_per_animal=1,
+    events_per_animal=2,
+    history_days=3 * 365,
+    prefix='SYN',
+    seed=0,
+    chunk_size=1000,
+    batch_size=5000,
+    progress=None,
+):
+    # คืนค่าจำนวนแถวที่สร้างของแต่ละตาราง
+    rng = np.random.default_rng(seed)
+    today = timezone.localdate()
+    now = timezone.now()
+    pens = max(1, cattle // ANIMALS_PER_PEN)
+    genders, ages, mothers, fathers = _plan(cattle, rng)
+    tag = '{}{:07d}'.format
+    created = {'cattle': 0, 'healthcheck': 0, 'vaccination': 0, 'ration': 0, 'event': 0}
+
+    for offset in range(0, cattle, chunk_size):
+        size = min(chunk_size, cattle - offset)
+        index = np.arange(offset, offset + size)
+        age = ages[index]
+        births = _dates(today, age)
+        breeds = rng.choice(BREEDS, size).tolist()
+        categories = rng.choice(CATEGORIES, size).tolist()
+        housing = rng.integers(1, pens + 1, size).tolist()
+
+        with transaction.atomic():
+            herd = Cattle.objects.bulk_create(assign_pens([
+                Cattle(
+                    tag_no=tag(prefix, i),
+                    name=f'โค {i}',
+                    gender=str(genders[i]),
+                    breed=breeds[k],
+                    category=categories[k],
+                    housing=f'คอก {housing[k]}',
+                    birth_date=births[k],
+                    mother=tag(prefix, int(mothers[i])) if mothers[i] >= 0 else None,
+                    father=tag(prefix, int(fathers[i])) if fathers[i] >= 0 else None,
+                )
+                for k, i in enumerate(index.tolist())
+            ]), batch_size=batch_size)
+            ids = [c.pk for c in herd]
+
+            # HealthCheck: น้ำหนักโตตาม ADG ของแต่ละตัว, ไข้ประปราย
+            owner, days_ago = _per_animal(rng, rng.poisson(checks_per_animal, size), age, history_days)
+            adg = rng.normal(0.8, 0.15, size).clip(0.2)
+            weight = 35 + adg[owner] * (age[owner] - days_ago) + rng.normal(0, 5, len(owner))
+            fever = rng.random(len(owner)) < 0.01
+            temperature = rng.normal(38.6, 0.3, len(owner)) + fever * rng.uniform(1.5, 2.5, len(owner))
+            heart_rate = rng.normal(65, 6, len(owner)) + fever * 25
+            weighed = rng.random(len(owner)) < 0.8
+            status = np.where(fever, 'sick', np.where(weight > 550, 'forsale', 'healthy')).tolist()
+            check_dates = _dates(today, days_ago)
+            HealthCheck.objects.bulk_create([
+                HealthCheck(
+                    cattle_id=ids[o],
+                    check_date=check_dates[k],
+                    temperature=round(float(temperature[k]), 1),
+                    heart_rate=int(heart_rate[k]),
+                    weight=round(float(weight[k]), 2) if weighed[k] else None,
+                    status=status[k],
+                )
+                for k, o in enumerate(owner.tolist())
+            ], batch_size=batch_size)
+            created['healthcheck'] += len(owner)
+
+            # วัคซีนทุก ~6 เดือน นัดครั้งถัดไปอีก 180 วัน
+            owner, days_ago = _per_animal(rng, rng.poisson(vaccinations_per_animal, size), age, history_days)
+            names = rng.choice(VACCINES, len(owner)).tolist()
+            vaccine_dates = _dates(today, days_ago)
+            Vaccination.objects.bulk_create([
+                Vaccination(
+                    cattle_id=ids[o],
+                    vaccine_name=names[k],
+                    vaccine_date=vaccine_dates[k],
+                    next_due_date=vaccine_dates[k] + datetime.timedelta(days=VACCINE_INTERVAL_DAYS),
+                    doctor_name='สพ.ญ. ทดสอบ',
+                )
+                for k, o in enumerate(owner.tolist())
+            ], batch_size=batch_size)
+            created['vaccination'] += len(owner)
+
+            owner = np.repeat(np.arange(size), rng.poisson(rations_per_animal, size))
+            fresh = rng.uniform(10, 35, len(owner))
+            rations = FeedingRation.objects.bulk_create([
+                FeedingRation(
+                    cattle_id=ids[o],
+                    ration_id=RATIONS[k % len(RATIONS)],
+                    feeding_time='07:30, 16:30 / น้ำสะอาดตลอดวัน',
+                    fresh_weight=round(float(fresh[k]), 2),
+                    dry_weight=round(float(fresh[k]) * 0.4, 2),
+                    supplement='พรีมิกซ์แร่ธาตุ-วิตามิน 80 กรัม/วัน',
+                )
+                for k, o in enumerate(owner.tolist())
+            ], batch_size=batch_size)
+            rebuild_feeding_slots([r.pk for r in rations], batch_size=batch_size)
+            created['ration'] += len(owner)
+
+            # กิจกรรมในปฏิทินกระจายช่วง ±60 วันจากวันนี้
+            owner = np.repeat(np.arange(size), rng.poisson(events_per_animal, size))
+            offsets = rng.integers(-60 * 24, 60 * 24, len(owner))
+            hours = rng.integers(1, 4, len(owner))
+            types = rng.choice(list(EVENT_TITLES), len(owner)).tolist()
+            CalendarEvent.objects.bulk_create([
+                CalendarEvent(
+                    cattle_id=ids[o],
+                    title=EVENT_TITLES[types[k]],
+                    start=now + datetime.timedelta(hours=int(offsets[k])),
+                    end=now + datetime.timedelta(hours=int(offsets[k] + hours[k])),
+                    event_type=types[k],
+                )
+                for k, o in enumerate(owner.tolist())
+            ], batch_size=batch_size)
+            created['event'] += len(owner)
+
+            # ข้อมูลที่คำนวณไว้ล่วงหน้า (bulk_create ไม่ส่ง signal)
+            rebuild_cattle_status(ids, batch_size=batch_size)
+            rebuild_vital_baselines(ids, batch_size=batch_size)
+
+        created['cattle'] += size
+        if progress:
+            progress(created)
+
+    invalidate_pedigree()
+    invalidate_search_index()
+    invalidate_growth()
+    touch_tables(Cattle, HealthCheck, CalendarEvent, FeedingRation)
+    return created
@@ -1,3 +1,817 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import tempfile
+import zipfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics, pedigree, search, snapshot
+from .analytics import load_weight_series
+from .archive import archive_cattle, purge_archived, restore_cattle
+from .bulk import ingest_healthchecks
+from .events import events_in_window
+from .importer import ImportFileError, import_rows, read_rows
+from .models import (
+    CalendarEvent, CalendarEventException, Cattle, CattleStatus, ChangeLog, FeedingRation, HealthCheck, Housing,
+    Report, Vaccination, VitalBaseline,
+)
+from .reports import build_reports, generate_monthly_reports, month_period
+from .services import herd_summary
+from .sync import prune_change_log, push_changes
+from .views import _parse_history_cursor, healthcheck_history_page
+from .vitals import rebuild_vital_baselines
+
+
+def _aware(*args):
+    return timezone.make_aware(datetime.datetime(*args))
+
+
+class HerdTestCase(TestCase):
+    def setUp(self):
+        # LocMemCache / index ในโปรเซสไม่ถูก rollback ระหว่าง test แต่เลขเวอร์ชัน (TableVersion) ถูก rollback
+        cache.clear()
+        pedigree._cached = search._cached = snapshot._opened = None
+
+    def cattle(self, tag_no, **fields):
+        fields.setdefault('gender', 'female')
+        return Cattle.objects.create(tag_no=tag_no, **fields)
+
+    def check(self, cattle, day, status='healthy', weight=None, **fields):
+        return HealthCheck.objects.create(
+            cattle=cattle, check_date=datetime.date(2026, 1, day), status=status, weight=weight, **fields,
+        )
+
+
+# ---------------- สถานะล่าสุด / ยอดรายคอก ----------------
+class StatusAndPenRollupTests(HerdTestCase):
+    def test_latest_status_follows_newest_check(self):
+        cow = self.cattle('A1')
+        self.check(cow, 1, 'healthy', 300)
+        latest = self.check(cow, 5, 'sick', 310)
+        self.check(cow, 3, 'forsale', 305)  # ย้อนหลัง ไม่ใช่ล่าสุด
+
+        status = CattleStatus.objects.get(cattle=cow)
+        self.assertEqual((status.latest_status, status.latest_weight), ('sick', Decimal('310.00')))
+
+        latest.delete()
+        status.refresh_from_db()
+        self.assertEqual((status.latest_status, status.latest_check_date), ('forsale', datetime.date(2026, 1, 3)))
+
+    def test_status_removed_with_last_check(self):
+        cow = self.cattle('A1')
+        self.check(cow, 1).delete()
+        self.assertFalse(CattleStatus.objects.filter(cattle=cow).exists())
+
+    def test_pen_rollup_tracks_checks_and_moves(self):
+        cow = self.cattle('A1', housing='P1')
+        other = self.cattle('A2', housing='P1')
+        self.check(cow, 1, 'sick', 300)
+        self.check(other, 1, 'healthy', 400)
+
+        p1 = Housing.objects.get(name='P1')
+        self.assertEqual((p1.head_count, p1.sick_count, p1.avg_weight), (2, 1, Decimal('350.00')))
+
+        cow.housing = 'P2'
+        cow.save()
+        p1.refresh_from_db()
+        p2 = Housing.objects.get(name='P2')
+        self.assertEqual((p1.head_count, p1.sick_count), (1, 0))
+        self.assertEqual((p2.head_count, p2.sick_count, p2.avg_weight), (1, 1, Decimal('300.00')))
+
+
+# ---------------- สรุปภาพรวมฝูง ----------------
+class HerdSummaryTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, status in enumerate(('healthy', 'sick', 'forsale')):
+                self.check(self.cattle(f'A{i}'), 1, status)
+
+    def test_summary_cached_until_status_changes(self):
+        self.assertEqual(herd_summary(), {'total': 3, 'sick_count': 1, 'for_sale_count': 1})
+        with self.assertNumQueries(1):  # เลขเวอร์ชันเท่านั้น
+            herd_summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.check(Cattle.objects.get(tag_no='A0'), 2, 'sick')
+        self.assertEqual(herd_summary()['sick_count'], 2)
+        self.assertEqual(self.client.get(reverse('cattle:api_herd_summary')).json()['sick_count'], 2)
+
+    def test_dashboard_queries_do_not_grow_with_herd(self):
+        url = reverse('cattle:dashboard')
+        # เลขเวอร์ชัน + aggregate (cache ว่าง) + กิจกรรมในปฏิทิน
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Cattle.objects.bulk_create([Cattle(tag_no=f'B{i}', gender='female') for i in range(30)])
+            self.check(Cattle.objects.get(tag_no='B0'), 1)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total'], 33)
+
+
+# ---------------- กิจกรรมซ้ำ ----------------
+class RecurrenceTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1')
+
+    def event(self, **fields):
+        start = _aware(2026, 3, 2, 7, 30)  # วันจันทร์
+        return CalendarEvent.objects.create(
+            cattle=self.cow, title='ให้อาหาร', event_type='feeding',
+            start=start, end=start + datetime.timedelta(hours=1), **fields,
+        )
+
+    def starts(self, start, end):
+        return [e.start for e in events_in_window(start, end)]
+
+    def test_daily_expands_only_inside_window(self):
+        self.event(recurrence='daily')
+        self.assertEqual(
+            self.starts(_aware(2026, 6, 10), _aware(2026, 6, 13)),
+            [_aware(2026, 6, 10, 7, 30), _aware(2026, 6, 11, 7, 30), _aware(2026, 6, 12, 7, 30)],
+        )
+
+    def test_count_and_until_end_the_series(self):
+        self.event(recurrence='daily', interval=2, count=3)
+        self.event(recurrence='daily', until=datetime.date(2026, 3, 3))
+        window = (_aware(2026, 3, 1), _aware(2026, 3, 31))
+        self.assertEqual(self.starts(*window), [
+            _aware(2026, 3, 2, 7, 30), _aware(2026, 3, 2, 7, 30), _aware(2026, 3, 3, 7, 30),
+            _aware(2026, 3, 4, 7, 30), _aware(2026, 3, 6, 7, 30),
+        ])
+        self.assertEqual(self.starts(_aware(2026, 3, 7), _aware(2026, 4, 30)), [])
+
+    def test_weekly_on_selected_weekdays(self):
+        self.event(recurrence='weekly', weekdays='0,3')  # จันทร์, พฤหัส
+        self.assertEqual(
+            [s.date() for s in self.starts(_aware(2026, 3, 1), _aware(2026, 3, 13))],
+            [datetime.date(2026, 3, 2), datetime.date(2026, 3, 5), datetime.date(2026, 3, 9), datetime.date(2026, 3, 12)],
+        )
+
+    def test_exceptions_cancel_and_move_single_occurrences(self):
+        series = self.event(recurrence='daily', count=3)
+        CalendarEventException.objects.create(event=series, original_start=_aware(2026, 3, 3, 7, 30), cancelled=True)
+        CalendarEventException.objects.create(
+            event=series, original_start=_aware(2026, 3, 4, 7, 30), start=_aware(2026, 3, 10, 9, 0), title='เลื่อน',
+        )
+
+        occurrences = events_in_window(_aware(2026, 3, 1), _aware(2026, 3, 31))
+        self.assertEqual(
+            [(o.start, o.title) for o in occurrences],
+            [(_aware(2026, 3, 2, 7, 30), 'ให้อาหาร'), (_aware(2026, 3, 10, 9, 0), 'เลื่อน')],
+        )
+        # ครั้งที่ย้ายไปอยู่นอกช่วงเดิม ยังแสดงในช่วงของวันใหม่
+        self.assertEqual(self.starts(_aware(2026, 3, 10), _aware(2026, 3, 11)), [_aware(2026, 3, 10, 9, 0)])
+
+
+# ---------------- นำเข้า / บันทึกเป็นชุด ----------------
+class BulkIngestTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1')
+
+    def test_strict_ingest_saves_nothing_on_any_error(self):
+        created, errors = ingest_healthchecks([
+            {'tag_no': 'A1', 'check_date': '2026-01-01', 'weight': 300},
+            {'tag_no': 'NOPE', 'check_date': '2026-01-01'},
+            {'tag_no': 'A1', 'check_date': 'not-a-date'},
+        ])
+        self.assertEqual(created, 0)
+        self.assertEqual([e['row'] for e in errors], [1, 2])
+        self.assertFalse(HealthCheck.objects.exists())
+
+    def test_partial_ingest_keeps_valid_rows(self):
+        created, errors = ingest_healthchecks([
+            {'tag_no': 'A1', 'check_date': '2026-01-01', 'status': 'sick'},
+            {'tag_no': 'NOPE', 'check_date': '2026-01-01'},
+        ], partial=True)
+        self.assertEqual((created, len(errors)), (1, 1))
+        self.assertEqual(CattleStatus.objects.get(cattle=self.cow).latest_status, 'sick')
+
+    def test_bulk_api_rejects_non_list(self):
+        response = self.client.post(
+            reverse('cattle:healthcheck-bulk'), {'readings': 'x'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_cattle_upserts_and_reports_row_errors(self):
+        rows = read_rows(io.BytesIO(b'tag_no,name,gender\nA1,renamed,female\nB1,new,male\nC1,no gender,\n'), 'herd.csv')
+        result = import_rows('cattle', rows)
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual([e['row'] for e in result['errors']], [2])
+        self.assertEqual(Cattle.objects.get(tag_no='A1').name, 'renamed')
+
+    def test_import_existing_cattle_updates_only_given_columns(self):
+        result = import_rows('cattle', read_rows(io.BytesIO(b'tag_no,housing\nA1,P9\n'), 'move.csv'))
+        self.assertEqual((result['created'], result['updated'], result['errors']), (0, 1, []))
+        cow = Cattle.objects.get(tag_no='A1')
+        self.assertEqual((cow.gender, cow.pen.name, cow.pen.head_count), ('female', 'P9', 1))
+
+    def test_import_reads_thai_excel_csv(self):
+        data = 'tag_no,name,gender\nB1,แดงน้อย,male\n'.encode('cp874')
+        import_rows('cattle', read_rows(io.BytesIO(data), 'herd.csv'))
+        self.assertEqual(Cattle.objects.get(tag_no='B1').name, 'แดงน้อย')
+
+    def test_import_rejects_unreadable_files(self):
+        broken_zip = io.BytesIO()
+        with zipfile.ZipFile(broken_zip, 'w') as archive:
+            archive.writestr('hello.txt', 'not a workbook')
+        for data, filename in [
+            (b'tag_no\nA1\n', 'herd.xlsx'),  # CSV ที่เปลี่ยนนามสกุล
+            (broken_zip.getvalue(), 'herd.xlsx'),
+            (b'tag_no,name\n' + b'A1,\x81\n', 'herd.csv'),  # ไม่ใช่ UTF-8 และไม่ใช่ cp874
+            (b'', 'herd.txt'),
+        ]:
+            with self.subTest(filename=filename), self.assertRaises(ImportFileError):
+                import_rows('cattle', read_rows(io.BytesIO(data), filename))
+
+    def test_import_page_shows_file_errors(self):
+        upload = io.BytesIO(b'garbage')
+        upload.name = 'herd.xlsx'
+        response = self.client.post(reverse('cattle:import_herd'), {'kind': 'cattle', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'ไฟล์ Excel เสียหาย')
+
+
+# ---------------- Export ----------------
+class ExportTests(HerdTestCase):
+    url = reverse('cattle:export_herd')
+
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1', name='แดง', housing='P1')
+        self.check(self.cow, 1, weight=Decimal('250.50'))
+        self.check(self.cow, 2, 'sick', notes='ไอ, มีน้ำมูก')
+        gone = self.cattle('Z9')
+        self.check(gone, 1)
+        archive_cattle([gone.pk])
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_has_bom_header_and_skips_archived(self):
+        content = self.export()
+        self.assertTrue(content.startswith('\ufeffrecord_type,tag_no,'))
+        rows = list(csv.DictReader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(
+            [(r['record_type'], r['tag_no'], r['date'], r['status']) for r in rows],
+            [('cattle', 'A1', '2026-01-02', 'sick'), ('healthcheck', 'A1', '2026-01-01', 'healthy'),
+             ('healthcheck', 'A1', '2026-01-02', 'sick')],
+        )
+        self.assertEqual(rows[2]['notes'], 'ไอ, มีน้ำมูก')
+
+    def test_ndjson_filters_record_types(self):
+        lines = self.export(format='ndjson', include='healthcheck').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual({r['record_type'] for r in records}, {'healthcheck'})
+        self.assertEqual(records[0]['weight'], '250.50')
+        self.assertIn('มีน้ำมูก', lines[1])  # ไม่ escape ภาษาไทย
+
+    def test_rejects_unknown_format_and_type(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'include': 'cattle,bogus'}).status_code, 400)
+
+
+# ---------------- หน้ารายละเอียดโค ----------------
+class CattleDetailTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1')
+        # 3 รายการต่อวัน → ทดสอบการเรียงด้วย id เมื่อวันที่ซ้ำกัน
+        self.checks = [self.check(self.cow, i % 15 + 1, temperature=Decimal('38.5')) for i in range(45)]
+        for i in range(3):
+            Vaccination.objects.create(cattle=self.cow, vaccine_name=f'V{i}', vaccine_date=datetime.date(2026, 1, i + 1))
+            FeedingRation.objects.create(cattle=self.cow, ration_id=f'R{i}', feeding_time='07:00', fresh_weight=5, dry_weight=2)
+
+    def test_detail_page_uses_constant_queries(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('cattle:cattle_detail', args=[self.cow.pk]))
+        self.assertEqual(response.context['history']['total'], 45)
+        self.assertEqual(len(response.context['checks']), 20)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_history_pages_walk_every_check_once(self):
+        seen, cursor = [], None
+        while True:
+            rows, next_cursor = healthcheck_history_page(self.cow.pk, cursor)
+            seen += [row.pk for row in rows]
+            if next_cursor is None:
+                break
+            cursor = _parse_history_cursor(next_cursor)
+        expected = sorted(self.checks, key=lambda c: (c.check_date, c.pk), reverse=True)
+        self.assertEqual(seen, [c.pk for c in expected])
+
+        url = reverse('cattle:cattle_healthchecks', args=[self.cow.pk])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, {'cursor': '2026-01-05:9999'}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'cursor': 'oops'}).status_code, 400)
+
+
+# ---------------- Conditional GET ----------------
+class ConditionalGetTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cow = self.cattle('A1')
+            self.check(self.cow, 1)
+
+    def assertRevalidates(self, url, change):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        # ข้อมูลไม่เปลี่ยน → 304 ด้วย query เดียว (เวอร์ชันตาราง)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_sync_view(self):
+        self.assertRevalidates(reverse('cattle:healthcheck-list'), lambda: self.check(self.cow, 2))
+
+    def test_async_view(self):
+        start = _aware(2026, 3, 2, 7, 30)
+        self.assertRevalidates(
+            reverse('cattle:api_calendar_events'),
+            lambda: CalendarEvent.objects.create(cattle=self.cow, title='ชั่งน้ำหนัก', event_type='health', start=start),
+        )
+
+    def test_etag_varies_with_query_string(self):
+        url = reverse('cattle:healthcheck-list')
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'page_size': 1})['ETag'])
+
+
+# ---------------- ค่าชีพผิดปกติ ----------------
+class VitalBaselineTests(HerdTestCase):
+    NORMAL = (38.5, 38.6, 38.4, 38.5, 38.6)
+
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1')
+        for day, temperature in enumerate(self.NORMAL, start=1):
+            self.check(self.cow, day, temperature=Decimal(str(temperature)), heart_rate=60)
+
+    def scores(self):
+        return list(
+            HealthCheck.objects.order_by('check_date', 'id')
+            .values_list('temperature_zscore', 'heart_rate_zscore', 'is_anomaly')
+        )
+
+    def test_spike_flagged_once_baseline_is_established(self):
+        self.assertEqual({z for z, _, _ in self.scores()}, {None})  # ยังไม่ครบ MIN_BASELINE_READINGS
+        spike = self.check(self.cow, 6, temperature=Decimal('40.5'), heart_rate=62)
+        spike.refresh_from_db()
+        self.assertTrue(spike.is_anomaly)
+        self.assertGreater(spike.temperature_zscore, 3)
+        self.assertEqual(VitalBaseline.objects.get(cattle=self.cow).temperature_count, 6)
+
+    def test_bulk_and_single_paths_match_full_rebuild(self):
+        self.check(self.cow, 6, temperature=Decimal('40.5'), heart_rate=61)
+        created, errors = ingest_healthchecks([
+            {'tag_no': 'A1', 'check_date': '2026-01-07', 'temperature': '38.7', 'heart_rate': 90},
+            {'tag_no': 'A1', 'check_date': '2026-01-08', 'temperature': '38.5', 'heart_rate': 59},
+        ])
+        self.assertEqual((created, errors), (2, []))
+        incremental = self.scores()
+        baseline = VitalBaseline.objects.get(cattle=self.cow)
+
+        rebuild_vital_baselines()
+        self.assertEqual(self.scores(), incremental)
+        rebuilt = VitalBaseline.objects.get(cattle=self.cow)
+        self.assertEqual(rebuilt.heart_rate_count, baseline.heart_rate_count)
+        self.assertAlmostEqual(rebuilt.heart_rate_m2, baseline.heart_rate_m2)
+
+    def test_editing_a_reading_rescores_history(self):
+        spike = self.check(self.cow, 6, temperature=Decimal('40.5'), heart_rate=60)
+        spike.temperature = Decimal('38.5')
+        spike.save()
+        spike.refresh_from_db()
+        self.assertFalse(spike.is_anomaly)
+        self.assertEqual(VitalBaseline.objects.get(cattle=self.cow).temperature_count, 6)
+
+
+# ---------------- คัดออก / purge ----------------
+class ArchiveTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1', housing='P1')
+        self.other = self.cattle('A2', housing='P1')
+        self.check(self.cow, 1, 'sick', 300)
+        Vaccination.objects.create(cattle=self.cow, vaccine_name='FMD', vaccine_date=datetime.date(2026, 1, 1))
+
+    def test_archive_hides_and_restore_brings_back(self):
+        self.assertEqual(archive_cattle([self.cow.pk]), 1)
+        self.assertFalse(Cattle.objects.filter(pk=self.cow.pk).exists())
+        self.assertEqual(self.client.get(reverse('cattle:cattle_detail', args=[self.cow.pk])).status_code, 404)
+        pen = Housing.objects.get(name='P1')
+        self.assertEqual((pen.head_count, pen.sick_count), (1, 0))
+        self.assertTrue(HealthCheck.objects.filter(cattle=self.cow).exists())  # ประวัติยังอยู่
+
+        self.assertEqual(restore_cattle([self.cow.pk]), 1)
+        pen.refresh_from_db()
+        self.assertEqual((pen.head_count, pen.sick_count), (2, 1))
+
+    def test_purge_respects_retention_and_deletes_history(self):
+        archive_cattle([self.cow.pk], when=timezone.now() - datetime.timedelta(days=5))
+        self.assertEqual(purge_archived(before=timezone.now() - datetime.timedelta(days=30))['cattle'], 0)
+
+        totals = purge_archived(before=timezone.now(), batch_size=1)
+        self.assertEqual((totals['cattle'], totals['healthcheck'], totals['vaccination']), (1, 1, 1))
+        self.assertFalse(Cattle.all_objects.filter(pk=self.cow.pk).exists())
+        self.assertTrue(Cattle.objects.filter(pk=self.other.pk).exists())
+
+    def test_archived_tags_rejected_by_bulk_paths(self):
+        archive_cattle([self.cow.pk])
+        result = import_rows('cattle', read_rows(io.BytesIO(b'tag_no,name\nA1,overwrite\n'), 'herd.csv'))
+        self.assertEqual((result['created'], result['updated'], len(result['errors'])), (0, 0, 1))
+        self.assertEqual(Cattle.all_objects.get(pk=self.cow.pk).name, None)
+
+        created, errors = ingest_healthchecks([{'tag_no': 'A1', 'check_date': '2026-01-02'}])
+        self.assertEqual(created, 0)
+        self.assertIn('ถูกคัดออกแล้ว', str(errors[0]['errors']['tag_no'][0]))
+
+    def test_archived_events_hidden_from_calendar(self):
+        start = _aware(2026, 3, 2, 7, 30)
+        event = CalendarEvent.objects.create(cattle=self.cow, title='ถ่ายพยาธิ', event_type='health', start=start, end=start)
+        archive_cattle([self.cow.pk])
+
+        self.assertNotContains(self.client.get(reverse('cattle:farm_calendar')), 'ถ่ายพยาธิ')
+        response = self.client.get(
+            reverse('cattle:farm_calendar_events'), {'start': '2026-03-01T00:00:00', 'end': '2026-03-31T00:00:00'},
+        )
+        self.assertEqual(response.json(), [])
+        for name in ('update_calendar_event', 'update_occurrence', 'delete_calendar_event'):
+            self.assertEqual(self.client.get(reverse(f'cattle:{name}', args=[event.pk])).status_code, 404)
+        self.assertTrue(CalendarEvent.objects.filter(pk=event.pk).exists())
+
+    def test_archived_parent_stays_in_pedigree(self):
+        sire = self.cattle('S1', gender='male')
+        self.cattle('D1', father='S1')
+        calf = self.cattle('C1', father='S1', mother='D1')
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_cattle([sire.pk])
+
+        detail = self.client.get(reverse('cattle:api_pedigree_detail', args=[calf.pk])).json()
+        self.assertEqual(detail['inbreeding'], 0.25)
+        self.assertIn(str(sire.pk), detail['ancestors'])
+        self.assertEqual(self.client.get(reverse('cattle:api_pedigree_detail', args=[sire.pk])).status_code, 404)
+        herd = self.client.get(reverse('cattle:api_pedigree_herd')).json()
+        self.assertEqual([row['tag_no'] for row in herd['inbreeding']], ['C1'])
+
+
+# ---------------- พันธุประวัติ ----------------
+class PedigreeTests(HerdTestCase):
+    # S1 × D1 → X, Y (พี่น้องท้องเดียวกัน) / S1 × D2 → Z (พี่น้องต่างแม่ของ X)
+    ROWS = [
+        (1, 'S1', 'บิ๊ก', None, None), (2, 'D1', None, None, None), (3, 'D2', None, None, None),
+        (4, 'X', None, 'D1', 'S1'), (5, 'Y', None, 'D1', 'S1'), (6, 'Z', None, 'D2', 'บิ๊ก'),
+        (7, 'XY', None, 'Y', 'X'), (8, 'XZ', None, 'Z', 'X'),
+        (9, 'P', None, None, 'Q'), (10, 'Q', None, None, 'P'), (11, 'N', None, 'ไม่มีในฝูง', None),
+    ]
+
+    def test_inbreeding_and_coancestry(self):
+        graph = pedigree.Pedigree(self.ROWS)
+        self.assertEqual(graph.inbreeding_of(7), 0.25)
+        self.assertEqual(graph.inbreeding_of(8), 0.125)
+        self.assertEqual(graph.inbreeding_of(4), 0)
+        self.assertAlmostEqual(graph.coancestry(4, 5), 0.25)
+        self.assertAlmostEqual(graph.coancestry(4, 6), 0.125)
+        self.assertEqual({k: v for k, v in graph.inbreeding().items() if v}, {7: 0.25, 8: 0.125})
+
+    def test_ancestry_walks_and_unresolved_parents(self):
+        graph = pedigree.Pedigree(self.ROWS)
+        self.assertEqual(graph.parents(6), {'father': 1, 'mother': 3})  # พ่อจับคู่ด้วยชื่อ
+        self.assertEqual(graph.ancestors(7), {4: 1, 5: 1, 1: 2, 2: 2})
+        self.assertEqual(graph.ancestors(7, max_depth=1), {4: 1, 5: 1})
+        self.assertEqual(graph.descendants(3), {6: 1, 8: 2})
+        self.assertEqual(graph.common_ancestors(7, 8), [1, 2, 4])
+        self.assertEqual(
+            sorted((u['cattle_id'], u['reason']) for u in graph.unresolved), [(9, 'cycle'), (10, 'cycle'), (11, 'not_found')],
+        )
+
+    def test_mating_api_follows_parent_edits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sire, dam = self.cattle('S1', gender='male'), self.cattle('D1')
+            son = self.cattle('X', gender='male', father='S1', mother='D1')
+            daughter = self.cattle('Y', father='S1')
+        url = reverse('cattle:api_pedigree_mating')
+        self.assertEqual(self.client.get(url, {'sire': son.pk, 'dam': daughter.pk}).json()['offspring_inbreeding'], 0.125)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            daughter.mother = 'D1'
+            daughter.save()
+        result = self.client.get(url, {'sire': son.pk, 'dam': daughter.pk}).json()
+        self.assertEqual((result['offspring_inbreeding'], result['common_ancestors']), (0.25, [sire.pk, dam.pk]))
+        self.assertEqual(self.client.get(url, {'sire': 'x', 'dam': dam.pk}).status_code, 400)
+
+
+# ---------------- ค้นหา ----------------
+class SearchTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(30):
+            self.cattle(f'TH{i:03d}', name=f'วัว{i}', breed='Brahman')
+        self.cattle('X9', name='แดงน้อย', breed='Angus')
+
+    def search(self, **params):
+        return self.client.get(reverse('cattle:api_search'), params)
+
+    def test_exact_tag_ranks_first(self):
+        results = self.search(q='TH007').json()['results']
+        self.assertEqual(results[0]['tag_no'], 'TH007')
+        self.assertEqual(self.search(q='แดง').json()['results'][0]['tag_no'], 'X9')
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.search(q='TH', limit=5).json()['results']), 5)
+        for limit in (0, -5):
+            with self.subTest(limit=limit):
+                response = self.search(q='TH', limit=limit)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(self.search(q='TH', limit='abc').status_code, 400)
+
+    def test_archived_cattle_not_found(self):
+        archive_cattle(Cattle.objects.filter(tag_no='X9').values_list('pk', flat=True))
+        search._cached = None
+        self.assertEqual(self.search(q='แดงน้อย').json()['results'], [])
+
+
+# ---------------- Columnar snapshot ----------------
+class SnapshotTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.enterContext(override_settings(HEALTH_SNAPSHOT_DIR=folder.name))
+        self.cow = self.cattle('A1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = self.check(self.cow, 1, weight=100)
+            self.check(self.cow, 3, weight=120)
+        snapshot.refresh_snapshot()
+
+    def test_new_rows_are_read_as_delta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.check(self.cow, 2, weight=110)
+        self.assertIsNotNone(snapshot.current_snapshot())
+        ids, days, weights = load_weight_series()
+        self.assertEqual(weights.tolist(), [100, 110, 120])
+        self.assertEqual((days - days[0]).tolist(), [0, 1, 2])
+
+    def test_edit_invalidates_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.weight = 105
+            self.first.save()
+        self.assertIsNone(snapshot.current_snapshot())
+        self.assertEqual(load_weight_series()[2].tolist(), [105, 120])
+
+
+# ---------------- รายงานรายเดือน ----------------
+class MonthlyReportTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1', name='แดง')
+        self.check(self.cow, 1, weight=100, temperature=Decimal('38.5'))
+        self.check(self.cow, 11, 'sick', weight=110, temperature=Decimal('39.5'))
+        HealthCheck.objects.create(cattle=self.cow, check_date=datetime.date(2026, 2, 1), weight=150)
+        Vaccination.objects.create(
+            cattle=self.cow, vaccine_name='FMD', vaccine_date=datetime.date(2026, 1, 5),
+            next_due_date=datetime.date(2026, 2, 10),
+        )
+
+    def test_report_covers_only_the_month_and_rerun_replaces(self):
+        self.cattle('A2')
+        self.assertEqual(generate_monthly_reports(2026, 1, workers=1, batch_size=1), 2)
+        content = Report.objects.get(cattle=self.cow, kind='monthly').content
+        self.assertIn('มกราคม 2569', content)
+        self.assertIn('การตรวจสุขภาพ: 2 ครั้ง | ป่วย 1 ครั้ง', content)
+        self.assertIn('น้ำหนัก (กก.): 100.00 → 110.00 (10.00) | ADG 1.0 กก./วัน', content)
+        self.assertIn('- 10/02/2026 FMD', content)
+
+        self.check(self.cow, 20, weight=112)
+        self.assertEqual(generate_monthly_reports(2026, 1, workers=1), 2)
+        self.assertEqual(Report.objects.filter(kind='monthly').count(), 2)
+        self.assertIn('3 ครั้ง', Report.objects.get(cattle=self.cow, kind='monthly').content)
+
+    def test_batch_uses_constant_queries(self):
+        # โค 1 ตัว + prefetch ประวัติ / การรักษา / วัคซีน / สูตรอาหาร — ไม่เพิ่มตามจำนวนโค
+        start, end = month_period(2026, 1)
+        with self.assertNumQueries(5):
+            build_reports([self.cow.pk], start, end)
+        others = [self.cattle(f'B{i}').pk for i in range(5)]
+        with self.assertNumQueries(5):
+            self.assertEqual(len(build_reports([self.cow.pk, *others], start, end)), 6)
+
+
+# ---------------- ใบให้อาหาร ----------------
+class FeedPlanTests(HerdTestCase):
+    url = reverse('cattle:api_feed_plan')
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            for tag_no, born in (('A1', datetime.date(2025, 1, 1)), ('B1', datetime.date(2026, 6, 1)), ('C1', None)):
+                FeedingRation.objects.create(
+                    cattle=self.cattle(tag_no, housing='P1', birth_date=born), ration_id='FTMR-1',
+                    feeding_time='07:00, 16:00 / น้ำสะอาดตลอดวัน', fresh_weight=Decimal('10.01'), dry_weight=4,
+                )
+            archive_cattle([Cattle.objects.get(tag_no='C1').pk], when=_aware(2026, 3, 1, 12))
+
+    def plan(self, date):
+        response = self.client.get(self.url, {'date': date})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_slots_split_daily_weight_exactly(self):
+        plan = self.plan('2026-02-01')
+        self.assertEqual([(row['slot'], row['animals'], row['fresh_kg']) for row in plan['rows']], [
+            ('07:00', 2, 10.0), ('16:00', 2, 10.02),
+        ])
+        self.assertEqual(plan['total'], {'fresh_kg': 20.02, 'dry_kg': 8.0})
+
+    def test_date_selects_herd_on_that_day(self):
+        def animals(date):
+            return self.plan(date)['rows'][0]['animals']
+
+        self.assertEqual(animals('2026-02-01'), 2)  # A1 + C1 (ยังไม่ถูกคัดออก)
+        self.assertEqual(animals('2026-03-01'), 1)  # C1 ถูกคัดออกวันนี้ B1 ยังไม่เกิด
+        self.assertEqual(animals('2026-07-01'), 2)  # A1 + B1
+        self.assertEqual(self.plan('2026-07-01')['date'], '2026-07-01')
+        self.assertEqual(self.client.get(self.url, {'date': 'tomorrow'}).status_code, 400)
+
+
+# ---------------- Metrics ----------------
+class MetricsTests(HerdTestCase):
+    url = reverse('cattle:metrics')
+
+    def test_denied_without_token_unless_debug(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer nope').status_code, 403)
+            self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer วัว').status_code, 403)
+            self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    def test_unknown_methods_counted_as_other(self):
+        self.client.generic('BREW', reverse('cattle:cattle_list'))
+        output = metrics.render_metrics()
+        self.assertIn('method="OTHER"', output)
+        self.assertNotIn('BREW', output)
+
+    def test_metrics_dir_merges_workers(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        with override_settings(METRICS_DIR=folder.name):
+            with open(f'{folder.name}/1.json', 'w', encoding='utf-8') as f:
+                json.dump({'cattle_http_requests_total': [[['other-worker', 'GET', 200], 2]]}, f)
+            metrics.REQUESTS.inc(('other-worker', 'GET', 200))
+            output = metrics.render_metrics()
+        self.assertIn('cattle_http_requests_total{view="other-worker",method="GET",status="200"} 3', output)
+
+
+# ---------------- Growth API ----------------
+class GrowthParamTests(HerdTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cow = self.cattle('A1')
+        for day, weight in [(1, 300), (11, 310), (21, 320)]:
+            self.check(self.cow, day, weight=weight)
+
+    def test_invalid_params_return_400(self):
+        for url in [reverse('cattle:api_growth'), reverse('cattle:api_cattle_growth', args=[self.cow.pk])]:
+            for query in ['window=-100', 'window=0', 'window=99999999999999', 'window=x',
+                          'target=nan', 'target=inf', 'target=-5', 'target=0']:
+                with self.subTest(url=url, query=query):
+                    self.assertEqual(self.client.get(f'{url}?{query}').status_code, 400)
+
+    def test_valid_params(self):
+        response = self.client.get(reverse('cattle:api_cattle_growth', args=[self.cow.pk]), {'target': 330, 'window': 15})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['adg'], 1.0)
+
+
+# ---------------- Delta sync ----------------
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(HerdTestCase):
+    url = reverse('cattle:sync-list')
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cow = self.cattle('A1')
+        self.token = self.pull()['token']
+
+    def pull(self, since=None):
+        response = self.client.get(self.url, {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def push(self, changes, token=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url, json.dumps({'token': token or self.token, 'changes': changes}), content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_pull_without_token_resets(self):
+        self.assertTrue(self.pull()['reset'])
+        self.assertEqual(self.pull(self.token)['changes'], {})
+
+    def test_pull_returns_changes_and_archive_as_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            check = self.check(self.cow, 1, weight=300)
+            check.notes = 'แก้ไข'
+            check.save()
+        delta = self.pull(self.token)
+        self.assertEqual([c['notes'] for c in delta['changes']['healthcheck']['upserts']], ['แก้ไข'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_cattle([self.cow.pk])
+        delta = self.pull(delta['token'])
+        self.assertEqual(delta['changes'], {'cattle': {'upserts': [], 'deletes': [self.cow.pk]}})
+
+    def test_pull_query_count_does_not_grow_with_changes(self):
+        # pruned seq + change log + ตารางละ 1 query (cattle, healthcheck)
+        for count in (1, 10):
+            token = self.pull(self.token)['token']
+            with self.captureOnCommitCallbacks(execute=True):
+                self.cow.name = f'แก้ {count}'
+                self.cow.save()
+                for day in range(1, count + 1):
+                    self.check(self.cow, day)
+            with self.assertNumQueries(4):
+                delta = self.pull(token)
+            self.assertEqual(len(delta['changes']['healthcheck']['upserts']), count)
+
+    def test_push_insert_is_idempotent_by_ref(self):
+        change = {'table': 'healthcheck', 'ref': 'tab-1', 'data': {'cattle': self.cow.pk, 'check_date': '2026-01-01'}}
+        first, duplicate = self.push([change, change])
+        self.assertEqual((first['status'], duplicate['status']), ('ok', 'ok'))
+        self.assertEqual(first['id'], duplicate['id'])
+
+        [retry] = self.push([change])
+        self.assertEqual(retry['id'], first['id'])
+        self.assertEqual(HealthCheck.objects.count(), 1)
+
+    def test_push_detects_conflicts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cow.name = 'จากเว็บ'
+            self.cow.save()
+        [result] = self.push([{'table': 'cattle', 'id': self.cow.pk, 'data': {'name': 'จากแท็บเล็ต'}}])
+        self.assertEqual(result['status'], 'conflict')
+        self.assertEqual(result['current']['name'], 'จากเว็บ')
+
+        [result] = self.push(
+            [{'table': 'cattle', 'id': self.cow.pk, 'data': {'name': 'จากแท็บเล็ต'}}], token=self.pull(self.token)['token'],
+        )
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(Cattle.objects.get(pk=self.cow.pk).name, 'จากแท็บเล็ต')
+
+    def test_push_reports_bad_items_without_failing_batch(self):
+        results = self.push([
+            {'table': 'healthcheck', 'id': 'zz', 'data': {}},
+            {'table': 'healthcheck', 'ref': ['a'], 'data': {'cattle': self.cow.pk, 'check_date': '2026-01-01'}},
+            {'table': 'healthcheck', 'ref': 'x' * 65, 'data': {'cattle': self.cow.pk, 'check_date': '2026-01-01'}},
+            {'table': 'nope'},
+            {'table': 'healthcheck', 'data': {'cattle': self.cow.pk, 'check_date': '2026-01-01'}},
+        ])
+        self.assertEqual([r['status'] for r in results], ['error', 'error', 'error', 'error', 'ok'])
+        self.assertFalse(ChangeLog.objects.exclude(client_ref=None).exists())
+
+    def test_own_push_is_logged_once_and_does_not_conflict(self):
+        change = {'table': 'healthcheck', 'ref': 'tab-2', 'data': {'cattle': self.cow.pk, 'check_date': '2026-01-02'}}
+        with self.captureOnCommitCallbacks(execute=True):
+            [result] = push_changes([change], token=self.token)
+        self.assertEqual(ChangeLog.objects.filter(table='cattle.healthcheck', object_id=result['id']).count(), 1)
+
+        # แก้รายการเดิมต่อโดยใช้ base ที่ได้จาก push → ไม่ชนกับการบันทึกของตัวเอง
+        [edit] = self.push([{'table': 'healthcheck', 'id': result['id'], 'base': result['base'], 'data': {'notes': 'ซ้ำ'}}])
+        self.assertEqual(edit['status'], 'ok')
+        self.assertEqual(HealthCheck.objects.get(pk=result['id']).notes, 'ซ้ำ')
+
+    def test_prune_keeps_refs_within_retry_window(self):
+        change = {'table': 'healthcheck', 'ref': 'tab-3', 'data': {'cattle': self.cow.pk, 'check_date': '2026-01-03'}}
+        [first] = self.push([change])
+        prune_change_log(before=timezone.now() + datetime.timedelta(days=1), refs_before=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(list(ChangeLog.objects.values_list('client_ref', flat=True)), ['tab-3'])
+        self.assertTrue(self.pull(self.token)['reset'])
+
+        [retry] = self.push([change])
+        self.assertEqual(retry['id'], first['id'])
+        self.assertEqual(HealthCheck.objects.count(), 1)
@@ -5,6 +5,7 @@ from rest_framework import routers
 router = routers.DefaultRouter()
 router.register(r'cattle', views.CattleViewSet)
 router.register(r'healthchecks', views.HealthCheckViewSet)
+router.register(r'sync', views.SyncViewSet, basename='sync')
 
 app_name = 'cattle'
 
@@ -12,11 +13,17 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('list/', views.cattle_list, name='cattle_list'),
     path('<int:cattle_id>/', views.cattle_detail, name='cattle_detail'),
+    path('<int:cattle_id>/healthchecks/', views.cattle_healthchecks, name='cattle_healthchecks'),
     path('<int:cattle_id>/add-healthcheck/', views.add_healthcheck, name='add_healthcheck'),
+    path('round/', views.pen_round, name='pen_round'),
     path('select-cattle/', views.select_cattle_for_healthcheck, name='select_cattle_for_healthcheck'),
     path('edit/<int:cattle_id>/', views.cattle_edit, name='cattle_edit'),
     path('add/', views.add_cattle, name='cattle_add'),
     path('delete/<int:cattle_id>/', views.cattle_delete, name='cattle_delete'),
+    path('cull/', views.cattle_cull, name='cattle_cull'),
+    path('pens/', views.pen_dashboard, name='pen_dashboard'),
+    path('export/', views.export_herd, name='export_herd'),
+    path('import/', views.import_herd, name='import_herd'),
     
 
     # ปฏิทินฟาร์ม
@@ -24,8 +31,24 @@ urlpatterns = [
     path('calendar/events/', views.farm_calendar_events, name='farm_calendar_events'),
     path('calendar/add-event/', views.add_calendar_event, name='add_calendar_event'),
     path('calendar/update-event/<int:event_id>/', views.update_calendar_event, name='update_calendar_event'),
+    path('calendar/update-event/<int:event_id>/occurrence/', views.update_occurrence, name='update_occurrence'),
     path('calendar/delete-event/<int:event_id>/', views.delete_calendar_event, name='delete_calendar_event'),
     path('api/calendar-events/', views.get_calendar_events, name='api_calendar_events'),
 
+    path('api/summary/', views.herd_summary_api, name='api_herd_summary'),
+    path('api/search/', views.search_api, name='api_search'),
+    path('api/pens/', views.pens_api, name='api_pens'),
+    path('api/feed-plan/', views.feed_plan_api, name='api_feed_plan'),
+    path('api/growth/', views.growth_api, name='api_growth'),
+    path('api/growth/<int:cattle_id>/', views.cattle_growth_api, name='api_cattle_growth'),
+
+    # สายพันธุ์ / เลือดชิด
+    path('api/pedigree/', views.pedigree_herd, name='api_pedigree_herd'),
+    path('api/pedigree/mating/', views.pedigree_mating, name='api_pedigree_mating'),
+    path('api/pedigree/<int:cattle_id>/', views.pedigree_detail, name='api_pedigree_detail'),
+
     path('api/', include(router.urls)),
+
+    # Prometheus
+    path('metrics', views.metrics, name='metrics'),
 ]
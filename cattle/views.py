@@ -1,52 +1,139 @@
+import datetime
+import hashlib
+import hmac
+import math
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
-from .models import Cattle, HealthCheck, CalendarEvent
-from .forms import CattleForm, HealthCheckForm, VaccinationForm, FeedingRationForm, CalendarEventInlineForm
-from rest_framework import viewsets
+from .models import (
+    Cattle, CattleStatus, HealthCheck, CalendarEvent, CalendarEventException, FeedingRation, Housing, Vaccination,
+)
+from .forms import (
+    CattleForm, HealthCheckForm, VaccinationForm, FeedingRationForm, CalendarEventInlineForm, ImportForm, PenRoundForm,
+    PenRoundFormSet,
+)
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .serializers import CattleSerializer, HealthCheckSerializer
-from django.db.models import Subquery, OuterRef
+from .pagination import CattleCursorPagination, HealthCheckCursorPagination
+from .services import aherd_summary, atable_state, herd_summary, table_state
+from .events import Occurrence, aevents_in_window, default_window, events_in_window, parse_window
+from .archive import archive_cattle
+from .bulk import ingest_healthchecks, ingest_round, round_extras, save_healthchecks
+from .export import EXPORT_SOURCES, iter_records, stream_csv, stream_ndjson
+from .importer import ImportFileError, import_rows, read_rows
+from .pedigree import get_pedigree
+from .analytics import COHORT_FIELDS, MAX_ROLLING_WINDOW_DAYS, ROLLING_WINDOW_DAYS, cattle_growth, cohort_growth
+from .search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, search_cattle
+from .metrics import render_metrics
+from .sync import SYNC_PULL_LIMIT, SYNC_PULL_MAX, SYNC_PUSH_LIMIT, pull_changes, push_changes
+from .feeding import feed_plan
+from .recurrence import RECURRENCE_CHOICES, WEEKDAY_CHOICES, format_weekdays, parse_weekdays
+from django.conf import settings
+from django.db.models import Case, Count, F, Prefetch, Q, When, Window
+from django.db.models.functions import RowNumber
 from django.contrib import messages
-from django.http import JsonResponse
-from django.utils.dateparse import parse_datetime
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, quote_etag, urlencode
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+# ---------------- Conditional GET ----------------
+def feed_condition(*models):
+    # ETag / Last-Modified จากเวอร์ชันของตารางที่ feed ใช้ (TableVersion)
+    # ข้อมูลไม่เปลี่ยน → ตอบ 304 ด้วย query เดียว ไม่ต้องดึงข้อมูลหรือ serialize
+    def state(request):
+        if not hasattr(request, '_feed_state'):
+            request._feed_state = table_state(*models)
+        return request._feed_state
+
+    def etag(request, *args, **kwargs):
+        token, _ = state(request)
+        key = f"{token}|{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return state(request)[1]
+
+    def decorator(view):
+        if not iscoroutinefunction(view):
+            return condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        # condition() ของ Django 4.2 ห่อ async view ไม่ได้ → ทำขั้นตอนเดียวกันแบบ async
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            request._feed_state = await atable_state(*models)
+            res_etag = quote_etag(etag(request))
+            modified = last_modified(request)
+            res_last_modified = timegm(modified.utctimetuple()) if modified else None
+            response = get_conditional_response(request, etag=res_etag, last_modified=res_last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if res_last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(res_last_modified)
+                response.headers.setdefault('ETag', res_etag)
+            return response
+
+        return inner
+
+    return decorator
+
 
 # ---------------- Dashboard ----------------
 def dashboard(request):
-    total = Cattle.objects.count()
-    latest_checks = HealthCheck.objects.filter(cattle=OuterRef('pk')).order_by('-check_date')
-
-    sick_count = Cattle.objects.annotate(
-        latest_status=Subquery(latest_checks.values('status')[:1])
-    ).filter(latest_status='sick').count()
-
-    for_sale_count = Cattle.objects.annotate(
-        latest_status=Subquery(latest_checks.values('status')[:1])
-    ).filter(latest_status='forsale').count()
+    summary = herd_summary()
 
     cattle_with_status = Cattle.objects.annotate(
-        latest_status=Subquery(latest_checks.values('status')[:1])
+        latest_status=F('current_status__latest_status')
     )
 
-    events = CalendarEvent.objects.all()
+    try:
+        window_start, window_end = parse_window(request.GET)
+    except ValueError:
+        window_start, window_end = default_window()
+
+    events = events_in_window(window_start, window_end)
     events_data = []
     for event in events:
         events_data.append({
             'title': f"{event.title}{f' ({event.cattle.tag_no})' if event.cattle else ''}",
             'start': event.start.isoformat(),
             'end': event.end.isoformat() if event.end else None,
-            'url': reverse('cattle:update_calendar_event', args=[event.id])
+            'url': event_url(event),
         })
 
     context = {
-        'total': total,
-        'sick_count': sick_count,
-        'for_sale_count': for_sale_count,
+        'total': summary['total'],
+        'sick_count': summary['sick_count'],
+        'for_sale_count': summary['for_sale_count'],
         'cattle_with_status': cattle_with_status,
         'events_data': events_data,
     }
     return render(request, 'dashboard.html', context)
 
-def get_calendar_events(request):
-    events = CalendarEvent.objects.all()
+# feed JSON ที่แท็บเล็ตเรียกถี่ๆ เป็น async view — ภายใต้ ASGI รอ DB ได้โดยไม่กิน worker ทั้งตัว
+@feed_condition(CattleStatus, Cattle)
+async def herd_summary_api(request):
+    return JsonResponse(await aherd_summary())
+
+@feed_condition(CalendarEvent, Cattle)
+async def get_calendar_events(request):
+    try:
+        window_start, window_end = parse_window(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    events = await aevents_in_window(window_start, window_end)
     event_list = []
 
     for event in events:
@@ -81,41 +168,114 @@ def get_calendar_events(request):
     return JsonResponse(event_list, safe=False)
 
 # ---------------- Cattle List ----------------
+CATTLE_LIST_SEARCH_LIMIT = 500
+
 def cattle_list(request):
-    # ดึง HealthCheck ล่าสุดของแต่ละโค
-    latest_checks = HealthCheck.objects.filter(cattle=OuterRef('pk')).order_by('-check_date', '-id')
-    
+    # สถานะล่าสุดของแต่ละโค (จาก CattleStatus)
     cattle_qs = Cattle.objects.annotate(
-        latest_status=Subquery(latest_checks.values('status')[:1])
+        latest_status=F('current_status__latest_status')
     )
 
     # กรองตาม query params
+    pen = None
+    if request.GET.get('pen', '').isdigit():
+        pen = get_object_or_404(Housing, pk=request.GET['pen'])
+        cattle_qs = cattle_qs.filter(pen=pen)
     if request.GET.get('for_sale') == '1':
         cattle_qs = cattle_qs.filter(latest_status='forsale')
     elif request.GET.get('sick') == '1':
         cattle_qs = cattle_qs.filter(latest_status='sick')
 
-    # ค้นหาตาม tag_no
+    # ค้นหาจากหมายเลข ชื่อ สายพันธุ์ คอก (เรียงตามความใกล้เคียง)
     query = request.GET.get('q')
     if query:
-        cattle_qs = cattle_qs.filter(tag_no__icontains=query)
+        ids = [pk for pk, _ in search_cattle(query, limit=CATTLE_LIST_SEARCH_LIMIT)]
+        ranking = Case(*[When(pk=pk, then=rank) for rank, pk in enumerate(ids)], default=len(ids))
+        cattle_qs = cattle_qs.filter(pk__in=ids).order_by(ranking)
 
     return render(request, 'cattle_list.html', {
         'cattle_list': cattle_qs,
-        'query': query
+        'query': query,
+        'pen': pen,
     })
 
 def cattle_delete(request, cattle_id):
+    # คัดออก (ซ่อนทันที) — ประวัติถูกลบทีละชุดภายหลังโดย manage.py purge_archived
     cattle = get_object_or_404(Cattle, pk=cattle_id)
-    cattle.delete()
+    archive_cattle([cattle.pk])
     messages.success(request, f'ลบโค {cattle.tag_no} เรียบร้อยแล้ว')
     return redirect('cattle:cattle_list')
 
+def cattle_cull(request):
+    # คัดออกหลายตัวพร้อมกันจากรายการโค (checkbox)
+    if request.method != 'POST':
+        return redirect('cattle:cattle_list')
+    ids = [pk for pk in request.POST.getlist('cattle_ids') if pk.isdigit()]
+    count = archive_cattle(ids) if ids else 0
+    if count:
+        messages.success(request, f'คัดโคออก {count} ตัวเรียบร้อยแล้ว')
+    else:
+        messages.error(request, 'กรุณาเลือกโคที่ต้องการคัดออก')
+    return redirect('cattle:cattle_list')
+
 # ---------------- Cattle Detail ----------------
+HEALTH_HISTORY_PAGE_SIZE = 20
+
+
+def _parse_history_cursor(value):
+    # cursor = "<check_date>:<id>" ของแถวสุดท้ายในหน้าก่อน
+    check_date, check_id = value.split(':')
+    return datetime.date.fromisoformat(check_date), int(check_id)
+
+
+def healthcheck_history_page(cattle_id, cursor=None, page_size=HEALTH_HISTORY_PAGE_SIZE):
+    # keyset pagination ตาม index (cattle, -check_date, -id) → เร็วเท่ากันทุกหน้าแม้ประวัติยาวหลายปี
+    checks = HealthCheck.objects.filter(cattle_id=cattle_id, cattle__archived_at__isnull=True).order_by('-check_date', '-id')
+    if cursor:
+        check_date, check_id = cursor
+        checks = checks.filter(Q(check_date__lt=check_date) | Q(check_date=check_date, id__lt=check_id))
+    rows = list(checks[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = f'{rows[-1].check_date.isoformat()}:{rows[-1].pk}'
+    return rows, next_cursor
+
+
 def cattle_detail(request, cattle_id):
-    cattle = get_object_or_404(Cattle, pk=cattle_id)
-    checks = cattle.healthchecks.all()
-    return render(request, 'cattle_detail.html', {'c': cattle, 'checks': checks})
+    # จำนวน query คงที่: โค+สถานะ+baseline, อาหาร, วัคซีน, สรุปประวัติ, ประวัติหน้าแรก
+    cattle = get_object_or_404(
+        Cattle.objects.select_related('current_status', 'vital_baseline').prefetch_related(
+            'rations',
+            Prefetch('vaccinations', queryset=Vaccination.objects.order_by('-vaccine_date', '-id')),
+        ),
+        pk=cattle_id,
+    )
+    history = HealthCheck.objects.filter(cattle_id=cattle_id).aggregate(
+        total=Count('id'), anomalies=Count('id', filter=Q(is_anomaly=True)),
+    )
+    checks, next_cursor = healthcheck_history_page(cattle_id)
+    return render(request, 'cattle_detail.html', {
+        'c': cattle,
+        'status': getattr(cattle, 'current_status', None),
+        'baseline': getattr(cattle, 'vital_baseline', None),
+        'history': history,
+        'checks': checks,
+        'next_cursor': next_cursor,
+    })
+
+
+def cattle_healthchecks(request, cattle_id):
+    # ประวัติสุขภาพหน้าถัดไป (HTML ของแถวตาราง) สำหรับปุ่ม "โหลดเพิ่ม" ในหน้า cattle_detail
+    try:
+        cursor = _parse_history_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+    except ValueError:
+        return JsonResponse({'error': 'cursor ไม่ถูกต้อง'}, status=400)
+    checks, next_cursor = healthcheck_history_page(cattle_id, cursor)
+    return JsonResponse({
+        'html': render_to_string('healthcheck_rows.html', {'checks': checks}, request=request),
+        'next_cursor': next_cursor,
+    })
 
 # ---------------- Add/Edit Cattle ----------------
 def add_cattle(request):
@@ -209,8 +369,8 @@ def add_healthcheck(request, cattle_id):
 
     else:
         # GET → set status ล่าสุด
-        latest_hc = cattle.healthchecks.order_by('-check_date').first()
-        initial_status = latest_hc.status if latest_hc else 'healthy'
+        current_status = CattleStatus.objects.filter(cattle=cattle).values_list('latest_status', flat=True).first()
+        initial_status = current_status or 'healthy'
 
         hc_form = HealthCheckForm(prefix='hc', initial={'status': initial_status})
         vax_form = VaccinationForm(prefix='vax')
@@ -226,13 +386,319 @@ def add_healthcheck(request, cattle_id):
     }
     return render(request, 'add_healthcheck.html', context)
 
+# ------------------- รอบตรวจทั้งคอก -------------------
+def _require(form, *fields):
+    # ฟอร์มเสริมตั้งทุกช่องเป็น optional → ถ้ากรอกมา ต้องมีช่องหลักครบก่อน bulk insert
+    for field in fields:
+        if not form.cleaned_data.get(field):
+            form.add_error(field, 'จำเป็นต้องกรอก')
+    return not form.errors
+
+def _row_cattle_id(form):
+    value = form['cattle'].value()
+    return int(value) if str(value).isdigit() else None
+
+def pen_round(request):
+    # บันทึกผลตรวจของทั้งคอก (หรือโคที่เลือก) + วัคซีน/กิจกรรมที่ใช้ร่วมกัน ในการส่งครั้งเดียว
+    # GET ?pen=<id> / POST cattle_ids (จากรายการโค) → แสดงฟอร์ม, POST ที่มีแถว (rows-*) → บันทึก
+    pen = None
+    pen_id = request.POST.get('pen') or request.GET.get('pen') or ''
+    if pen_id.isdigit():
+        pen = get_object_or_404(Housing, pk=pen_id)
+    submitted = request.method == 'POST' and 'rows-TOTAL_FORMS' in request.POST
+
+    if submitted:
+        round_form = PenRoundForm(request.POST, prefix='round')
+        rows = PenRoundFormSet(request.POST, prefix='rows')
+        vax_form = VaccinationForm(request.POST, prefix='vax')
+        cal_form = CalendarEventInlineForm(request.POST, prefix='cal')
+        cattle = Cattle.objects.in_bulk([pk for pk in map(_row_cattle_id, rows) if pk is not None])
+
+        all_valid = round_form.is_valid() & rows.is_valid()
+        if vax_form.has_changed():
+            all_valid = all_valid and vax_form.is_valid() and _require(vax_form, 'vaccine_name', 'vaccine_date')
+        if cal_form.has_changed():
+            all_valid = all_valid and cal_form.is_valid() and _require(cal_form, 'title', 'start')
+
+        if all_valid:
+            check_date = round_form.cleaned_data['check_date']
+            checks = []
+            for row in rows:
+                if row.cleaned_data.get('include') and row.cleaned_data['cattle'] in cattle:
+                    check = row.save(commit=False)
+                    check.cattle_id = row.cleaned_data['cattle']
+                    check.check_date = check_date
+                    checks.append(check)
+            if checks:
+                vaccinations, events = round_extras(
+                    [check.cattle_id for check in checks],
+                    vax_form.cleaned_data if vax_form.has_changed() else None,
+                    cal_form.cleaned_data if cal_form.has_changed() else None,
+                )
+                save_healthchecks(checks, vaccinations, events)
+                messages.success(request, f'บันทึกผลตรวจ {len(checks)} ตัวเรียบร้อยแล้ว')
+                if pen:
+                    return redirect(f"{reverse('cattle:cattle_list')}?pen={pen.pk}")
+                return redirect('cattle:cattle_list')
+            messages.error(request, 'กรุณาเลือกโคอย่างน้อยหนึ่งตัว')
+        else:
+            messages.error(request, 'กรุณาตรวจสอบข้อมูล: มีข้อผิดพลาดในบางฟอร์ม')
+    else:
+        selection = Cattle.objects.select_related('current_status').order_by('tag_no')
+        if pen:
+            selection = selection.filter(pen=pen)
+        else:
+            selection = selection.filter(pk__in=[pk for pk in request.POST.getlist('cattle_ids') if pk.isdigit()])
+        cattle = {c.pk: c for c in selection}
+        if not cattle:
+            messages.error(request, 'ไม่พบโคในคอกหรือรายการที่เลือก')
+            return redirect('cattle:pen_dashboard' if pen else 'cattle:cattle_list')
+        round_form = PenRoundForm(prefix='round')
+        initial = []
+        for c in cattle.values():
+            # สถานะเริ่มต้น = สถานะล่าสุดของแต่ละตัว เหมือน add_healthcheck
+            status = getattr(c, 'current_status', None)
+            initial.append({'cattle': c.pk, 'include': True, 'status': status.latest_status if status else 'healthy'})
+        rows = PenRoundFormSet(prefix='rows', initial=initial)
+        vax_form = VaccinationForm(prefix='vax')
+        cal_form = CalendarEventInlineForm(prefix='cal')
+
+    return render(request, 'pen_round.html', {
+        'pen': pen,
+        'round_form': round_form,
+        'rows': rows,
+        'row_cattle': [(row, cattle.get(_row_cattle_id(row))) for row in rows],
+        'vax_form': vax_form,
+        'cal_form': cal_form,
+    })
+
+# ---------------- Search ----------------
+async def search_api(request):
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', SEARCH_LIMIT)), SEARCH_MAX_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'limit ต้องเป็นจำนวนเต็ม'}, status=400)
+
+    # index ค้นหาอยู่ในหน่วยความจำ (งาน CPU + cache) → รันใน thread
+    results = await sync_to_async(search_cattle)(query, limit=limit)
+    cattle = await Cattle.objects.select_related('current_status').ain_bulk([pk for pk, _ in results])
+    data = []
+    for pk, score in results:
+        c = cattle.get(pk)
+        if c is None:
+            continue
+        status = getattr(c, 'current_status', None)
+        data.append({
+            'id': c.id,
+            'tag_no': c.tag_no,
+            'name': c.name,
+            'breed': c.breed,
+            'housing': c.housing,
+            'latest_status': status.latest_status if status else None,
+            'score': score,
+            'url': reverse('cattle:cattle_detail', args=[c.id]),
+        })
+    return JsonResponse({'query': query, 'results': data})
+
+# ---------------- Pens (คอก) ----------------
+def _pen_data(pen):
+    return {
+        'id': pen.id,
+        'name': pen.name,
+        'head_count': pen.head_count,
+        'sick_count': pen.sick_count,
+        'for_sale_count': pen.for_sale_count,
+        'avg_weight': float(pen.avg_weight) if pen.avg_weight is not None else None,
+        'updated_at': pen.updated_at.isoformat(),
+    }
+
+def pen_dashboard(request):
+    # อ่านจากยอดสรุปใน Housing โดยตรง ไม่ต้องนับโคทีละตัว
+    pens = Housing.objects.filter(head_count__gt=0)
+    return render(request, 'pen_dashboard.html', {'pens': pens})
+
+@feed_condition(Housing)
+async def pens_api(request):
+    pens = [_pen_data(pen) async for pen in Housing.objects.filter(head_count__gt=0)]
+    return JsonResponse({'results': pens})
+
+# ---------------- Feed Planning ----------------
+@feed_condition(FeedingRation, Cattle)
+def feed_plan_api(request):
+    # ?date=YYYY-MM-DD (ค่าเริ่มต้น: พรุ่งนี้) → ยอดอาหารสด/แห้งของโคที่อยู่ในฝูงวันนั้น แยกคอก × สูตร × รอบ
+    date = None
+    if request.GET.get('date'):
+        date = parse_date(request.GET['date'])
+        if date is None:
+            return JsonResponse({'error': 'date ต้องอยู่ในรูปแบบ YYYY-MM-DD'}, status=400)
+    return JsonResponse(feed_plan(date))
+
+# ---------------- Growth Analytics ----------------
+def _growth_params(request):
+    # target = น้ำหนักเป้าหมาย (กก.) > 0, window = 1..MAX_ROLLING_WINDOW_DAYS วัน → ไม่ตรงเงื่อนไข = ValueError (400)
+    try:
+        target = float(request.GET['target']) if request.GET.get('target') else None
+        window = int(request.GET['window']) if request.GET.get('window') else ROLLING_WINDOW_DAYS
+    except ValueError:
+        raise ValueError('target/window ต้องเป็นตัวเลข') from None
+    if target is not None and not (math.isfinite(target) and target > 0):
+        raise ValueError('target ต้องเป็นน้ำหนักที่มากกว่า 0')
+    if not 1 <= window <= MAX_ROLLING_WINDOW_DAYS:
+        raise ValueError(f'window ต้องอยู่ระหว่าง 1 ถึง {MAX_ROLLING_WINDOW_DAYS} วัน')
+    return target, window
+
+def growth_api(request):
+    # ADG ของทั้งฝูง หรือกรองตาม ?housing= &breed= &category= &gender=
+    try:
+        target, window = _growth_params(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    cohort = {field: request.GET.get(field) for field in COHORT_FIELDS}
+    return JsonResponse(cohort_growth(cohort, target=target, window=window))
+
+def cattle_growth_api(request, cattle_id):
+    cattle = get_object_or_404(Cattle, pk=cattle_id)
+    try:
+        target, window = _growth_params(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(cattle_growth(cattle.id, target=target, window=window))
+
+# ---------------- Pedigree ----------------
+def pedigree_detail(request, cattle_id):
+    pedigree = get_pedigree()
+    if not pedigree.is_active(cattle_id):
+        return JsonResponse({'error': 'ไม่พบโค'}, status=404)
+
+    max_depth = request.GET.get('depth')
+    max_depth = int(max_depth) if max_depth and max_depth.isdigit() else None
+    return JsonResponse({
+        'cattle_id': cattle_id,
+        'parents': pedigree.parents(cattle_id),
+        'inbreeding': pedigree.inbreeding_of(cattle_id),
+        'ancestors': pedigree.ancestors(cattle_id, max_depth),
+        'descendants': pedigree.descendants(cattle_id, max_depth),
+        'unresolved': [u for u in pedigree.unresolved if u['cattle_id'] == cattle_id],
+    })
+
+def pedigree_mating(request):
+    # ตรวจคู่ผสม: สัมประสิทธิ์เลือดชิดของลูกที่จะเกิด
+    pedigree = get_pedigree()
+    try:
+        sire, dam = int(request.GET['sire']), int(request.GET['dam'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'ต้องระบุ sire และ dam เป็น id ของโค'}, status=400)
+    if not pedigree.is_active(sire) or not pedigree.is_active(dam):
+        return JsonResponse({'error': 'ไม่พบโค'}, status=404)
+
+    return JsonResponse({
+        'sire': sire,
+        'dam': dam,
+        'offspring_inbreeding': round(pedigree.coancestry(sire, dam), 6),
+        'common_ancestors': pedigree.common_ancestors(sire, dam),
+    })
+
+def pedigree_herd(request):
+    pedigree = get_pedigree()
+    inbreeding = pedigree.inbreeding()
+    return JsonResponse({
+        'inbreeding': [
+            {'cattle_id': cattle_id, 'tag_no': pedigree.tags[pedigree.index[cattle_id]], 'inbreeding': f}
+            for cattle_id, f in sorted(inbreeding.items(), key=lambda item: -item[1])
+            if f > 0 and cattle_id not in pedigree.archived
+        ],
+        'unresolved': [u for u in pedigree.unresolved if u['cattle_id'] not in pedigree.archived],
+    })
+
+# ---------------- Export ----------------
+def export_herd(request):
+    export_format = request.GET.get('format', 'csv')
+    record_types = [t for t in request.GET.get('include', '').split(',') if t]
+    unknown = set(record_types) - set(EXPORT_SOURCES)
+    if unknown:
+        return JsonResponse({'error': f"ไม่รู้จักประเภทข้อมูล: {', '.join(sorted(unknown))}"}, status=400)
+
+    records = iter_records(record_types)
+    if export_format == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(records), content_type='application/x-ndjson; charset=utf-8')
+        filename = 'herd_history.ndjson'
+    elif export_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(records), content_type='text/csv; charset=utf-8')
+        filename = 'herd_history.csv'
+    else:
+        return JsonResponse({'error': 'format ต้องเป็น csv หรือ ndjson'}, status=400)
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# ---------------- Import ----------------
+def import_herd(request):
+    result = None
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_rows(
+                    form.cleaned_data['kind'],
+                    read_rows(upload, upload.name),
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except ImportFileError as e:
+                messages.error(request, str(e))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.info(request, f"ตรวจสอบ {result['rows']} แถว พบข้อผิดพลาด {len(result['errors'])} แถว (ยังไม่ได้บันทึก)")
+                else:
+                    messages.success(request, f"นำเข้า {result['rows']} แถว: เพิ่ม {result['created']}, อัปเดต {result['updated']}")
+    else:
+        form = ImportForm()
+
+    return render(request, 'import_herd.html', {
+        'form': form,
+        'result': result,
+        'errors': result['errors'][:100] if result else [],
+    })
+
 # ---------------- Farm Calendar ----------------
+def event_url(event):
+    # ครั้งหนึ่งของกิจกรรมซ้ำ → หน้าแก้ไขเฉพาะครั้งนั้น
+    if isinstance(event, Occurrence):
+        query = urlencode({'start': event.original_start.isoformat()})
+        return f"{reverse('cattle:update_occurrence', args=[event.id])}?{query}"
+    return reverse('cattle:update_calendar_event', args=[event.id])
+
+def _apply_recurrence(event, data):
+    # ฟิลด์กิจกรรมซ้ำจากฟอร์ม (ว่าง = ไม่ซ้ำ)
+    event.recurrence = data.get("recurrence") or ''
+    event.interval = max(int(data.get("interval") or 1), 1)
+    event.weekdays = format_weekdays(data.getlist("weekdays"))
+    event.until = parse_date(data.get("until") or '')
+    event.count = int(data["count"]) if data.get("count") else None
+
+def _aware(value):
+    value = parse_datetime(value or '')
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+def _active_events():
+    # กิจกรรมของโคที่คัดออกแล้วซ่อนจากปฏิทิน (กู้คืนโคแล้วกลับมาเหมือนเดิม)
+    return CalendarEvent.objects.filter(cattle__archived_at__isnull=True)
+
 def farm_calendar(request):
-    events = CalendarEvent.objects.all()
+    events = _active_events().select_related('cattle')
     return render(request, "farm_calendar.html", {"events": events})
 
-def farm_calendar_events(request):
-    events = CalendarEvent.objects.all()
+@feed_condition(CalendarEvent, Cattle)
+async def farm_calendar_events(request):
+    try:
+        window_start, window_end = parse_window(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    events = await aevents_in_window(window_start, window_end)
     data = []
     for e in events:
         data.append({
@@ -240,6 +706,7 @@ def farm_calendar_events(request):
             "title": e.title,
             "start": e.start.isoformat(),
             "end": e.end.isoformat() if e.end else e.start.isoformat(),
+            "url": event_url(e),
         })
     return JsonResponse(data, safe=False)
 
@@ -248,11 +715,11 @@ def add_calendar_event(request):
         cattle_id = request.POST.get("cattle")
         cattle = get_object_or_404(Cattle, id=cattle_id)
         title = request.POST.get("title")
-        start = parse_datetime(request.POST.get("start"))
-        end = parse_datetime(request.POST.get("end")) if request.POST.get("end") else start
+        start = _aware(request.POST.get("start"))
+        end = _aware(request.POST.get("end")) if request.POST.get("end") else start
         event_type = request.POST.get("event_type")
         notes = request.POST.get("notes")
-        CalendarEvent.objects.create(
+        event = CalendarEvent(
             cattle=cattle,
             title=title,
             start=start,
@@ -260,33 +727,224 @@ def add_calendar_event(request):
             event_type=event_type,
             notes=notes
         )
+        _apply_recurrence(event, request.POST)
+        event.save()
         return redirect('cattle:farm_calendar')
     cattles = Cattle.objects.all()
-    return render(request, "add_calendar_event.html", {"cattles": cattles})
+    return render(request, "add_calendar_event.html", {
+        "cattles": cattles,
+        "recurrence_choices": RECURRENCE_CHOICES,
+        "weekday_choices": WEEKDAY_CHOICES,
+    })
 
 def update_calendar_event(request, event_id):
-    event = get_object_or_404(CalendarEvent, id=event_id)
+    event = get_object_or_404(_active_events(), id=event_id)
     if request.method == "POST":
         event.title = request.POST.get("title")
-        event.start = parse_datetime(request.POST.get("start"))
-        event.end = parse_datetime(request.POST.get("end")) if request.POST.get("end") else event.start
+        event.start = _aware(request.POST.get("start"))
+        event.end = _aware(request.POST.get("end")) if request.POST.get("end") else event.start
         event.event_type = request.POST.get("event_type")
         event.notes = request.POST.get("notes")
+        _apply_recurrence(event, request.POST)
         event.save()
         return redirect('cattle:farm_calendar')
     cattles = Cattle.objects.all()
-    return render(request, "update_calendar_event.html", {"event": event, "cattles": cattles})
+    return render(request, "update_calendar_event.html", {
+        "event": event,
+        "cattles": cattles,
+        "recurrence_choices": RECURRENCE_CHOICES,
+        "weekday_choices": WEEKDAY_CHOICES,
+        "selected_weekdays": parse_weekdays(event.weekdays),
+    })
+
+def update_occurrence(request, event_id):
+    # แก้ไข / ยกเลิก เฉพาะครั้งหนึ่งของกิจกรรมซ้ำ (?start=เวลาเริ่มเดิมของครั้งนั้น)
+    event = get_object_or_404(_active_events().select_related('cattle'), id=event_id)
+    original_start = parse_datetime((request.GET.get("start") or '').replace(' ', '+'))
+    rule = event.rule()
+    if original_start is None or rule is None or original_start not in rule.starts(
+        original_start, original_start + datetime.timedelta(seconds=1)
+    ):
+        messages.error(request, "ไม่พบครั้งที่ต้องการของกิจกรรมนี้")
+        return redirect('cattle:farm_calendar')
+
+    exception = CalendarEventException.objects.filter(event=event, original_start=original_start).first()
+    if request.method == "POST":
+        action = request.POST.get("action")
+        if action == "reset":
+            CalendarEventException.objects.filter(event=event, original_start=original_start).delete()
+        else:
+            # เก็บเฉพาะค่าที่ต่างจากชุดกิจกรรม → แก้ทั้งชุดภายหลังแล้วครั้งนี้ยังตามไปด้วย
+            default = Occurrence(event, original_start, rule.duration)
+            start = _aware(request.POST.get("start"))
+            end = _aware(request.POST.get("end"))
+            title = request.POST.get("title") or None
+            notes = request.POST.get("notes") or None
+            CalendarEventException.objects.update_or_create(
+                event=event, original_start=original_start,
+                defaults={
+                    'cancelled': action == "cancel",
+                    'start': start if start != default.start else None,
+                    'end': end if end != default.end else None,
+                    'title': title if title != default.title else None,
+                    'notes': notes if notes != default.notes else None,
+                },
+            )
+        return redirect('cattle:farm_calendar')
+
+    occurrence = Occurrence(event, original_start, rule.duration, exception)
+    return render(request, "update_occurrence.html", {
+        "event": event,
+        "occurrence": occurrence,
+        "exception": exception,
+    })
 
 def delete_calendar_event(request, event_id):
-    event = get_object_or_404(CalendarEvent, id=event_id)
+    event = get_object_or_404(_active_events(), id=event_id)
     event.delete()
     return redirect('cattle:farm_calendar')
 
 # ---------------- DRF ViewSets ----------------
+def recent_healthchecks_prefetch(limit=None):
+    # HealthCheck ล่าสุด N รายการต่อโค ใน query เดียว (ROW_NUMBER ตามโค)
+    limit = limit or settings.API_RECENT_HEALTHCHECKS
+    recent = HealthCheck.objects.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('cattle_id'),
+            order_by=[F('check_date').desc(), F('id').desc()],
+        )
+    ).filter(row_number__lte=limit).order_by('cattle_id', '-check_date', '-id')
+    return Prefetch('healthchecks', queryset=recent, to_attr='recent_healthchecks')
+
+
 class CattleViewSet(viewsets.ModelViewSet):
-    queryset = Cattle.objects.all()
+    queryset = Cattle.objects.select_related('current_status')
     serializer_class = CattleSerializer
+    pagination_class = CattleCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(recent_healthchecks_prefetch())
+        return queryset
+
+    @method_decorator(feed_condition(Cattle, CattleStatus, HealthCheck))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(feed_condition(Cattle, CattleStatus, HealthCheck))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        serializer_class=HealthCheckSerializer,
+        pagination_class=HealthCheckCursorPagination,
+    )
+    @method_decorator(feed_condition(Cattle, HealthCheck))
+    def healthchecks(self, request, pk=None):
+        # ประวัติสุขภาพทั้งหมดของโคตัวนี้ แบ่งหน้าแบบ cursor
+        cattle = get_object_or_404(Cattle, pk=pk)
+        page = self.paginate_queryset(HealthCheck.objects.filter(cattle=cattle))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def perform_destroy(self, instance):
+        # DELETE /api/cattle/<id>/ = คัดออก เหมือนหน้าเว็บ
+        archive_cattle([instance.pk])
+
+    @action(detail=False, methods=['post'])
+    def cull(self, request):
+        # คัดออกหลายตัว: {"ids": [1, 2, ...]}
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'detail': 'ต้องส่ง ids เป็นรายการตัวเลข'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'archived': archive_cattle(ids)})
 
 class HealthCheckViewSet(viewsets.ModelViewSet):
-    queryset = HealthCheck.objects.all()
+    queryset = HealthCheck.objects.filter(cattle__archived_at__isnull=True)
     serializer_class = HealthCheckSerializer
+    pagination_class = HealthCheckCursorPagination
+
+    @method_decorator(feed_condition(HealthCheck))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(feed_condition(HealthCheck))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        # รับได้ทั้ง [..] หรือ {"readings": [..], "partial": true}
+        payload = request.data
+        partial = False
+        if isinstance(payload, dict):
+            partial = str(payload.get('partial', '')).lower() in ('1', 'true')
+            payload = payload.get('readings')
+        if not isinstance(payload, list):
+            return Response({'detail': 'ต้องส่ง readings เป็นรายการ'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, errors = ingest_healthchecks(payload, partial=partial)
+        if errors and not created and not partial:
+            return Response({'created': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': created, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='round')
+    def pen_round(self, request):
+        # รอบตรวจทั้งคอก: {"check_date": .., "readings": [{"tag_no": .., ..}], "vaccination": {..}, "event": {..}}
+        payload = request.data
+        if not isinstance(payload, dict) or not isinstance(payload.get('readings'), list):
+            return Response({'detail': 'ต้องส่ง readings เป็นรายการ'}, status=status.HTTP_400_BAD_REQUEST)
+        partial = str(payload.get('partial', '')).lower() in ('1', 'true')
+
+        created, errors = ingest_round(
+            payload['readings'],
+            check_date=payload.get('check_date'),
+            vaccination=payload.get('vaccination'),
+            event=payload.get('event'),
+            partial=partial,
+        )
+        if errors and not created:
+            return Response({'created': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': created, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+
+class SyncViewSet(viewsets.ViewSet):
+    # delta sync ของแท็บเล็ต: GET ?since=<token> ดึงการเปลี่ยนแปลง, POST ส่งรายการที่บันทึกตอน offline
+    def list(self, request):
+        since = request.query_params.get('since')
+        limit = request.query_params.get('limit', str(SYNC_PULL_LIMIT))
+        if (since is not None and not since.isdigit()) or not limit.isdigit():
+            return Response({'detail': 'since/limit ต้องเป็นตัวเลข'}, status=status.HTTP_400_BAD_REQUEST)
+        since = int(since) if since is not None else None
+        return Response(pull_changes(since, limit=min(max(int(limit), 1), SYNC_PULL_MAX)))
+
+    def create(self, request):
+        payload = request.data
+        changes = payload.get('changes') if isinstance(payload, dict) else None
+        if not isinstance(changes, list):
+            return Response({'detail': 'ต้องส่ง changes เป็นรายการ'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(changes) > SYNC_PUSH_LIMIT:
+            return Response(
+                {'detail': f'ส่งได้ครั้งละไม่เกิน {SYNC_PUSH_LIMIT} รายการ'}, status=status.HTTP_400_BAD_REQUEST,
+            )
+        token = payload.get('token')
+        if token is not None and not str(token).isdigit():
+            return Response({'detail': 'token ไม่ถูกต้อง'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': push_changes(changes, token=token)})
+
+
+# ---------------- Metrics ----------------
+def metrics(request):
+    # Prometheus text format — ต้องมี token (หรือเปิด DEBUG) เพราะเปิดเผยชื่อ view และปริมาณการใช้งาน
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get('Authorization', '').encode()
+        if not hmac.compare_digest(supplied, f'Bearer {token}'.encode()):
+            return HttpResponse(status=403)
+    elif not settings.DEBUG:
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,231 @@
+import math
+
+import numpy as np
+from django.db import connection, transaction
+
+from .models import HealthCheck, VitalBaseline
+from .services import touch_tables
+
+VITAL_FIELDS = ('temperature', 'heart_rate')
+# |z| ที่ถือว่าผิดปกติเมื่อเทียบกับค่าปกติของโคตัวเดียวกัน
+ANOMALY_THRESHOLD = 3.0
+# ต้องมีค่าเดิมอย่างน้อยเท่านี้ก่อนจึงจะเริ่มตัดสิน
+MIN_BASELINE_READINGS = 5
+# ส่วนเบี่ยงเบนขั้นต่ำ กันโคที่ค่านิ่งมากถูกแจ้งเตือนจากความต่างเล็กน้อย
+MIN_STD = {'temperature': 0.2, 'heart_rate': 4.0}
+LOOKUP_CHUNK_SIZE = 900
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _zscore(field, value, count, mean, m2):
+    if count < MIN_BASELINE_READINGS:
+        return None
+    std = max(math.sqrt(m2 / (count - 1)), MIN_STD[field])
+    return round((value - mean) / std, 3)
+
+
+def _is_anomaly(scores):
+    return any(z is not None and abs(z) > ANOMALY_THRESHOLD for z in scores.values())
+
+
+def _baseline_stats(baseline, field):
+    return tuple(getattr(baseline, f'{field}_{part}') for part in ('count', 'mean', 'm2'))
+
+
+def _set_baseline_stats(baseline, field, stats):
+    for part, value in zip(('count', 'mean', 'm2'), stats):
+        setattr(baseline, f'{field}_{part}', value)
+
+
+# ---------------- ทีละรายการ (บันทึกจากฟอร์ม / API) ----------------
+def score_healthcheck(check):
+    # เทียบค่าใหม่กับ baseline เดิม แล้วรวมค่าเข้า baseline แบบ Welford — O(1) ไม่อ่านประวัติ
+    values = {field: getattr(check, field) for field in VITAL_FIELDS}
+    if all(value is None for value in values.values()):
+        return
+    with transaction.atomic():
+        baseline, _ = VitalBaseline.objects.select_for_update().get_or_create(cattle_id=check.cattle_id)
+        scores = {}
+        for field, value in values.items():
+            if value is None:
+                scores[field] = None
+                continue
+            value = float(value)
+            count, mean, m2 = _baseline_stats(baseline, field)
+            scores[field] = _zscore(field, value, count, mean, m2)
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+            _set_baseline_stats(baseline, field, (count, mean, m2))
+        baseline.save()
+
+        check.temperature_zscore = scores['temperature']
+        check.heart_rate_zscore = scores['heart_rate']
+        check.is_anomaly = _is_anomaly(scores)
+        HealthCheck.objects.filter(pk=check.pk).update(
+            temperature_zscore=check.temperature_zscore,
+            heart_rate_zscore=check.heart_rate_zscore,
+            is_anomaly=check.is_anomaly,
+        )
+
+
+# ---------------- ทั้งชุด (vectorized) ----------------
+def _accumulate(field, ids, values, base):
+    # ids เรียงเป็นกลุ่มต่อโค (ตามลำดับวันที่), values ไม่มีค่าว่าง
+    # base: {cattle_id: (count, mean, m2)} ก่อนค่าชุดนี้ → คืนค่า (z ของแต่ละแถว, baseline ใหม่ต่อโค)
+    if not len(ids):
+        return np.zeros(0), {}
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1))
+    sizes = np.diff(np.concatenate((starts, [len(ids)])))
+    group_ids = ids[starts]
+    stats = np.array([base.get(int(i), (0, 0.0, 0.0)) for i in group_ids], dtype=np.float64).reshape(-1, 3)
+    base_n, base_mean, base_m2 = stats.T
+
+    # เลื่อนจุดอ้างอิงไปที่ค่าเฉลี่ยเดิม (หรือค่าแรก) ของแต่ละตัว กันความคลาดเคลื่อนของผลรวมกำลังสอง
+    reference = np.where(base_n > 0, base_mean, values[starts])
+    y = values - reference.repeat(sizes)
+    base_s1 = base_n * (base_mean - reference)
+    base_s2 = base_m2 + base_n * (base_mean - reference) ** 2
+
+    # ผลรวมสะสมของค่าก่อนหน้าภายในโคตัวเดียวกัน (ไม่รวมแถวปัจจุบัน)
+    before = np.arange(len(ids)) - starts.repeat(sizes)
+    s1 = np.cumsum(y) - y
+    s2 = np.cumsum(y * y) - y * y
+    s1 -= s1[starts].repeat(sizes)
+    s2 -= s2[starts].repeat(sizes)
+    n = base_n.repeat(sizes) + before
+    s1 += base_s1.repeat(sizes)
+    s2 += base_s2.repeat(sizes)
+
+    z = np.full(len(ids), np.nan)
+    enough = n >= MIN_BASELINE_READINGS
+    safe_n = np.where(enough, n, 2)
+    variance = np.maximum(s2 - s1 * s1 / safe_n, 0) / (safe_n - 1)
+    std = np.maximum(np.sqrt(variance), MIN_STD[field])
+    z[enough] = ((y - s1 / safe_n) / std)[enough]
+
+    total_n = base_n + sizes
+    total_s1 = base_s1 + np.add.reduceat(y, starts)
+    total_s2 = base_s2 + np.add.reduceat(y * y, starts)
+    totals = {
+        int(cattle_id): (int(count), float(ref + s1_ / count), float(max(s2_ - s1_ * s1_ / count, 0)))
+        for cattle_id, count, ref, s1_, s2_ in zip(group_ids, total_n, reference, total_s1, total_s2)
+    }
+    return np.round(z, 3), totals
+
+
+def _score_rows(rows, base):
+    # rows: [(pk, cattle_id, temperature, heart_rate)] เรียงตาม (โค, วันที่)
+    # คืนค่า ({pk: (temperature_z, heart_rate_z, is_anomaly)}, {cattle_id: {field: stats}})
+    pks = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    ids = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    scores = {}
+    baselines = {}
+    for column, field in enumerate(VITAL_FIELDS, start=2):
+        values = np.array([np.nan if r[column] is None else float(r[column]) for r in rows], dtype=np.float64)
+        present = ~np.isnan(values)
+        z, totals = _accumulate(
+            field, ids[present], values[present],
+            {cattle_id: stats[field] for cattle_id, stats in base.items()},
+        )
+        full = np.full(len(rows), np.nan)
+        full[present] = z
+        scores[field] = full
+        for cattle_id, stats in totals.items():
+            baselines.setdefault(cattle_id, {})[field] = stats
+
+    flagged = (np.abs(np.nan_to_num(scores['temperature'])) > ANOMALY_THRESHOLD) | (
+        np.abs(np.nan_to_num(scores['heart_rate'])) > ANOMALY_THRESHOLD
+    )
+    results = {}
+    for i, pk in enumerate(pks.tolist()):
+        t, h = scores['temperature'][i], scores['heart_rate'][i]
+        results[pk] = (None if np.isnan(t) else float(t), None if np.isnan(h) else float(h), bool(flagged[i]))
+    return results, baselines
+
+
+def _save_scores(results, current, batch_size):
+    # อัปเดตเฉพาะ HealthCheck ที่ผลเปลี่ยนจริง
+    # ใช้ executemany แทน bulk_update (CASE WHEN ยาวเป็นพันเงื่อนไขช้ามากเมื่อมีหลายแสนแถว)
+    changed = [
+        (t, h, flag, pk)
+        for pk, (t, h, flag) in results.items()
+        if current.get(pk) != (t, h, flag)
+    ]
+    qn = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} = %s, {} = %s, {} = %s WHERE {} = %s'.format(
+        qn(HealthCheck._meta.db_table),
+        *(qn(HealthCheck._meta.get_field(name).column)
+          for name in ('temperature_zscore', 'heart_rate_zscore', 'is_anomaly', 'id')),
+    )
+    with connection.cursor() as cursor:
+        for i in range(0, len(changed), batch_size):
+            cursor.executemany(sql, changed[i:i + batch_size])
+    return len(changed)
+
+
+def _save_baselines(baselines, batch_size):
+    rows = []
+    for cattle_id, stats in baselines.items():
+        baseline = VitalBaseline(cattle_id=cattle_id)
+        for field in VITAL_FIELDS:
+            _set_baseline_stats(baseline, field, stats.get(field, (0, 0.0, 0.0)))
+        rows.append(baseline)
+    VitalBaseline.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['cattle'],
+        update_fields=[f'{field}_{part}' for field in VITAL_FIELDS for part in ('count', 'mean', 'm2')] + ['updated_at'],
+    )
+
+
+def score_healthchecks(checks, batch_size=1000):
+    # ต่อจาก bulk_create: ให้คะแนนค่าใหม่ทั้งชุดเทียบกับ baseline เดิม แล้วรวมเข้า baseline
+    checks = [c for c in checks if any(getattr(c, field) is not None for field in VITAL_FIELDS)]
+    if not checks:
+        return 0
+    checks.sort(key=lambda c: (c.cattle_id, c.check_date, c.pk))
+    with transaction.atomic():
+        base = {}
+        for chunk in _chunks({c.cattle_id for c in checks}):
+            for baseline in VitalBaseline.objects.select_for_update().filter(cattle_id__in=chunk):
+                base[baseline.cattle_id] = {field: _baseline_stats(baseline, field) for field in VITAL_FIELDS}
+        results, baselines = _score_rows(
+            [(c.pk, c.cattle_id, c.temperature, c.heart_rate) for c in checks], base
+        )
+        for cattle_id, stats in baselines.items():
+            for field in VITAL_FIELDS:
+                stats.setdefault(field, base.get(cattle_id, {}).get(field, (0, 0.0, 0.0)))
+        _save_baselines(baselines, batch_size)
+        touch_tables(HealthCheck)
+        return _save_scores(results, {}, batch_size)
+
+
+def rebuild_vital_baselines(cattle_ids=None, batch_size=1000):
+    # คำนวณ baseline และคะแนนของทุก HealthCheck ใหม่จากประวัติ (ตามลำดับวันที่) ในรอบเดียว
+    checks = HealthCheck.objects.all()
+    if cattle_ids is not None:
+        cattle_ids = list(cattle_ids)
+        checks = checks.filter(cattle_id__in=cattle_ids)
+    rows = list(
+        checks.order_by('cattle_id', 'check_date', 'id')
+        .values_list('pk', 'cattle_id', 'temperature', 'heart_rate',
+                     'temperature_zscore', 'heart_rate_zscore', 'is_anomaly')
+    )
+    with transaction.atomic():
+        results, baselines = _score_rows(rows, {})
+        stale = VitalBaseline.objects.all()
+        if cattle_ids is not None:
+            stale = stale.filter(cattle_id__in=cattle_ids)
+        stale.delete()
+        _save_baselines(baselines, batch_size)
+        if _save_scores(results, {r[0]: tuple(r[4:]) for r in rows}, batch_size):
+            touch_tables(HealthCheck)
+    return len(baselines)
@@ -14,6 +14,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY", "secret-key")
 DEBUG = os.getenv("DEBUG", "False") == "True"
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
+# ฟอร์มรอบตรวจทั้งคอกส่ง ~7 ช่องต่อโค (200 ตัว ≈ 1,400 ช่อง) เกินค่าเริ่มต้นของ Django (1,000)
+DATA_UPLOAD_MAX_NUMBER_FIELDS = int(os.getenv("DATA_UPLOAD_MAX_NUMBER_FIELDS", "10000"))
 
 # -------------------------
 # Installed apps
@@ -25,6 +27,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "rest_framework",
     # apps ของคุณ
     "cattle",
 ]
@@ -33,6 +36,7 @@ INSTALLED_APPS = [
 # Middleware
 # -------------------------
 MIDDLEWARE = [
+    "cattle.middleware.MetricsMiddleware",  # วัดเวลา/จำนวน query ต่อ view → /metrics
     "django.middleware.security.SecurityMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # จัดการ static files
@@ -73,9 +77,13 @@ ASGI_APPLICATION = "cattle_health_project.asgi.application"
 # -------------------------
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# เก็บ connection ไว้ใช้ซ้ำ (วินาที) — ภายใต้ ASGI แต่ละ request ใช้ thread ของตัวเอง connection ค้างไม่ถูกใช้ซ้ำ
+# จึงตั้ง DB_CONN_MAX_AGE=0 เฉพาะ process ASGI (ดู Procfile)
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
 if DATABASE_URL:
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=True)
+        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE, ssl_require=True)
     }
 else:
     # fallback → SQLite (สำหรับ local dev)
@@ -86,6 +94,89 @@ else:
         }
     }
 
+# -------------------------
+# Cache
+# -------------------------
+# cache แยกต่อโปรเซสได้: เลขเวอร์ชันที่ใช้ล้าง cache เก็บใน TableVersion (ฐานข้อมูล) ทุก worker จึงเห็นตรงกัน
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cattle-health",
+    }
+}
+
+# สรุปภาพรวมฝูงบน dashboard (วินาที) → ถูกล้างทันทีเมื่อข้อมูลเปลี่ยน
+HERD_SUMMARY_CACHE_TIMEOUT = int(os.getenv("HERD_SUMMARY_CACHE_TIMEOUT", "300"))
+
+# ผลวิเคราะห์การเจริญเติบโตต่อ cohort (วินาที) → ถูกล้างเมื่อมี HealthCheck ใหม่
+GROWTH_CACHE_TIMEOUT = int(os.getenv("GROWTH_CACHE_TIMEOUT", "3600"))
+
+# ใบให้อาหารทั้งฝูงต่อวัน (วินาที) → key เปลี่ยนเองเมื่อสูตรอาหารหรือคอกเปลี่ยน
+FEED_PLAN_CACHE_TIMEOUT = int(os.getenv("FEED_PLAN_CACHE_TIMEOUT", "86400"))
+
+# -------------------------
+# REST API
+# -------------------------
+# จำนวน HealthCheck ล่าสุดที่แนบมากับ /api/cattle/
+API_RECENT_HEALTHCHECKS = int(os.getenv("API_RECENT_HEALTHCHECKS", "5"))
+
+# -------------------------
+# Columnar snapshot ของ HealthCheck (manage.py snapshot_healthchecks)
+# -------------------------
+HEALTH_SNAPSHOT_DIR = os.getenv("HEALTH_SNAPSHOT_DIR", str(BASE_DIR / "snapshots"))
+
+# -------------------------
+# Notifications (manage.py generate_notifications)
+# -------------------------
+NOTIFICATION_VACCINE_LEAD_DAYS = int(os.getenv("NOTIFICATION_VACCINE_LEAD_DAYS", "7"))
+NOTIFICATION_CHECKUP_DAYS = int(os.getenv("NOTIFICATION_CHECKUP_DAYS", "30"))
+NOTIFICATION_WEIGHT_DAYS = int(os.getenv("NOTIFICATION_WEIGHT_DAYS", "60"))
+
+# -------------------------
+# Monthly reports (manage.py generate_reports)
+# -------------------------
+# จำนวน process ที่ใช้สร้างรายงาน — 0 = เท่ากับจำนวน CPU
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0"))
+
+# -------------------------
+# Archive / purge (manage.py purge_archived)
+# -------------------------
+# โคที่คัดออกแล้วจะถูกลบประวัติจริงเมื่อพ้นกี่วัน (ระหว่างนี้กู้คืนได้จาก admin)
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))
+
+# -------------------------
+# Delta sync ของแท็บเล็ต (/api/sync/)
+# -------------------------
+# ไม่ส่งรายการที่เพิ่งบันทึกภายในกี่วินาที → transaction ที่ commit ช้ากว่าไม่หลุดจาก token
+SYNC_SETTLE_SECONDS = int(os.getenv("SYNC_SETTLE_SECONDS", "1"))
+# เก็บ change log กี่วัน (manage.py prune_sync_log) — token ที่เก่ากว่านี้ต้องดาวน์โหลดใหม่ทั้งหมด
+SYNC_LOG_RETENTION_DAYS = int(os.getenv("SYNC_LOG_RETENTION_DAYS", "90"))
+# ref ของรายการที่แท็บเล็ตส่งมา (กันส่งซ้ำ) เก็บนานกว่า log ปกติ — ต้องครอบคลุมช่วงที่แท็บเล็ต offline ได้นานที่สุด
+SYNC_REF_RETENTION_DAYS = int(os.getenv("SYNC_REF_RETENTION_DAYS", "365"))
+
+# -------------------------
+# Metrics (/metrics) และ slow request log
+# -------------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+# ต้องส่ง header "Authorization: Bearer <token>" เพื่ออ่าน /metrics — ไม่ตั้งค่า = เปิดได้เฉพาะตอน DEBUG
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# โฟลเดอร์ที่แต่ละ worker เขียนค่า metrics ของตัวเอง (จำเป็นเมื่อรันหลาย worker) — ต้องล้างทุกครั้งก่อนเริ่ม server
+# ไม่ตั้งค่า = เก็บในหน่วยความจำของโปรเซส /metrics เห็นเฉพาะ worker ที่ตอบ (ใช้ได้กับ worker เดียว)
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+# request ที่ช้ากว่านี้ (มิลลิวินาที) จะถูก log พร้อม SQL — 0 = ปิด
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "0"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "cattle.slow_requests": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
+}
+
 # -------------------------
 # Password validation
 # -------------------------